@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
+from prometheus_fastapi_instrumentator import Instrumentator
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.routes.serialization import dump_cart, dump_item, json_response
+from lecture_2.hw.shop_api.storage import cart_repository, item_repository
+
+# the same handlers as sync `def`s, which Starlette runs in its threadpool
+sync_app = FastAPI()
+Instrumentator().instrument(sync_app).expose(sync_app)
+
+
+@sync_app.post("/item/")
+def sync_create_item(item: Item) -> Response:
+    return json_response(dump_item(item_repository.create(Item(name=item.name, price=item.price, deleted=False))))
+
+
+@sync_app.get("/item/{item_id}")
+def sync_get_item(item_id: int) -> Response:
+    item = item_repository.get(item_id)
+    if not item or item.deleted:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return json_response(dump_item(item))
+
+
+@sync_app.post("/cart/")
+def sync_create_cart() -> Response:
+    return json_response(dump_cart(cart_repository.create_cart()))
+
+
+@sync_app.get("/cart/{cart_id}")
+def sync_get_cart(cart_id: int) -> Response:
+    cart = cart_repository.get_cart(cart_id)
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    return json_response(dump_cart(cart))
+
+
+@sync_app.post("/cart/{cart_id}/add/{item_id}")
+def sync_add_item_to_cart(cart_id: int, item_id: int) -> Response:
+    return json_response(dump_cart(cart_repository.add_item_to_cart(cart_id, item_repository.get_entity(item_id))))
+
+
+APPS = {"sync": ("lecture_2.hw.benchmarks.async_load:sync_app", sync_app),
+        "async": ("lecture_2.hw.shop_api.main:app", app)}
+
+
+class Connection:
+    """A bare keep-alive HTTP/1.1 client: httpx itself saturates a core long before a thousand connections do."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str):
+        self.reader, self.writer, self.host = reader, writer, host
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> "Connection":
+        return cls(*await asyncio.open_connection(host, port), host)
+
+    async def request(self, method: str, path: str) -> tuple[int, bytes]:
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: 0\r\n\r\n".encode())
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        length = next(int(line.split(":", 1)[1]) for line in header_lines if line.lower().startswith("content-length:"))
+        return int(status_line.split()[1]), await self.reader.readexactly(length)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def seed(client: httpx.AsyncClient, items: int, carts: int) -> tuple[list[int], list[int]]:
+    rows = [{"name": f"item {i}", "price": float(i % 1000)} for i in range(items)]
+    item_ids = [(await client.post("/item/", json=row)).json()["id"] for row in rows]
+    cart_ids = [(await client.post("/cart/")).json()["id"] for _ in range(carts)]
+    for cart_id in cart_ids:
+        for item_id in random.sample(item_ids, 3):
+            await client.post(f"/cart/{cart_id}/add/{item_id}")
+    return item_ids, cart_ids
+
+
+async def run_load(send, item_ids: list[int], cart_ids: list[int], concurrency: int,
+                   requests: int) -> tuple[float, list[float]]:
+    """`send(user, path)` performs one GET for the given concurrent user and returns the status code."""
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def user(index: int):
+        rng = random.Random(index)
+        for _ in remaining:
+            path = f"/item/{rng.choice(item_ids)}" if rng.random() < 0.7 else f"/cart/{rng.choice(cart_ids)}"
+            started = time.perf_counter()
+            status = await send(index, path)
+            latencies.append(time.perf_counter() - started)
+            assert status == 200, (path, status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(concurrency)))
+    return time.perf_counter() - started, latencies
+
+
+async def measure(name: str, client: httpx.AsyncClient, send, args: argparse.Namespace) -> None:
+    random.seed(42)
+    item_ids, cart_ids = await seed(client, args.items, args.carts)
+    await run_load(send, item_ids, cart_ids, args.concurrency, args.requests // 10)  # warm-up
+    elapsed, latencies = await run_load(send, item_ids, cart_ids, args.concurrency, args.requests)
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"{name:>6}: {len(latencies) / elapsed:>8.0f} requests/s, "
+          f"p50 {percentiles[49] * 1e3:>7.1f} ms, p99 {percentiles[98] * 1e3:>7.1f} ms")
+
+
+async def measure_in_process(name: str, asgi_app: FastAPI, args: argparse.Namespace) -> None:
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://shop") as client:
+        async def send(_, path: str) -> int:
+            return (await client.get(path)).status_code
+
+        await measure(name, client, send, args)
+
+
+async def measure_uvicorn(name: str, import_path: str, args: argparse.Namespace) -> None:
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", import_path, "--port", str(args.port),
+                               "--log-level", "warning", "--backlog", str(args.concurrency * 2)])
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+            while True:
+                try:
+                    await client.get("/item/0")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+            connections = await asyncio.gather(*(Connection.open("127.0.0.1", args.port)
+                                                 for _ in range(args.concurrency)))
+
+            async def send(user: int, path: str) -> int:
+                return (await connections[user].request("GET", path))[0]
+
+            await measure(name, client, send, args)
+            for connection in connections:
+                connection.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    for name, (import_path, asgi_app) in APPS.items():
+        if args.in_process:
+            await measure_in_process(name, asgi_app, args)
+        else:
+            await measure_uvicorn(name, import_path, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency under concurrent load: sync (threadpool) vs async routes")
+    parser.add_argument("--concurrency", type=int, default=1_000, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--carts", type=int, default=100)
+    parser.add_argument("--in-process", action="store_true",
+                        help="call the apps through httpx.ASGITransport instead of a uvicorn server")
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
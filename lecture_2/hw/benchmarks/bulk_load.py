@@ -0,0 +1,53 @@
+import argparse
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.bulk import NDJSON_MEDIA_TYPE
+
+
+def rows(count: int) -> list[dict]:
+    return [{"name": f"item {i}", "price": float(i % 1000)} for i in range(count)]
+
+
+def load_single(client: TestClient, items: list[dict]) -> None:
+    for item in items:
+        client.post("/item/", json=item)
+
+
+def load_bulk_json(client: TestClient, items: list[dict], batch: int) -> None:
+    for start in range(0, len(items), batch):
+        client.post("/item/bulk", json=items[start:start + batch])
+
+
+def load_bulk_ndjson(client: TestClient, items: list[dict], batch: int) -> None:
+    for start in range(0, len(items), batch):
+        body = "\n".join(json.dumps(item) for item in items[start:start + batch])
+        client.post("/item/bulk", content=body, headers={"content-type": NDJSON_MEDIA_TYPE})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Items/s loaded through POST /item/ vs POST /item/bulk")
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=1_000)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    items = rows(args.items)
+    runs = [
+        ("single", lambda: load_single(client, items)),
+        ("bulk json", lambda: load_bulk_json(client, items, args.batch)),
+        ("bulk ndjson", lambda: load_bulk_ndjson(client, items, args.batch)),
+    ]
+
+    for name, run in runs:
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        print(f"{name:>12}: {args.items / elapsed:>10.0f} items/s")
+
+
+if __name__ == "__main__":
+    main()
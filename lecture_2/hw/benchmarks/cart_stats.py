@@ -0,0 +1,45 @@
+import argparse
+import random
+import timeit
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+from lecture_2.hw.shop_api.storage.stats import CartStatistics
+
+
+def paged_stats(cart_repository: CartRepository, page: int):
+    # what the dashboards did: page through every cart and aggregate on the client
+    totals, offset = [], 0
+    while carts := cart_repository.query_carts(offset=offset, limit=page):
+        totals.extend((cart.total_price, cart.total_quantity) for cart in carts)
+        offset += len(carts)
+    return CartStatistics(totals).snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cart statistics: paging all carts vs maintained aggregates")
+    parser.add_argument("--carts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--page", type=int, default=1_000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"{'carts':>8} {'paged, ms':>10} {'maintained, us':>15} {'add line, us':>13}")
+    for size in args.carts:
+        item_repository, cart_repository = ItemRepository(), CartRepository()
+        item_repository.add_update_listener(cart_repository.on_item_updated)
+        items = item_repository.create_many([Item(name=f"item {i}", price=random.uniform(1, 500), deleted=False)
+                                             for i in range(args.items)])
+        entities = [item_repository.get_entity(item.id) for item in items]
+        carts = [cart_repository.create_cart() for _ in range(size)]
+
+        lines = [(random.choice(carts).id, random.choice(entities), random.randint(1, 3)) for _ in range(size * 3)]
+        add = timeit.timeit(lambda: [cart_repository.add_item_to_cart(*line) for line in lines], number=1) / len(lines)
+
+        paged = timeit.timeit(lambda: paged_stats(cart_repository, args.page), number=1)
+        maintained = timeit.timeit(cart_repository.stats, number=100) / 100
+        print(f"{size:>8} {paged * 1e3:>10.1f} {maintained * 1e6:>15.1f} {add * 1e6:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import random
+import tempfile
+import time
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.persistence import PersistentStore
+
+TARGET_SECONDS = 2.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm start of the persistent in-memory shop storage")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--carts", type=int, default=100_000)
+    parser.add_argument("--tail", type=int, default=10_000, help="mutations written after the last snapshot")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        store = PersistentStore(directory)
+        items = store.item_repository.create_many([Item(name=f"item {i}", price=rng.uniform(0, 1000), deleted=False)
+                                                   for i in range(args.items)])
+        item_entities = [store.item_repository.get_entity(item.id) for item in items]
+        for _ in range(args.carts):
+            cart = store.cart_repository.create_cart()
+            store.cart_repository.add_items_to_cart(cart.id, [(rng.choice(item_entities), rng.randint(1, 3))
+                                                              for _ in range(3)])
+
+        started = time.perf_counter()
+        store.snapshot()
+        print(f"snapshot written in {time.perf_counter() - started:.2f}s")
+
+        for _ in range(args.tail):
+            item = rng.choice(items)
+            store.item_repository.update(Item(item.id, item.name, rng.uniform(0, 1000), False))
+        store.close()
+
+        started = time.perf_counter()
+        restored = PersistentStore(directory)
+        elapsed = time.perf_counter() - started
+        restored.close()
+
+    verdict = "ok" if elapsed < TARGET_SECONDS else "over target"
+    print(f"cold start with {args.items} items, {args.carts} carts and {args.tail} journal records: "
+          f"{elapsed:.2f}s (target {TARGET_SECONDS:.0f}s, {verdict})")
+
+
+if __name__ == "__main__":
+    main()
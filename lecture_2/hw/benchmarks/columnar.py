@@ -0,0 +1,83 @@
+import argparse
+import gc
+import random
+import timeit
+import tracemalloc
+from itertools import islice
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage import columnar
+from lecture_2.hw.shop_api.storage.columnar import ColumnarItemRepository
+from lecture_2.hw.shop_api.storage.repository import ItemRepository
+
+QUERIES = {
+    "price band": {"min_price": 400.0, "max_price": 600.0, "limit": 100},
+    "band, deep page": {"min_price": 400.0, "max_price": 600.0, "offset": 50_000, "limit": 100},
+    "band + deleted": {"min_price": 400.0, "max_price": 600.0, "show_deleted": True, "limit": 100},
+    "by id, deep page": {"offset": 200_000, "limit": 100},
+}
+
+
+def scan_query(item_table: dict, offset=0, limit=10, min_price=None, max_price=None, show_deleted=False):
+    # per-object comparisons over the whole table, sorted by price when a price bound is given
+    matches = (item_entity for item_entity in item_table.values()
+               if (show_deleted or not item_entity.deleted)
+               and (min_price is None or item_entity.price >= min_price)
+               and (max_price is None or item_entity.price <= max_price))
+    if min_price is not None or max_price is not None:
+        matches = sorted(matches, key=lambda item_entity: (item_entity.price, item_entity.id))
+    return [Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted)
+            for item_entity in islice(matches, offset, offset + limit)]
+
+
+def build(factory, rows: list[tuple[str, float, bool]]) -> tuple[object, int]:
+    items = [Item(name=name, price=price, deleted=deleted) for name, price, deleted in rows]
+    gc.collect()
+    tracemalloc.start()
+    repository = factory()
+    repository.create_many(items)
+    # the ids set on the caller's items are not part of the store
+    del items
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return repository, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dict of entities with sorted indexes vs columnar arrays")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--deleted", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-numpy", action="store_true", help="filter with the pure-Python fallback")
+    args = parser.parse_args()
+
+    random.seed(42)
+    rows = [(f"item {i}", round(random.uniform(0, 1000), 2), random.random() < args.deleted)
+            for i in range(args.size)]
+    if args.no_numpy:
+        columnar.numpy = None
+
+    indexed, indexed_size = build(ItemRepository, rows)
+    stores, store_size = build(ColumnarItemRepository, rows)
+    print(f"{args.size} items, memory: indexed {indexed_size / args.size:.0f} B/item, "
+          f"columnar {store_size / args.size:.0f} B/item, numpy {'on' if columnar.numpy else 'off'}")
+
+    gc.collect()
+    tracemalloc.start()
+    stores.search("item")
+    name_index_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"name index the first columnar search builds: {name_index_size / args.size:.0f} B/item")
+
+    item_table = {item_entity.id: item_entity for item_entity in indexed.entities()}
+    print(f"{'query':>18} {'scan, ms':>10} {'indexed, ms':>12} {'columnar, ms':>13}")
+    for name, params in QUERIES.items():
+        assert stores.query(**params) == indexed.query(**params)
+        timings = [timeit.timeit(lambda: query(**params), number=args.repeat) / args.repeat * 1e3
+                   for query in (lambda **kw: scan_query(item_table, **kw), indexed.query, stores.query)]
+        print(f"{name:>18} {timings[0]:>10.2f} {timings[1]:>12.2f} {timings[2]:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmRSS:")) / 1024
+
+
+class RssSampler(threading.Thread):
+    """Peak resident size of the server process while a measurement runs."""
+
+    def __init__(self, pid: int):
+        super().__init__(daemon=True)
+        self.pid, self.peak, self.stopped = pid, rss_mb(pid), threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(0.05):
+            self.peak = max(self.peak, rss_mb(self.pid))
+
+
+def measure(name: str, pid: int, export) -> None:
+    baseline = rss_mb(pid)
+    sampler = RssSampler(pid)
+    sampler.start()
+    started = time.perf_counter()
+    rows, size = export()
+    elapsed = time.perf_counter() - started
+    sampler.stopped.set()
+    sampler.join()
+    print(f"{name:>24}: {rows:>8} rows, {size / 2 ** 20:>6.1f} MiB in {elapsed:>6.2f} s, "
+          f"server RSS {baseline:.0f} -> peak {sampler.peak:.0f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full catalogue download: offset paging vs NDJSON export")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--paged-items", type=int, default=100_000, help="offset paging is quadratic, so cap it")
+    parser.add_argument("--page", type=int, default=1_000)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "lecture_2.hw.shop_api.main:app",
+                               "--port", str(args.port), "--log-level", "warning"])
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=600) as client:
+            while True:
+                try:
+                    client.get("/item/0")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+
+            for start in range(0, args.items, 50_000):
+                client.post("/item/bulk", json=[{"name": f"item {i}", "price": float(i % 1000)}
+                                                for i in range(start, min(start + 50_000, args.items))])
+
+            def paged():
+                rows = size = 0
+                while rows < args.paged_items:
+                    response = client.get("/item/", params={"offset": rows, "limit": args.page})
+                    rows, size = rows + len(response.json()), size + len(response.content)
+                return rows, size
+
+            def streamed():
+                rows = size = 0
+                with client.stream("GET", "/item/export") as response:
+                    for line in response.iter_lines():
+                        rows, size = rows + 1, size + len(line) + 1
+                return rows, size
+
+            measure(f"offset paging, {args.page}/page", server.pid, paged)
+            measure("NDJSON export", server.pid, streamed)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
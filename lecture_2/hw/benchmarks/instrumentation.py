@@ -0,0 +1,48 @@
+import argparse
+import random
+import timeit
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.instrumentation import instrument
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+
+
+def seed(items: int, carts: int) -> tuple[ItemRepository, CartRepository]:
+    item_repository, cart_repository = ItemRepository(), CartRepository()
+    item_repository.add_update_listener(cart_repository.on_item_updated)
+    created = item_repository.create_many([Item(name=f"item {i}", price=random.uniform(0, 1000), deleted=False)
+                                           for i in range(items)])
+    for _ in range(carts):
+        cart = cart_repository.create_cart()
+        cart_repository.add_items_to_cart(cart.id, [(item_repository.get_entity(item.id), 1)
+                                                    for item in random.sample(created, 3)])
+    return item_repository, cart_repository
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of repository instrumentation per call")
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--carts", type=int, default=10_000)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    repositories = {"plain": seed(args.items, args.carts), "instrumented": seed(args.items, args.carts)}
+    for repository in repositories["instrumented"]:
+        instrument(repository)
+
+    calls = {
+        "get": lambda items, carts: items.get(500),
+        "query, price band": lambda items, carts: items.query(min_price=100.0, max_price=200.0),
+        "get_cart": lambda items, carts: carts.get_cart(500),
+        "query_carts": lambda items, carts: carts.query_carts(min_quantity=3),
+    }
+    print(f"{'call':>18} {'plain, us':>10} {'instrumented, us':>17}")
+    for name, call in calls.items():
+        timings = [timeit.timeit(lambda: call(*repositories[kind]), number=args.number) / args.number * 1e6
+                   for kind in ("plain", "instrumented")]
+        print(f"{name:>18} {timings[0]:>10.2f} {timings[1]:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
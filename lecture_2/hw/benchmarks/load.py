@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import httpx
+
+from lecture_2.hw.benchmarks.async_load import Connection
+
+# endpoint -> share of the requests in the mix
+MIX = {
+    "GET /item/{id}": 35,
+    "GET /item/": 15,
+    "GET /item/?min_price&max_price": 15,
+    "POST /cart/{id}/add/{item_id}": 15,
+    "GET /cart/{id}": 12,
+    "GET /cart/?min_price": 8,
+}
+
+# Send performs one request and returns its status code
+Send = Callable[[int, str, str], Awaitable[int]]
+
+
+@dataclass(slots=True)
+class Request:
+    endpoint: str
+    method: str
+    path: str
+
+
+def plan(seed: int, requests: int, item_ids: list[int], cart_ids: list[int]) -> list[Request]:
+    """The same requests in the same order for a given seed and seeded state."""
+    rng = random.Random(seed)
+    endpoints = rng.choices(list(MIX), weights=list(MIX.values()), k=requests)
+    planned = []
+    for endpoint in endpoints:
+        if endpoint == "GET /item/{id}":
+            path = f"/item/{rng.choice(item_ids)}"
+        elif endpoint == "GET /item/":
+            path = f"/item/?offset={rng.randrange(0, 200)}&limit=20"
+        elif endpoint == "GET /item/?min_price&max_price":
+            low = rng.randrange(0, 900)
+            path = f"/item/?min_price={low}&max_price={low + 100}&limit=20"
+        elif endpoint == "POST /cart/{id}/add/{item_id}":
+            path = f"/cart/{rng.choice(cart_ids)}/add/{rng.choice(item_ids)}"
+        elif endpoint == "GET /cart/{id}":
+            path = f"/cart/{rng.choice(cart_ids)}"
+        else:
+            path = f"/cart/?min_price={rng.randrange(0, 2000)}&limit=20"
+        planned.append(Request(endpoint, endpoint.split()[0], path))
+    return planned
+
+
+async def seed_state(client: httpx.AsyncClient, items: int, carts: int, seed: int) -> tuple[list[int], list[int]]:
+    rng = random.Random(seed)
+    item_ids = []
+    for start in range(0, items, 10_000):
+        rows = [{"name": f"item {i}", "price": round(rng.uniform(1, 1000), 2)}
+                for i in range(start, min(start + 10_000, items))]
+        response = await client.post("/item/bulk", json=rows)
+        item_ids.extend(result["item"]["id"] for result in response.json())
+
+    cart_ids = []
+    for _ in range(carts):
+        cart_id = (await client.post("/cart/")).json()["id"]
+        lines = [{"item_id": item_id, "quantity": rng.randint(1, 3)} for item_id in rng.sample(item_ids, 3)]
+        await client.post(f"/cart/{cart_id}/add-bulk", json=lines)
+        cart_ids.append(cart_id)
+    return item_ids, cart_ids
+
+
+async def drive(send: Send, requests: list[Request], concurrency: int) -> tuple[float, dict[str, list[float]], dict]:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    remaining = iter(requests)
+
+    async def user(index: int) -> None:
+        for request in remaining:
+            started = time.perf_counter()
+            status = await send(index, request.method, request.path)
+            latencies[request.endpoint].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[request.endpoint] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def summarize(elapsed: float, latencies: dict[str, list[float]], errors: dict[str, int]) -> dict:
+    def describe(samples: list[float], failed: int) -> dict:
+        percentiles = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+        return {
+            "requests": len(samples),
+            "errors": failed,
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "mean_ms": round(statistics.fmean(samples) * 1e3, 3),
+            "p50_ms": round(percentiles[49] * 1e3, 3),
+            "p90_ms": round(percentiles[89] * 1e3, 3),
+            "p99_ms": round(percentiles[98] * 1e3, 3),
+            "max_ms": round(max(samples) * 1e3, 3),
+        }
+
+    endpoints = {endpoint: describe(samples, errors[endpoint]) for endpoint, samples in sorted(latencies.items())}
+    every = [sample for samples in latencies.values() for sample in samples]
+    return {"elapsed_s": round(elapsed, 3), "total": describe(every, sum(errors.values())), "endpoints": endpoints}
+
+
+async def run_in_process(args: argparse.Namespace) -> dict:
+    from lecture_2.hw.shop_api.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://shop") as client:
+        async def send(_: int, method: str, path: str) -> int:
+            return (await client.request(method, path)).status_code
+
+        return await run(client, send, args)
+
+
+async def run_uvicorn(args: argparse.Namespace) -> dict:
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "lecture_2.hw.shop_api.main:app",
+                               "--port", str(args.port), "--log-level", "warning",
+                               "--backlog", str(max(args.concurrency * 2, 2048))])
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=600) as client:
+            while True:
+                try:
+                    await client.get("/item/0")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+            connections = await asyncio.gather(*(Connection.open("127.0.0.1", args.port)
+                                                 for _ in range(args.concurrency)))
+
+            async def send(user: int, method: str, path: str) -> int:
+                return (await connections[user].request(method, path))[0]
+
+            try:
+                return await run(client, send, args)
+            finally:
+                for connection in connections:
+                    connection.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def run(client: httpx.AsyncClient, send: Send, args: argparse.Namespace) -> dict:
+    item_ids, cart_ids = await seed_state(client, args.items, args.carts, args.seed)
+    await drive(send, plan(args.seed + 1, args.requests // 10, item_ids, cart_ids), args.concurrency)  # warm-up
+    return summarize(*await drive(send, plan(args.seed, args.requests, item_ids, cart_ids), args.concurrency))
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Endpoints whose throughput fell or p99 latency grew by more than `tolerance` against the baseline."""
+    regressions = []
+    for endpoint, current in {"total": result["total"], **result["endpoints"]}.items():
+        previous = baseline["endpoints"].get(endpoint) if endpoint != "total" else baseline["total"]
+        if previous is None:
+            continue
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+        if current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p99 {previous['p99_ms']} -> {current['p99_ms']} ms")
+    return regressions
+
+
+def print_table(result: dict) -> None:
+    print(f"{'endpoint':>32} {'requests':>9} {'rps':>9} {'p50, ms':>9} {'p90, ms':>9} {'p99, ms':>9} {'errors':>7}")
+    for endpoint, row in {**result["endpoints"], "total": result["total"]}.items():
+        print(f"{endpoint:>32} {row['requests']:>9} {row['throughput_rps']:>9.0f} {row['p50_ms']:>9.2f} "
+              f"{row['p90_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded load test of the shop API with a browse/filter/cart mix")
+    parser.add_argument("--mode", choices=["in-process", "uvicorn"], default="in-process",
+                        help="call the ASGI app directly or a local uvicorn server over HTTP")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--carts", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_in_process(args) if args.mode == "in-process" else run_uvicorn(args))
+    result = {
+        "meta": {"commit": git_commit(), "mode": args.mode, "items": args.items, "carts": args.carts,
+                 "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+                 "python": platform.python_version(), "platform": platform.platform()},
+        **result,
+    }
+    print_table(result)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        settings = ("mode", "items", "carts", "requests", "concurrency", "seed")
+        if any(baseline["meta"].get(key) != result["meta"][key] for key in settings):
+            print(f"warning: the baseline ran with different settings: {baseline['meta']}")
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from lecture_2.hw.benchmarks.async_load import Connection
+
+
+async def wait_ready(port: int) -> None:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+        while True:
+            try:
+                await client.get("/item/0")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+
+
+async def client_load(port: int, items: int, concurrency: int, requests: int, seed: int) -> list[float]:
+    """Mostly single-item reads with some listing pages and price updates spread over all workers."""
+    connections = await asyncio.gather(*(Connection.open("127.0.0.1", port) for _ in range(concurrency)))
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def user(connection: Connection, rng: random.Random):
+        for _ in remaining:
+            roll = rng.random()
+            if roll < 0.8:
+                path = f"/item/{rng.randrange(items)}"
+            else:
+                path = f"/item/?limit=10&min_price={rng.randrange(1000)}"
+            started = time.perf_counter()
+            status, _ = await connection.request("GET", path)
+            latencies.append(time.perf_counter() - started)
+            assert status == 200, (path, status)
+
+    await asyncio.gather(*(user(connection, random.Random(seed * 1_000 + index))
+                           for index, connection in enumerate(connections)))
+    for connection in connections:
+        connection.close()
+    return latencies
+
+
+def client_process(port: int, items: int, concurrency: int, requests: int, seed: int) -> list[float]:
+    return asyncio.run(client_load(port, items, concurrency, requests, seed))
+
+
+def measure(workers: int, args: argparse.Namespace) -> None:
+    server = subprocess.Popen([sys.executable, "-m", "lecture_2.hw.shop_api.multiworker", "--host", "127.0.0.1",
+                               "--port", str(args.port), "--workers", str(workers)],
+                              env={**os.environ, "SHOP_SHARED_CAPACITY": str(args.items * 2)})
+    try:
+        asyncio.run(wait_ready(args.port))
+        rows = [{"name": f"item {i}", "price": float(i % 1000)} for i in range(args.items)]
+        httpx.post(f"http://127.0.0.1:{args.port}/item/bulk", json=rows, timeout=600).raise_for_status()
+
+        per_client = args.requests // args.clients
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            pool.starmap(client_process, [(args.port, args.items, args.concurrency, per_client // 10, seed)
+                                          for seed in range(args.clients)])  # warm-up
+            started = time.perf_counter()
+            results = pool.starmap(client_process, [(args.port, args.items, args.concurrency, per_client, seed)
+                                                    for seed in range(args.clients)])
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = [latency for result in results for latency in result]
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"{workers:>2} workers: {len(latencies) / elapsed:>8.0f} requests/s, "
+          f"p50 {percentiles[49] * 1e3:>7.1f} ms, p99 {percentiles[98] * 1e3:>7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read throughput of the multi-worker shop API by worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=40_000)
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="connections per client process")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.items} items")
+    for workers in args.workers:
+        measure(workers, args)
+
+
+if __name__ == "__main__":
+    main()
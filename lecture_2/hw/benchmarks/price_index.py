@@ -0,0 +1,62 @@
+import argparse
+import random
+import timeit
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.repository import ItemRepository
+
+
+def legacy_query(item_table: dict, offset=0, limit=10, min_price=None, max_price=None, show_deleted=False):
+    item_entities = list(item_table.values())
+    item_entities = item_entities[offset:]
+
+    query_result = []
+    for item_entity in item_entities:
+        if len(query_result) == limit:
+            break
+
+        if min_price is not None and item_entity.price < min_price:
+            continue
+        if max_price is not None and item_entity.price > max_price:
+            continue
+        if not show_deleted and item_entity.deleted:
+            continue
+
+        query_result.append(Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted))
+
+    return query_result
+
+
+def seed(size: int) -> tuple[ItemRepository, dict]:
+    repository = ItemRepository()
+    legacy_table = dict()
+    for i in range(size):
+        item = repository.create(Item(name=f"item {i}", price=random.uniform(0, 1000), deleted=False))
+        legacy_table[item.id] = item
+    return repository, legacy_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ItemRepository.query: full scan vs price index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(42)
+    queries = [
+        ("narrow band", dict(min_price=999.0, max_price=999.5, limit=10)),
+        ("wide band", dict(min_price=100.0, max_price=900.0, limit=10)),
+        ("max price only", dict(max_price=0.5, limit=10)),
+    ]
+
+    print(f"{'items':>10} {'query':>16} {'legacy, us':>12} {'indexed, us':>12} {'speedup':>8}")
+    for size in args.sizes:
+        repository, legacy_table = seed(size)
+        for name, params in queries:
+            legacy = timeit.timeit(lambda: legacy_query(legacy_table, **params), number=args.repeat) / args.repeat
+            indexed = timeit.timeit(lambda: repository.query(**params), number=args.repeat) / args.repeat
+            print(f"{size:>10} {name:>16} {legacy * 1e6:>12.1f} {indexed * 1e6:>12.1f} {legacy / indexed:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
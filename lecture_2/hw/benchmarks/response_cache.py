@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.cache import response_cache
+from lecture_2.hw.shop_api.routes.cart_routes import get_cart
+from lecture_2.hw.shop_api.routes.item_routes import get_item
+
+
+async def replay(requests: list, etags: dict) -> float:
+    # handlers are awaited directly: the HTTP stack costs the same with and without the cache and drowns the difference
+    started = time.perf_counter()
+    for handler, key in requests:
+        await handler(key, etags.get((handler, key)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GET /item/{id} and GET /cart/{id} handlers with and without the cache")
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--carts", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=20, help="lines per cart")
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    client = TestClient(app)
+    rows = [{"name": f"item {i}", "price": rng.uniform(0, 1000)} for i in range(args.items)]
+    item_ids = [result["item"]["id"] for result in client.post("/item/bulk", json=rows).json()]
+    cart_ids = [client.post("/cart/").json()["id"] for _ in range(args.carts)]
+    for cart_id in cart_ids:
+        lines = [{"item_id": item_id} for item_id in rng.sample(item_ids, args.lines)]
+        client.post(f"/cart/{cart_id}/add-bulk", json=lines)
+
+    # product pages dominate the traffic
+    requests = [(get_item, rng.choice(item_ids)) if rng.random() < 0.8 else (get_cart, rng.choice(cart_ids))
+                for _ in range(args.requests)]
+    etags = {(get_item, item_id): client.get(f"/item/{item_id}").headers["etag"] for item_id in item_ids}
+    etags.update({(get_cart, cart_id): client.get(f"/cart/{cart_id}").headers["etag"] for cart_id in cart_ids})
+
+    print(f"{'cache':>6} {'conditional':>12} {'us/request':>11}")
+    for max_entries in [0, args.items + args.carts]:
+        for conditional in [False, True]:
+            response_cache.max_entries = max_entries
+            response_cache.clear()
+            elapsed = asyncio.run(replay(requests, etags if conditional else {}))
+            print(f"{'on' if max_entries else 'off':>6} {'yes' if conditional else 'no':>12} "
+                  f"{elapsed / args.requests * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
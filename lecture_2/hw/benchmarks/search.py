@@ -0,0 +1,88 @@
+import argparse
+import random
+import statistics
+import string
+import time
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.index import tokenize
+from lecture_2.hw.shop_api.storage.repository import ItemRepository
+
+
+def words(rng: random.Random, count: int) -> list[str]:
+    return sorted({"".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(count)})
+
+
+def seed(size: int, rng: random.Random) -> tuple[ItemRepository, list[str]]:
+    # a few common adjectives, more nouns and a long tail of model names, as in a real catalogue
+    adjectives, nouns, models = words(rng, 200), words(rng, 5_000), words(rng, 100_000)
+    names = [f"{rng.choice(adjectives)} {rng.choice(nouns)} {rng.choice(models)}" for _ in range(size)]
+
+    repository = ItemRepository()
+    for start in range(0, size, 10_000):
+        repository.create_many([Item(name=name, price=round(rng.uniform(1, 1000), 2), deleted=rng.random() < 0.05)
+                                for name in names[start:start + 10_000]])
+    return repository, names
+
+
+def keystrokes(name: str) -> list[str]:
+    """What the search box holds after each key typed, from the first letter on."""
+    return [name[:end] for end in range(1, len(name) + 1) if not name[end - 1].isspace()]
+
+
+def scan(names: list[str], query: str, limit: int) -> list[int]:
+    # what a client does without the index: every name, tokenized
+    *whole_words, prefix = tokenize(query)
+    found = []
+    for item_id, name in enumerate(names, 1):
+        name_words = tokenize(name)
+        if all(word in name_words for word in whole_words) and any(word.startswith(prefix) for word in name_words):
+            found.append(item_id)
+            if len(found) == limit:
+                break
+    return found
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    cuts = statistics.quantiles(samples, n=100)
+    return cuts[49] * 1e3, cuts[98] * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ItemRepository.search: name index vs scanning names")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--typed", type=int, default=500, help="item names typed key by key")
+    parser.add_argument("--scans", type=int, default=20, help="queries also answered by scanning")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    repository, names = seed(args.items, rng)
+    print(f"{args.items} items indexed in {time.perf_counter() - started:.1f} s")
+
+    queries = [query for name in rng.sample(names, args.typed) for query in keystrokes(name)]
+    filtered = [dict(min_price=100.0, max_price=200.0), dict(show_deleted=True)]
+
+    print(f"{'search':>22} {'queries':>8} {'p50, ms':>9} {'p99, ms':>9} {'max, ms':>9}")
+    for label, params in [("as you type", {}), ("price 100-200", filtered[0]), ("with deleted", filtered[1])]:
+        samples = []
+        for query in queries:
+            started = time.perf_counter()
+            repository.search(query, limit=args.limit, **params)
+            samples.append(time.perf_counter() - started)
+        p50, p99 = percentiles(samples)
+        print(f"{label:>22} {len(samples):>8} {p50:>9.3f} {p99:>9.3f} {max(samples) * 1e3:>9.3f}")
+
+    sampled = rng.sample(queries, args.scans)
+    samples = []
+    for query in sampled:
+        started = time.perf_counter()
+        scan(names, query, args.limit)
+        samples.append(time.perf_counter() - started)
+    p50, p99 = percentiles(samples)
+    print(f"{'scanning names':>22} {len(samples):>8} {p50:>9.3f} {p99:>9.3f} {max(samples) * 1e3:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import random
+import time
+from typing import List
+
+from fastapi import FastAPI, Query
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.cart_routes import to_cart
+from lecture_2.hw.shop_api.routes.model import Cart, Item
+from lecture_2.hw.shop_api.storage import cart_repository, item_repository
+
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/item/", response_model=List[Item])
+def legacy_list_items(offset: int = Query(0, ge=0), limit: int = Query(10, gt=0)):
+    items = item_repository.query(offset=offset, limit=limit)
+    return [Item(id=item.id, name=item.name, price=item.price, deleted=item.deleted) for item in items]
+
+
+@legacy_app.get("/cart/", response_model=List[Cart])
+def legacy_list_carts(offset: int = Query(0, ge=0), limit: int = Query(10, gt=0)):
+    return [to_cart(cart) for cart in cart_repository.query_carts(offset=offset, limit=limit)]
+
+
+def seed(items: int, carts: int, lines: int) -> None:
+    created = item_repository.create_many([Item(name=f"item {i}", price=random.uniform(0, 1000), deleted=False)
+                                           for i in range(items)])
+    entities = [item_repository.get_entity(item.id) for item in created]
+    for _ in range(carts):
+        cart = cart_repository.create_cart()
+        cart_repository.add_items_to_cart(cart.id, [(item, random.randint(1, 5))
+                                                    for item in random.sample(entities, lines)])
+
+
+def requests_per_second(client: TestClient, path: str, params: dict, seconds: float) -> float:
+    done, started = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        client.get(path, params=params)
+        done += 1
+    return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/s of list endpoints: response_model vs direct serialization")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--carts", type=int, default=1_000)
+    parser.add_argument("--lines", type=int, default=5, help="lines per cart")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each run")
+    args = parser.parse_args()
+
+    random.seed(42)
+    seed(args.items, args.carts, args.lines)
+
+    endpoints = [("/item/", {"limit": 1000}), ("/cart/", {"limit": 10}), ("/cart/", {"limit": 1000})]
+    legacy_client, client = TestClient(legacy_app), TestClient(app)
+    print(f"{'endpoint':>22} {'legacy, rps':>12} {'direct, rps':>12} {'speedup':>8}")
+    for path, params in endpoints:
+        assert legacy_client.get(path, params=params).json() == client.get(path, params=params).json()
+        legacy = requests_per_second(legacy_client, path, params, args.seconds)
+        direct = requests_per_second(client, path, params, args.seconds)
+        print(f"{path + ' limit=' + str(params['limit']):>22} {legacy:>12.0f} {direct:>12.0f} {direct / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROUTE_MIX = [
+    ("get item", 40),
+    ("list items by price", 20),
+    ("get cart", 15),
+    ("add to cart", 15),
+    ("list carts", 10),
+]
+
+
+def run_worker(items: int, carts: int, requests: int) -> None:
+    from fastapi.testclient import TestClient
+
+    from lecture_2.hw.shop_api.main import app
+
+    client = TestClient(app)
+    rng = random.Random(42)
+
+    item_ids = []
+    for start in range(0, items, 1_000):
+        rows = [{"name": f"item {i}", "price": rng.uniform(0, 1000)} for i in range(start, min(items, start + 1_000))]
+        item_ids.extend(result["item"]["id"] for result in client.post("/item/bulk", json=rows).json())
+    cart_ids = [client.post("/cart/").json()["id"] for _ in range(carts)]
+
+    actions = {
+        "get item": lambda: client.get(f"/item/{rng.choice(item_ids)}"),
+        "list items by price": lambda: client.get("/item/", params={"min_price": (low := rng.uniform(0, 900)),
+                                                                    "max_price": low + 100}),
+        "get cart": lambda: client.get(f"/cart/{rng.choice(cart_ids)}"),
+        "add to cart": lambda: client.post(f"/cart/{rng.choice(cart_ids)}/add/{rng.choice(item_ids)}"),
+        "list carts": lambda: client.get("/cart/", params={"min_quantity": 1}),
+    }
+    names = rng.choices([name for name, _ in ROUTE_MIX], weights=[weight for _, weight in ROUTE_MIX], k=requests)
+
+    started = time.perf_counter()
+    for name in names:
+        actions[name]()
+    elapsed = time.perf_counter() - started
+
+    print(f"{os.environ['SHOP_STORAGE']:>8}: {requests / elapsed:>8.0f} requests/s ({items} items, {carts} carts)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route mix throughput for the in-memory and SQLite storage")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--carts", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.items, args.carts, args.requests)
+        return
+
+    # storage is picked when the app is imported, so every backend gets a fresh interpreter
+    for storage in ["memory", "sqlite"]:
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, "SHOP_STORAGE": storage, "SHOP_SQLITE_PATH": os.path.join(directory, "shop.db")}
+            subprocess.run([sys.executable, "-m", __spec__.name, "--worker", "--items", str(args.items),
+                            "--carts", str(args.carts), "--requests", str(args.requests)], env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
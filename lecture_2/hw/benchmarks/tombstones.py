@@ -0,0 +1,43 @@
+import argparse
+import random
+import timeit
+from itertools import islice
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.repository import ItemRepository
+
+
+def legacy_query(item_table: dict, offset=0, limit=10):
+    # a single index over every item, testing the deleted flag of each one in turn
+    live = (item_entity for item_entity in item_table.values() if not item_entity.deleted)
+    return [Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted)
+            for item_entity in islice(live, offset, offset + limit)]
+
+
+def seed(size: int, deleted_share: float) -> tuple[ItemRepository, dict]:
+    repository = ItemRepository()
+    # the oldest items are the ones deleted, as in a catalogue with churn
+    repository.create_many([Item(name=f"item {i}", price=random.uniform(0, 1000), deleted=i < size * deleted_share)
+                            for i in range(size)])
+    legacy_table = {item_entity.id: item_entity for item_entity in repository.entities()}
+    return repository, legacy_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Default item listing with tombstones: flag scan vs live partition")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--deleted", type=float, nargs="+", default=[0.0, 0.5, 0.9, 0.99])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"{'deleted':>8} {'legacy, us':>12} {'partitioned, us':>16} {'speedup':>8}")
+    for deleted_share in args.deleted:
+        repository, legacy_table = seed(args.size, deleted_share)
+        legacy = timeit.timeit(lambda: legacy_query(legacy_table), number=args.repeat) / args.repeat
+        partitioned = timeit.timeit(lambda: repository.query(), number=args.repeat) / args.repeat
+        print(f"{deleted_share:>8.0%} {legacy * 1e6:>12.1f} {partitioned * 1e6:>16.1f} {legacy / partitioned:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
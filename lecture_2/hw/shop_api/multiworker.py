@@ -0,0 +1,33 @@
+import argparse
+import os
+import signal
+import sys
+
+import uvicorn
+
+from lecture_2.hw.shop_api.storage.factory import STORAGE_ENV
+from lecture_2.hw.shop_api.storage.shared import SHARED_CAPACITY_ENV, SHARED_NAME_ENV, shared_catalogue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shop API on several uvicorn workers sharing one item catalogue")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    name = f"shop_items_{os.getpid()}"
+    capacity = int(os.environ.get(SHARED_CAPACITY_ENV, 1_000_000))
+
+    # uvicorn re-raises the signal that stopped it; exiting through Python still unlinks the segment below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # this process owns the segment; the workers it spawns attach to it through the environment
+    with shared_catalogue(name, capacity):
+        os.environ[STORAGE_ENV] = "shared"
+        os.environ[SHARED_NAME_ENV] = name
+        uvicorn.run("lecture_2.hw.shop_api.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import json
+from http import HTTPStatus
+from typing import Any, List, Type, TypeVar
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+from lecture_2.hw.shop_api.routes.model import BulkRowResult
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+RowModel = TypeVar("RowModel", bound=BaseModel)
+
+
+class _MalformedRow:
+    """An NDJSON line that is not JSON; the lines around it are independent and still go through."""
+
+
+async def read_rows(request: Request) -> List[Any]:
+    """Reads a JSON array body, or an NDJSON body line by line as it streams in."""
+    if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+        return [_parse_line(line) async for line in _ndjson_lines(request) if line.strip()]
+
+    try:
+        rows = json.loads(await request.body())
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail="Body is not valid JSON")
+
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail="Body must be a JSON array")
+    return rows
+
+
+def validate_rows(rows: List[Any], model: Type[RowModel]) -> tuple[List[tuple[int, RowModel]], List[BulkRowResult]]:
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        if isinstance(row, _MalformedRow):
+            errors.append(BulkRowResult(index=index, status=HTTPStatus.UNPROCESSABLE_ENTITY,
+                                        detail="Line is not valid JSON"))
+            continue
+        try:
+            valid.append((index, model.model_validate(row)))
+        except ValidationError as e:
+            errors.append(BulkRowResult(index=index, status=HTTPStatus.UNPROCESSABLE_ENTITY,
+                                        detail=e.errors(include_url=False, include_context=False)))
+    return valid, errors
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return _MalformedRow()
+
+
+async def _ndjson_lines(request: Request):
+    tail = b""
+    async for chunk in request.stream():
+        *lines, tail = (tail + chunk).split(b"\n")
+        for line in lines:
+            yield line
+    yield tail
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from http import HTTPStatus
+from threading import Lock
+from typing import Callable, Hashable
+
+from fastapi import Response
+from prometheus_client import Counter
+
+from lecture_2.hw.shop_api.routes.serialization import json_response
+from lecture_2.hw.shop_api.storage import cart_repository, item_repository
+
+# entries; off by default over storage other processes write to, as invalidations reach this process only
+CACHE_SIZE_ENV = "SHOP_RESPONSE_CACHE_SIZE"
+CACHE_TTL_ENV = "SHOP_RESPONSE_CACHE_TTL"
+
+ITEM_CACHE = "item"
+CART_CACHE = "cart"
+
+CACHE_HITS = Counter("shop_response_cache_hits_total", "Responses served from the response cache", ["kind"])
+CACHE_MISSES = Counter("shop_response_cache_misses_total", "Response cache lookups that missed", ["kind"])
+CACHE_EVICTIONS = Counter("shop_response_cache_evictions_total", "Entries evicted by size or age", ["kind"])
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match compares weakly
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def etag_matches_strongly(etag: str, if_match: str) -> bool:
+    # If-Match compares strongly: weak validators never match
+    candidates = {candidate.strip() for candidate in if_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def conditional_response(cached: CachedResponse, if_none_match: str | None) -> Response:
+    if etag_matches(cached.etag, if_none_match):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"etag": cached.etag})
+    return json_response(cached.body, headers={"etag": cached.etag})
+
+
+class ResponseCache:
+    """Pre-serialized response bodies keyed by (kind, id), bounded by entry count (LRU) and age (TTL).
+
+    Writers call `invalidate` after a change is stored. A reader takes a `stamp()` before reading storage and
+    passes it to `put`, which drops the body if anything was invalidated meanwhile and the body may be stale.
+    """
+
+    max_entries: int
+    ttl: float
+    __clock: Callable[[], float]
+    __entries: OrderedDict[tuple[str, Hashable], CachedResponse]
+    __invalidations: int
+    __lock: Lock
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__invalidations = 0
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, kind: str, key: Hashable) -> CachedResponse | None:
+        with self.__lock:
+            cached = self.__entries.get((kind, key))
+            if cached is not None and cached.expires_at <= self.__clock():
+                del self.__entries[(kind, key)]
+                CACHE_EVICTIONS.labels(kind).inc()
+                cached = None
+
+            if cached is None:
+                CACHE_MISSES.labels(kind).inc()
+                return None
+
+            self.__entries.move_to_end((kind, key))
+        CACHE_HITS.labels(kind).inc()
+        return cached
+
+    def stamp(self) -> int:
+        return self.__invalidations
+
+    def put(self, kind: str, key: Hashable, body: bytes, stamp: int, etag: str | None = None) -> CachedResponse:
+        """Caches `body` unless an invalidation happened after `stamp`; returns it with its ETag either way.
+
+        The ETag is a hash of the body unless one is given.
+        """
+        cached = CachedResponse(body, etag or make_etag(body), self.__clock() + self.ttl)
+        if self.max_entries <= 0:
+            return cached
+
+        with self.__lock:
+            if stamp != self.__invalidations:
+                return cached
+
+            self.__entries[(kind, key)] = cached
+            self.__entries.move_to_end((kind, key))
+            while len(self.__entries) > self.max_entries:
+                (evicted_kind, _), _ = self.__entries.popitem(last=False)
+                CACHE_EVICTIONS.labels(evicted_kind).inc()
+        return cached
+
+    def invalidate(self, kind: str, *keys: Hashable) -> None:
+        with self.__lock:
+            self.__invalidations += 1
+            for key in keys:
+                self.__entries.pop((kind, key), None)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__invalidations += 1
+            self.__entries.clear()
+
+
+def default_cache_size() -> int:
+    if item_repository.shared_across_processes or cart_repository.shared_across_processes:
+        return 0
+    return 10_000
+
+
+response_cache = ResponseCache(max_entries=int(os.environ.get(CACHE_SIZE_ENV, default_cache_size())),
+                               ttl=float(os.environ.get(CACHE_TTL_ENV, 60)))
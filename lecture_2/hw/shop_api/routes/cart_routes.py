@@ -1,27 +1,24 @@
 from http import HTTPStatus
-from typing import List
+from typing import AsyncIterator, List, Optional
 
-from fastapi import HTTPException, APIRouter, Response, Query
+from fastapi import HTTPException, APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
 
-from lecture_2.hw.shop_api.routes.model import Cart
-from lecture_2.hw.shop_api.storage.repository import cart_repository, item_repository
+from lecture_2.hw.shop_api.routes.bulk import NDJSON_MEDIA_TYPE, read_rows, validate_rows
+from lecture_2.hw.shop_api.routes.cache import CART_CACHE, conditional_response, response_cache
+from lecture_2.hw.shop_api.routes.cursor import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from lecture_2.hw.shop_api.routes.model import BulkRowResult, Cart, CartBulkLine, CartBulkResponse, CartStats
+from lecture_2.hw.shop_api.routes.serialization import (dump_cart, dump_cart_stats, dump_carts, dump_carts_ndjson,
+                                                       json_response)
+from lecture_2.hw.shop_api.storage import async_cart_repository, async_item_repository
+from lecture_2.hw.shop_api.storage.base import CartEntity, PurgedItemError
 
 router = APIRouter(prefix="/cart")
 
+EXPORT_BATCH_SIZE = 1_000
 
-@router.post("/", status_code=HTTPStatus.CREATED, response_model=Cart)
-def create_cart(response: Response):
-    cart = cart_repository.create_cart()
-    response.headers['location'] = f"/cart/{cart.id}"
-    return Cart(id=cart.id, items=[], price=0)
-
-
-@router.get("/{cart_id}", response_model=Cart)
-def get_cart(cart_id: int):
-    cart = cart_repository.get_cart(cart_id)
-    if not cart:
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Cart not found")
 
+def to_cart(cart: CartEntity) -> Cart:
     return Cart(
         id=cart.id,
         items=[
@@ -32,59 +29,123 @@ def get_cart(cart_id: int):
                 available=cart_item.available()
             ) for cart_item in cart.items
         ],
-        price=cart.price()
+        price=cart.total_price
     )
 
 
+@router.post("/", status_code=HTTPStatus.CREATED, response_model=Cart)
+async def create_cart():
+    cart = await async_cart_repository.create_cart()
+    return json_response(dump_cart(cart), status_code=HTTPStatus.CREATED, headers={"location": f"/cart/{cart.id}"})
+
+
+@router.get("/stats", response_model=CartStats)
+async def get_cart_stats():
+    return json_response(dump_cart_stats(await async_cart_repository.stats()))
+
+
+@router.get("/export")
+async def export_carts(
+        min_price: float = Query(None, ge=0),
+        max_price: float = Query(None, ge=0),
+        min_quantity: int = Query(None, ge=0),
+        max_quantity: int = Query(None, ge=0)):
+    """Every matching cart as NDJSON in id order, streamed one batch at a time."""
+    return StreamingResponse(_export_batches(min_price, max_price, min_quantity, max_quantity),
+                             media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/{cart_id}", response_model=Cart)
+async def get_cart(cart_id: int, if_none_match: Optional[str] = Header(None)):
+    cached = response_cache.get(CART_CACHE, cart_id)
+    if cached is None:
+        stamp = response_cache.stamp()
+        cart = await async_cart_repository.get_cart(cart_id)
+        if not cart:
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Cart not found")
+
+        cached = response_cache.put(CART_CACHE, cart_id, dump_cart(cart), stamp)
+
+    return conditional_response(cached, if_none_match)
+
+
 @router.post("/{cart_id}/add/{item_id}", response_model=Cart)
-def add_item_to_cart(cart_id: int, item_id: int, quantity: int = 1):
-    item = item_repository.get(item_id)
+async def add_item_to_cart(cart_id: int, item_id: int, quantity: int = 1):
+    item = await async_item_repository.get_entity(item_id)
     if not item:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Item not found")
 
-    cart = cart_repository.add_item_to_cart(cart_id, item, quantity)
+    try:
+        cart = await async_cart_repository.add_item_to_cart(cart_id, item, quantity)
+    except PurgedItemError:
+        # compaction purged the item after it was read
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Item not found")
+    response_cache.invalidate(CART_CACHE, cart_id)
+
+    return json_response(dump_cart(cart))
 
-    return Cart(
-        id=cart.id,
-        items=[
-            Cart.Item(
-                id=cart_item.item.id,
-                name=cart_item.item.name,
-                quantity=cart_item.quantity,
-                available=cart_item.available()
-            ) for cart_item in cart.items
-        ],
-        price=cart.price()
-    )
+
+@router.post("/{cart_id}/add-bulk", response_model=CartBulkResponse)
+async def add_items_to_cart_bulk(cart_id: int, request: Request):
+    if not await async_cart_repository.get_cart(cart_id):
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Cart not found")
+
+    lines, invalid_results = validate_rows(await read_rows(request), CartBulkLine)
+
+    while True:
+        items = await async_item_repository.get_entities([line.item_id for _, line in lines])
+
+        resolved_lines, results = [], list(invalid_results)
+        for (index, line), item in zip(lines, items):
+            if not item:
+                results.append(BulkRowResult(index=index, status=HTTPStatus.NOT_FOUND, detail="Item not found"))
+                continue
+
+            resolved_lines.append((item, line.quantity))
+            results.append(BulkRowResult(index=index, status=HTTPStatus.OK))
+
+        try:
+            cart = await async_cart_repository.add_items_to_cart(cart_id, resolved_lines)
+            break
+        except PurgedItemError:
+            # compaction purged some items after they were read and nothing was added: look them up again
+            continue
+    response_cache.invalidate(CART_CACHE, cart_id)
+
+    return CartBulkResponse(cart=to_cart(cart), results=sorted(results, key=lambda result: result.index))
 
 
 @router.get("/", response_model=List[Cart])
-def list_carts(
+async def list_carts(
         offset: int = Query(0, ge=0),
         limit: int = Query(10, gt=0),
         min_price: float = Query(None, ge=0),
         max_price: float = Query(None, ge=0),
         min_quantity: int = Query(None, ge=0),
-        max_quantity: int = Query(None, ge=0)):
-    carts = cart_repository.query_carts(offset=offset,
-                                        limit=limit,
-                                        min_price=min_price,
-                                        max_price=max_price,
-                                        min_quantity=min_quantity,
-                                        max_quantity=max_quantity)
-
-    return [
-        Cart(
-            id=cart.id,
-            items=[
-                Cart.Item(
-                    id=cart_item.item.id,
-                    name=cart_item.item.name,
-                    quantity=cart_item.quantity,
-                    available=cart_item.available()
-                ) for cart_item in cart.items
-            ],
-            price=cart.price()
-        )
-        for cart in carts
-    ]
+        max_quantity: int = Query(None, ge=0),
+        cursor: Optional[str] = None):
+    after_id = decode_cursor(cursor, int)[0] if cursor else None
+    carts = await async_cart_repository.query_carts(offset=offset,
+                                                    limit=limit,
+                                                    min_price=min_price,
+                                                    max_price=max_price,
+                                                    min_quantity=min_quantity,
+                                                    max_quantity=max_quantity,
+                                                    after_id=after_id)
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(carts[-1].id)} if len(carts) == limit else None
+
+    return json_response(dump_carts(carts), headers=headers)
+
+
+async def _export_batches(min_price: float | None, max_price: float | None, min_quantity: int | None,
+                          max_quantity: int | None) -> AsyncIterator[bytes]:
+    after_id = None
+    while True:
+        carts = await async_cart_repository.query_carts(limit=EXPORT_BATCH_SIZE, min_price=min_price,
+                                                        max_price=max_price, min_quantity=min_quantity,
+                                                        max_quantity=max_quantity, after_id=after_id)
+        if carts:
+            yield dump_carts_ndjson(carts)
+        if len(carts) < EXPORT_BATCH_SIZE:
+            return
+        after_id = carts[-1].id
@@ -0,0 +1,20 @@
+import base64
+import binascii
+from http import HTTPStatus
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "x-next-cursor"
+
+
+def encode_cursor(*key: float | int) -> str:
+    raw = ":".join(repr(part) for part in key)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        return tuple(type_(part) for type_, part in zip(types, raw.split(":"), strict=True))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail="Invalid cursor")
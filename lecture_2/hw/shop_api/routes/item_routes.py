@@ -1,76 +1,178 @@
 from http import HTTPStatus
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
-from fastapi import HTTPException, APIRouter, Query, Response
+from fastapi import HTTPException, APIRouter, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
-from lecture_2.hw.shop_api.routes.model import Item, ItemPatchRequest, ItemPutRequest
-from lecture_2.hw.shop_api.storage.repository import item_repository
+from lecture_2.hw.shop_api.routes.bulk import NDJSON_MEDIA_TYPE, read_rows, validate_rows
+from lecture_2.hw.shop_api.routes.cache import (CART_CACHE, ITEM_CACHE, conditional_response, etag_matches_strongly,
+                                               response_cache)
+from lecture_2.hw.shop_api.routes.cursor import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from lecture_2.hw.shop_api.routes.model import BulkRowResult, Item, ItemPatchRequest, ItemPutRequest
+from lecture_2.hw.shop_api.routes.serialization import dump_item, dump_items, dump_items_ndjson, json_response
+from lecture_2.hw.shop_api.storage import async_cart_repository, async_item_repository
+from lecture_2.hw.shop_api.storage.base import VersionConflictError
 
 router = APIRouter(prefix="/item")
 
+EXPORT_BATCH_SIZE = 1_000
+
+
+def item_etag(item: Item) -> str:
+    return f'"v{item.version}"'
+
+
+def expected_version(item: Item, if_match: str | None) -> int | None:
+    """The version an `If-Match` update must still find stored, or None without the header."""
+    if if_match is None:
+        return None
+    if not etag_matches_strongly(item_etag(item), if_match):
+        raise HTTPException(status_code=HTTPStatus.PRECONDITION_FAILED, detail="Item was modified")
+    return item.version
+
+
+async def update_item(item: Item, version: int | None) -> Item:
+    try:
+        updated_item = await async_item_repository.update(item, version)
+    except VersionConflictError:
+        # another writer got in between the read and this compare-and-swap
+        raise HTTPException(status_code=HTTPStatus.PRECONDITION_FAILED, detail="Item was modified")
+    await invalidate_item(item.id)
+    return updated_item
+
+
+async def invalidate_item(item_id: int) -> None:
+    # cart responses embed item names and prices
+    response_cache.invalidate(ITEM_CACHE, item_id)
+    response_cache.invalidate(CART_CACHE, *await async_cart_repository.carts_with_item(item_id))
+
 
 @router.post("/", status_code=HTTPStatus.CREATED, response_model=Item)
-def create_item(item: Item):
-    created_item = item_repository.create(Item(id=0, name=item.name, price=item.price, deleted=False))
-    return Item(id=created_item.id, name=created_item.name, price=created_item.price,
-                deleted=created_item.deleted)
+async def create_item(item: Item):
+    created_item = await async_item_repository.create(Item(id=0, name=item.name, price=item.price, deleted=False))
+    return json_response(dump_item(created_item), status_code=HTTPStatus.CREATED,
+                         headers={"etag": item_etag(created_item)})
+
+
+@router.post("/bulk", response_model=List[BulkRowResult])
+async def create_items_bulk(request: Request):
+    rows, results = validate_rows(await read_rows(request), ItemPutRequest)
+
+    created_items = await async_item_repository.create_many(
+        [Item(id=0, name=row.name, price=row.price, deleted=False) for _, row in rows])
+    results.extend(BulkRowResult(index=index, status=HTTPStatus.CREATED, item=created_item)
+                   for (index, _), created_item in zip(rows, created_items))
+
+    return sorted(results, key=lambda result: result.index)
+
+
+@router.get("/export")
+async def export_items(
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        show_deleted: bool = False):
+    """Every matching item as NDJSON, in the order of `GET /item/`, streamed one batch at a time."""
+    return StreamingResponse(_export_batches(min_price, max_price, show_deleted), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/search", response_model=List[Item])
+async def search_items(
+        q: str,
+        offset: int = Query(0, ge=0),
+        limit: int = Query(10, gt=0),
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        show_deleted: bool = False):
+    """Items with a name word for every word of `q`, the last one matching as a prefix (search as you type)."""
+    items = await async_item_repository.search(q, offset=offset, limit=limit, min_price=min_price,
+                                               max_price=max_price, show_deleted=show_deleted)
+    return json_response(dump_items(items))
 
 
 @router.get("/{item_id}", response_model=Item)
-def get_item(item_id: int):
-    item = item_repository.get(item_id)
-    if not item or item.deleted:
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Item not found")
+async def get_item(item_id: int, if_none_match: Optional[str] = Header(None)):
+    cached = response_cache.get(ITEM_CACHE, item_id)
+    if cached is None:
+        stamp = response_cache.stamp()
+        item = await async_item_repository.get(item_id)
+        if not item or item.deleted:
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Item not found")
+
+        cached = response_cache.put(ITEM_CACHE, item_id, dump_item(item), stamp, item_etag(item))
 
-    return Item(id=item.id, name=item.name, price=item.price, deleted=item.deleted)
+    return conditional_response(cached, if_none_match)
 
 
 @router.get("/", response_model=List[Item])
-def list_items(
+async def list_items(
         offset: int = Query(0, ge=0),
         limit: int = Query(10, gt=0),
         min_price: Optional[float] = Query(None, ge=0),
         max_price: Optional[float] = Query(None, ge=0),
-        show_deleted: bool = False):
-    items = item_repository.query(offset=offset, limit=limit, min_price=min_price, max_price=max_price,
-                                  show_deleted=show_deleted)
-    return [Item(id=item.id, name=item.name, price=item.price, deleted=item.deleted) for item in items]
+        show_deleted: bool = False,
+        cursor: Optional[str] = None):
+    after = decode_cursor(cursor, float, int) if cursor else None
+    items = await async_item_repository.query(offset=offset, limit=limit, min_price=min_price, max_price=max_price,
+                                              show_deleted=show_deleted, after=after)
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(items[-1].price, items[-1].id)} if len(items) == limit else None
+
+    return json_response(dump_items(items), headers=headers)
 
 
 @router.put("/{item_id}", response_model=Item)
-def put_item(item_id: int, item_put_request: ItemPutRequest):
-    item = item_repository.get(item_id)
+async def put_item(item_id: int, item_put_request: ItemPutRequest, if_match: Optional[str] = Header(None)):
+    item = await async_item_repository.get(item_id)
     if not item:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Item not found")
 
-    updated_item = item_repository.update(
-        Item(id=item_id, name=item_put_request.name, price=item_put_request.price, deleted=item.deleted))
+    updated_item = await update_item(
+        Item(id=item_id, name=item_put_request.name, price=item_put_request.price, deleted=item.deleted),
+        expected_version(item, if_match))
 
-    return updated_item
+    return json_response(dump_item(updated_item), headers={"etag": item_etag(updated_item)})
 
 
 @router.patch("/{item_id}", response_model=Item)
-def patch_item(response: Response, item_id: int, item_patch_request: ItemPatchRequest):
-    item = item_repository.get(item_id)
+async def patch_item(item_id: int, item_patch_request: ItemPatchRequest, if_match: Optional[str] = Header(None)):
+    item = await async_item_repository.get(item_id)
     if not item:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Item not found")
 
     if item.deleted:
-        response.status_code = HTTPStatus.NOT_MODIFIED
-        return item
+        # a 304 carries no body
+        return Response(status_code=HTTPStatus.NOT_MODIFIED)
 
-    updated_item = item_repository.update(
-        Item(id=item_id, name=item_patch_request.name, price=item_patch_request.price, deleted=item.deleted))
+    updated_item = await update_item(
+        Item(id=item_id,
+             name=item_patch_request.name if item_patch_request.name is not None else item.name,
+             price=item_patch_request.price if item_patch_request.price is not None else item.price,
+             deleted=item.deleted),
+        expected_version(item, if_match))
 
-    return updated_item
+    return json_response(dump_item(updated_item), headers={"etag": item_etag(updated_item)})
 
 
 @router.delete("/{item_id}")
-def delete_item(item_id: int):
-    item_to_delete = item_repository.get(item_id)
+async def delete_item(item_id: int, if_match: Optional[str] = Header(None)):
+    item_to_delete = await async_item_repository.get(item_id)
     if not item_to_delete:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Item not found")
 
+    version = expected_version(item_to_delete, if_match)
     item_to_delete.deleted = True
-    item_repository.update(item_to_delete)
+    await update_item(item_to_delete, version)
     return {"message": "Item marked as deleted"}
+
+
+async def _export_batches(min_price: float | None, max_price: float | None,
+                          show_deleted: bool) -> AsyncIterator[bytes]:
+    # keyset pages: each batch costs the same however deep the export is
+    after = None
+    while True:
+        items = await async_item_repository.query(limit=EXPORT_BATCH_SIZE, min_price=min_price, max_price=max_price,
+                                                  show_deleted=show_deleted, after=after)
+        if items:
+            yield dump_items_ndjson(items)
+        if len(items) < EXPORT_BATCH_SIZE:
+            return
+        after = (items[-1].price, items[-1].id)
@@ -1,7 +1,7 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Annotated, Any, List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 @dataclass
@@ -10,6 +10,8 @@ class Item:
     name: str = None
     price: float = None
     deleted: bool = None
+    # sent as the ETag rather than in the body, and not part of equality
+    version: Annotated[int, Field(exclude=True)] = field(default=None, compare=False)
 
 
 @dataclass
@@ -26,6 +28,26 @@ class Cart:
     price: float = None
 
 
+@dataclass
+class HistogramBucket:
+    # None for the last, unbounded bucket
+    upper_bound: float | None = None
+    count: int = None
+
+
+@dataclass
+class CartStats:
+    count: int = None
+    total_price: float = None
+    mean_price: float = None
+    # estimated from the price histogram, keyed "p50", "p90", "p99"
+    price_percentiles: dict[str, float] = None
+    total_quantity: int = None
+    mean_quantity: float = None
+    price_histogram: List[HistogramBucket] = None
+    quantity_histogram: List[HistogramBucket] = None
+
+
 @dataclass
 class ItemPutRequest(BaseModel):
     name: str = Field(..., min_length=1, description="Name must be at least 1 character long")
@@ -42,3 +64,24 @@ class ItemPatchRequest(BaseModel):
 
     class Config:
         extra = "forbid"
+
+
+@dataclass
+class BulkRowResult:
+    index: int = None
+    status: int = None
+    item: Item = None
+    detail: Any = None
+
+
+@dataclass
+class CartBulkResponse:
+    cart: Cart = None
+    results: List[BulkRowResult] = None
+
+
+class CartBulkLine(BaseModel):
+    item_id: int
+    quantity: int = Field(1, gt=0)
+
+    model_config = ConfigDict(extra="forbid")
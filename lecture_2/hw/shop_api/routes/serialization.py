@@ -0,0 +1,66 @@
+from http import HTTPStatus
+from typing import List, Mapping
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+from lecture_2.hw.shop_api.routes.model import CartStats, Item
+from lecture_2.hw.shop_api.storage.base import CartEntity
+
+JSON_MEDIA_TYPE = "application/json"
+
+# built once at import: dumping through a prepared adapter skips FastAPI's per-request
+# response_model validation and the intermediate copies the handlers used to make
+ITEM_ADAPTER = TypeAdapter(Item)
+ITEMS_ADAPTER = TypeAdapter(List[Item])
+CART_STATS_ADAPTER = TypeAdapter(CartStats)
+
+
+def json_response(content: bytes, status_code: int = HTTPStatus.OK,
+                  headers: Mapping[str, str] | None = None) -> Response:
+    return Response(content=content, status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def dump_item(item: Item) -> bytes:
+    return ITEM_ADAPTER.dump_json(item)
+
+
+def dump_items(items: List[Item]) -> bytes:
+    return ITEMS_ADAPTER.dump_json(items)
+
+
+def dump_items_ndjson(items: List[Item]) -> bytes:
+    return b"".join(ITEM_ADAPTER.dump_json(item) + b"\n" for item in items)
+
+
+def cart_payload(cart: CartEntity) -> dict:
+    """The `Cart` response shape built straight from the entity, without `Cart`/`Cart.Item` objects."""
+    return {
+        "id": cart.id,
+        "items": [
+            {
+                "id": cart_item.item.id,
+                "name": cart_item.item.name,
+                "quantity": cart_item.quantity,
+                "available": not cart_item.item.deleted,
+            } for cart_item in cart.items
+        ],
+        "price": float(cart.total_price),
+    }
+
+
+def dump_cart(cart: CartEntity) -> bytes:
+    return to_json(cart_payload(cart))
+
+
+def dump_carts(carts: List[CartEntity]) -> bytes:
+    return to_json([cart_payload(cart) for cart in carts])
+
+
+def dump_carts_ndjson(carts: List[CartEntity]) -> bytes:
+    return b"".join(to_json(cart_payload(cart)) + b"\n" for cart in carts)
+
+
+def dump_cart_stats(stats: CartStats) -> bytes:
+    return CART_STATS_ADAPTER.dump_json(stats)
@@ -0,0 +1,5 @@
+from lecture_2.hw.shop_api.storage.aio import AsyncCartRepository, AsyncItemRepository
+from lecture_2.hw.shop_api.storage.factory import create_repositories
+
+item_repository, cart_repository = create_repositories()
+async_item_repository, async_cart_repository = AsyncItemRepository(item_repository), AsyncCartRepository(cart_repository)
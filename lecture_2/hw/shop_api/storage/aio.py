@@ -0,0 +1,170 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, List, TypeVar
+
+from lecture_2.hw.shop_api.routes.model import CartStats, Item
+from lecture_2.hw.shop_api.storage.base import CartEntity, CartStorage, ItemEntity, ItemStorage
+
+T = TypeVar("T")
+
+
+class AsyncItemStorage(ABC):
+    """`ItemStorage` for `async def` handlers; natively async backends implement it directly."""
+
+    @abstractmethod
+    async def create(self, item: Item) -> Item:
+        ...
+
+    @abstractmethod
+    async def create_many(self, items: List[Item]) -> List[Item]:
+        ...
+
+    @abstractmethod
+    async def get(self, item_id: int) -> Item | None:
+        ...
+
+    @abstractmethod
+    async def get_entity(self, item_id: int) -> ItemEntity | None:
+        ...
+
+    @abstractmethod
+    async def get_entities(self, item_ids: List[int]) -> List[ItemEntity | None]:
+        ...
+
+    @abstractmethod
+    async def query(self, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+                    show_deleted=False, after: tuple[float, int] | None = None) -> List[Item]:
+        ...
+
+    @abstractmethod
+    async def search(self, query: str, offset=0, limit=10, min_price: float | None = None,
+                     max_price: float | None = None, show_deleted=False) -> List[Item]:
+        ...
+
+    @abstractmethod
+    async def update(self, item: Item, expected_version: int | None = None) -> Item:
+        ...
+
+
+class AsyncCartStorage(ABC):
+    """`CartStorage` for `async def` handlers; natively async backends implement it directly."""
+
+    @abstractmethod
+    async def create_cart(self) -> CartEntity:
+        ...
+
+    @abstractmethod
+    async def get_cart(self, cart_id: int) -> CartEntity | None:
+        ...
+
+    @abstractmethod
+    async def add_item_to_cart(self, cart_id: int, item: ItemEntity, quantity: int = 1) -> CartEntity:
+        ...
+
+    @abstractmethod
+    async def add_items_to_cart(self, cart_id: int, lines: List[tuple[ItemEntity, int]]) -> CartEntity:
+        ...
+
+    @abstractmethod
+    async def carts_with_item(self, item_id: int) -> List[int]:
+        ...
+
+    @abstractmethod
+    async def stats(self) -> CartStats:
+        ...
+
+    @abstractmethod
+    async def query_carts(self, offset: int = 0, limit: int = 10, min_price: float = None, max_price: float = None,
+                          min_quantity: int = None, max_quantity: int = None,
+                          after_id: int = None) -> List[CartEntity]:
+        ...
+
+
+async def run_inline(function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return function(*args, **kwargs)
+
+
+def runner(storage: ItemStorage | CartStorage, writes: bool = False) -> Callable[..., Awaitable[Any]]:
+    # in-memory calls are a few dict operations, cheaper than any thread handoff;
+    # blocking backends are moved off the event loop
+    blocking = storage.blocking or (writes and storage.blocking_writes)
+    return asyncio.to_thread if blocking else run_inline
+
+
+class AsyncItemRepository(AsyncItemStorage):
+    """Adapts a synchronous `ItemStorage`."""
+
+    storage: ItemStorage
+    __run: Callable[..., Awaitable[Any]]
+    __run_write: Callable[..., Awaitable[Any]]
+
+    def __init__(self, storage: ItemStorage):
+        self.storage = storage
+        self.__run = runner(storage)
+        self.__run_write = runner(storage, writes=True)
+
+    async def create(self, item: Item) -> Item:
+        return await self.__run_write(self.storage.create, item)
+
+    async def create_many(self, items: List[Item]) -> List[Item]:
+        return await self.__run_write(self.storage.create_many, items)
+
+    async def get(self, item_id: int) -> Item | None:
+        return await self.__run(self.storage.get, item_id)
+
+    async def get_entity(self, item_id: int) -> ItemEntity | None:
+        return await self.__run(self.storage.get_entity, item_id)
+
+    async def get_entities(self, item_ids: List[int]) -> List[ItemEntity | None]:
+        return await self.__run(self.storage.get_entities, item_ids)
+
+    async def query(self, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+                    show_deleted=False, after: tuple[float, int] | None = None) -> List[Item]:
+        return await self.__run(self.storage.query, offset=offset, limit=limit, min_price=min_price,
+                                max_price=max_price, show_deleted=show_deleted, after=after)
+
+    async def search(self, query: str, offset=0, limit=10, min_price: float | None = None,
+                     max_price: float | None = None, show_deleted=False) -> List[Item]:
+        return await self.__run(self.storage.search, query, offset=offset, limit=limit, min_price=min_price,
+                                max_price=max_price, show_deleted=show_deleted)
+
+    async def update(self, item: Item, expected_version: int | None = None) -> Item:
+        return await self.__run_write(self.storage.update, item, expected_version)
+
+
+class AsyncCartRepository(AsyncCartStorage):
+    """Adapts a synchronous `CartStorage`."""
+
+    storage: CartStorage
+    __run: Callable[..., Awaitable[Any]]
+    __run_write: Callable[..., Awaitable[Any]]
+
+    def __init__(self, storage: CartStorage):
+        self.storage = storage
+        self.__run = runner(storage)
+        self.__run_write = runner(storage, writes=True)
+
+    async def create_cart(self) -> CartEntity:
+        return await self.__run_write(self.storage.create_cart)
+
+    async def get_cart(self, cart_id: int) -> CartEntity | None:
+        return await self.__run(self.storage.get_cart, cart_id)
+
+    async def add_item_to_cart(self, cart_id: int, item: ItemEntity, quantity: int = 1) -> CartEntity:
+        return await self.__run_write(self.storage.add_item_to_cart, cart_id, item, quantity)
+
+    async def add_items_to_cart(self, cart_id: int, lines: List[tuple[ItemEntity, int]]) -> CartEntity:
+        return await self.__run_write(self.storage.add_items_to_cart, cart_id, lines)
+
+    async def carts_with_item(self, item_id: int) -> List[int]:
+        return await self.__run(self.storage.carts_with_item, item_id)
+
+    async def stats(self) -> CartStats:
+        return await self.__run(self.storage.stats)
+
+    async def query_carts(self, offset: int = 0, limit: int = 10, min_price: float = None, max_price: float = None,
+                          min_quantity: int = None, max_quantity: int = None,
+                          after_id: int = None) -> List[CartEntity]:
+        return await self.__run(self.storage.query_carts, offset=offset, limit=limit, min_price=min_price,
+                                max_price=max_price, min_quantity=min_quantity, max_quantity=max_quantity,
+                                after_id=after_id)
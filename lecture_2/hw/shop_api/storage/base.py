@@ -0,0 +1,173 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from lecture_2.hw.shop_api.routes.model import CartStats, Item
+
+
+@dataclass(slots=True)
+class ItemEntity:
+    id: int
+    name: str
+    price: float
+    deleted: bool
+    # starts at 1 and grows by one with every update
+    version: int = 1
+
+
+@dataclass(slots=True)
+class CartItemEntity:
+    id: int
+    item: ItemEntity
+    quantity: int
+    unit_price: float = 0
+
+    def available(self) -> bool:
+        return not self.item.deleted
+
+
+@dataclass(slots=True)
+class CartEntity:
+    id: int
+    items: List[CartItemEntity]
+    total_price: float = 0
+    total_quantity: int = 0
+    items_by_item_id: dict[int, CartItemEntity] = field(default_factory=dict)
+
+
+class VersionConflictError(Exception):
+    """The item was updated since the version the caller expected."""
+
+
+class PurgedItemError(Exception):
+    """The item was purged, so no cart line may refer to it."""
+
+
+ItemUpdateListener = Callable[[ItemEntity, float, bool], None]
+# (method, rows scanned, rows returned)
+ScanObserver = Callable[[str, int, int], None]
+
+
+class ItemStorage(ABC):
+    # whether calls wait on I/O and so must not run on the event loop
+    blocking: bool = False
+    # the same for writes only, while reads stay in memory
+    blocking_writes: bool = False
+    # whether other processes write to it too, so per-process caches of what it holds go stale
+    shared_across_processes: bool = False
+    # set by instrumentation; storages that can count the rows a query visits report them here
+    scan_observer: ScanObserver | None = None
+
+    __update_listeners: list[ItemUpdateListener]
+
+    def __init__(self):
+        self.__update_listeners = []
+
+    def add_update_listener(self, listener: ItemUpdateListener) -> None:
+        """`listener` is called with the updated entity and its previous price and deleted flag."""
+        self.__update_listeners.append(listener)
+
+    def _notify_updated(self, item_entity: ItemEntity, old_price: float, old_deleted: bool) -> None:
+        if old_price != item_entity.price or old_deleted != item_entity.deleted:
+            for listener in self.__update_listeners:
+                listener(item_entity, old_price, old_deleted)
+
+    @abstractmethod
+    def create(self, item: Item) -> Item:
+        ...
+
+    @abstractmethod
+    def create_many(self, items: List[Item]) -> List[Item]:
+        ...
+
+    @abstractmethod
+    def get(self, item_id: int) -> Item | None:
+        ...
+
+    @abstractmethod
+    def get_entity(self, item_id: int) -> ItemEntity | None:
+        ...
+
+    @abstractmethod
+    def get_entities(self, item_ids: List[int]) -> List[ItemEntity | None]:
+        """The entity of every id in `item_ids`, in that order; None for ids not stored."""
+
+    @abstractmethod
+    def query(self, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+              show_deleted=False, after: tuple[float, int] | None = None) -> List[Item]:
+        """Items ordered by id, or by (price, id) when a price bound is given.
+
+        `after` is the (price, id) of the last item of the previous page.
+        """
+
+    @abstractmethod
+    def search(self, query: str, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+               show_deleted=False) -> List[Item]:
+        """Items whose names hold every word of `query` but the last, and a word starting with the last one.
+
+        Words are compared case-insensitively. Items are ordered by the smallest name word the last query word
+        is a prefix of, then by id.
+        """
+
+    @abstractmethod
+    def update(self, item: Item, expected_version: int | None = None) -> Item:
+        """Stores `item` and bumps its version.
+
+        With `expected_version`, the update is a compare-and-swap: it raises `VersionConflictError`
+        unless the stored version is still `expected_version`.
+        """
+
+    @abstractmethod
+    def purge_deleted(self, is_referenced: Callable[[int], bool]) -> List[int]:
+        """Drops deleted items for which `is_referenced(item_id)` is false and returns their ids.
+
+        Purged ids are never handed out again.
+        """
+
+
+class CartStorage(ABC):
+    blocking: bool = False
+    blocking_writes: bool = False
+    shared_across_processes: bool = False
+    scan_observer: ScanObserver | None = None
+
+    @abstractmethod
+    def create_cart(self) -> CartEntity:
+        ...
+
+    @abstractmethod
+    def get_cart(self, cart_id: int) -> CartEntity | None:
+        ...
+
+    @abstractmethod
+    def add_item_to_cart(self, cart_id: int, item: ItemEntity, quantity: int = 1) -> CartEntity:
+        ...
+
+    @abstractmethod
+    def add_items_to_cart(self, cart_id: int, lines: List[tuple[ItemEntity, int]]) -> CartEntity:
+        ...
+
+    @abstractmethod
+    def references_item(self, item_id: int) -> bool:
+        """Whether any cart holds a line for the item."""
+
+    @abstractmethod
+    def retire_item(self, item_id: int) -> bool:
+        """Unless some cart holds a line for the item, refuses new lines for it from now on and returns true.
+
+        Compaction purges only retired items, so a line added while it runs either keeps the item or fails with
+        `PurgedItemError`.
+        """
+
+    @abstractmethod
+    def carts_with_item(self, item_id: int) -> List[int]:
+        """Ids of the carts holding a line for the item."""
+
+    @abstractmethod
+    def stats(self) -> CartStats:
+        """Count, totals, price percentiles and histograms over all carts."""
+
+    @abstractmethod
+    def query_carts(self, offset: int = 0, limit: int = 10, min_price: float = None, max_price: float = None,
+                    min_quantity: int = None, max_quantity: int = None, after_id: int = None) -> List[CartEntity]:
+        """Carts ordered by id; `after_id` is the id of the last cart of the previous page."""
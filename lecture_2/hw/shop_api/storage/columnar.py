@@ -0,0 +1,223 @@
+from array import array
+from heapq import nsmallest
+from itertools import compress, count, islice
+from threading import Lock
+from typing import Callable, Iterable, List
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.base import ItemEntity, ItemStorage, VersionConflictError
+from lecture_2.hw.shop_api.storage.index import NameIndex
+
+try:
+    import numpy
+except ImportError:  # optional: without it the same columns are filtered by plain loops
+    numpy = None
+
+LIVE, DELETED, PURGED = 0, 1, 2
+
+
+class ColumnarItemRepository(ItemStorage):
+    """Items kept as typed columns indexed by `id - 1` instead of one `ItemEntity` per row.
+
+    Prices are an `array('d')`, states a `bytearray` and names an append-only UTF-8 arena, so an item costs
+    a few dozen bytes. Filters are evaluated over whole columns (one NumPy mask when NumPy is installed) and
+    only the requested page is turned into `Item` objects; there is no price index to maintain. The name index
+    that search needs costs several times the columns, so it is built by the first search only.
+    Entities handed out are copies, so carts learn about changes through the update listeners only.
+    """
+
+    __prices: array
+    __states: bytearray
+    __versions: array
+    __name_offsets: array
+    __name_lengths: array
+    __names: bytearray
+    __name_index: NameIndex | None
+    __lock: Lock
+
+    def __init__(self):
+        super().__init__()
+        self.__prices = array("d")
+        self.__states = bytearray()
+        self.__versions = array("Q")
+        self.__name_offsets = array("Q")
+        self.__name_lengths = array("I")
+        self.__names = bytearray()
+        self.__name_index = None
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.__states)
+
+    def __append_name(self, name: str) -> tuple[int, int]:
+        encoded = name.encode()
+        offset = len(self.__names)
+        self.__names += encoded
+        return offset, len(encoded)
+
+    def __name(self, row: int) -> str:
+        offset = self.__name_offsets[row]
+        return self.__names[offset:offset + self.__name_lengths[row]].decode()
+
+    def __item(self, row: int) -> Item:
+        return Item(row + 1, self.__name(row), self.__prices[row], self.__states[row] == DELETED, self.__versions[row])
+
+    def __row(self, item_id: int) -> int | None:
+        row = item_id - 1
+        if 0 <= row < len(self.__states) and self.__states[row] != PURGED:
+            return row
+        return None
+
+    def create(self, item: Item) -> Item:
+        return self.create_many([item])[0]
+
+    def create_many(self, items: List[Item]) -> List[Item]:
+        with self.__lock:
+            first_id = len(self.__states) + 1
+            for item_id, item in enumerate(items, first_id):
+                offset, length = self.__append_name(item.name)
+                self.__name_offsets.append(offset)
+                self.__name_lengths.append(length)
+                if self.__name_index is not None:
+                    self.__name_index.add(item_id, item.name)
+            self.__prices.extend(item.price for item in items)
+            self.__states.extend(DELETED if item.deleted else LIVE for item in items)
+            self.__versions.extend(1 for _ in items)
+
+        for item_id, item in enumerate(items, first_id):
+            item.id, item.version = item_id, 1
+        return items
+
+    def get(self, item_id: int) -> Item | None:
+        with self.__lock:
+            row = self.__row(item_id)
+            return self.__item(row) if row is not None else None
+
+    def get_entity(self, item_id: int) -> ItemEntity | None:
+        item = self.get(item_id)
+        if item is None:
+            return None
+        return ItemEntity(item.id, item.name, item.price, item.deleted, item.version)
+
+    def get_entities(self, item_ids: List[int]) -> List[ItemEntity | None]:
+        with self.__lock:
+            items = [self.__item(row) if row is not None else None for row in map(self.__row, item_ids)]
+        return [ItemEntity(item.id, item.name, item.price, item.deleted, item.version) if item is not None else None
+                for item in items]
+
+    def query(self, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+              show_deleted=False, after: tuple[float, int] | None = None) -> List[Item]:
+        with self.__lock:
+            if min_price is None and max_price is None:
+                start = after[1] if after is not None else 0
+                rows = self.__rows_by_id(start, show_deleted, offset + limit)
+            else:
+                start = 0
+                rows = self.__rows_by_price(min_price, max_price, after, show_deleted, offset + limit)
+            items = [self.__item(row) for row in islice(rows, offset, offset + limit)]
+            size = len(self.__states)
+
+        if self.scan_observer is not None:
+            # the rows the filter covers: whole columns, except that an id listing starts at its cursor
+            self.scan_observer("query", max(size - start, 0), len(items))
+        return items
+
+    def __rows_by_id(self, start: int, show_deleted: bool, count: int) -> Iterable[int]:
+        """Rows from `start` on in id order; `start` is the last id of the previous page, i.e. the first row."""
+        max_state = DELETED if show_deleted else LIVE
+        if numpy is not None:
+            states = numpy.frombuffer(self.__states, dtype=numpy.uint8)[start:]
+            return (numpy.flatnonzero(states <= max_state)[:count] + start).tolist()
+
+        states = self.__states
+        return (row for row in range(start, len(states)) if states[row] <= max_state)
+
+    def __rows_by_price(self, min_price: float | None, max_price: float | None, after: tuple[float, int] | None,
+                        show_deleted: bool, count: int) -> Iterable[int]:
+        """The first `count` matching rows in (price, id) order."""
+        low = min_price if min_price is not None else -float("inf")
+        high = max_price if max_price is not None else float("inf")
+        max_state = DELETED if show_deleted else LIVE
+
+        if numpy is not None:
+            prices = numpy.frombuffer(self.__prices, dtype=numpy.float64)
+            mask = (numpy.frombuffer(self.__states, dtype=numpy.uint8) <= max_state) & (prices >= low) & (prices <= high)
+            if after is not None:
+                after_price, after_id = after
+                ids = numpy.arange(1, len(prices) + 1)
+                mask &= (prices > after_price) | ((prices == after_price) & (ids > after_id))
+            rows = numpy.flatnonzero(mask)
+            if len(rows) > count > 0:
+                # keep everything priced up to the count-th smallest price, ties included, and sort only that
+                cutoff = numpy.partition(prices[rows], count - 1)[count - 1]
+                rows = rows[prices[rows] <= cutoff]
+            # rows ascend, so a stable sort by price leaves equal prices in id order
+            return rows[numpy.argsort(prices[rows], kind="stable")][:count].tolist()
+
+        prices, states = self.__prices, self.__states
+        keys = ((price, row) for row, price in enumerate(prices)
+                if states[row] <= max_state and low <= price <= high)
+        if after is not None:
+            after_key = (after[0], after[1] - 1)
+            keys = (key for key in keys if key > after_key)
+        return (row for _, row in nsmallest(count, keys))
+
+    def search(self, query: str, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+               show_deleted=False) -> List[Item]:
+        low = min_price if min_price is not None else -float("inf")
+        high = max_price if max_price is not None else float("inf")
+        max_state = DELETED if show_deleted else LIVE
+        scan_observer = self.scan_observer
+        prices, states = self.__prices, self.__states
+
+        def accept(item_id: int) -> bool:
+            return states[item_id - 1] <= max_state and low <= prices[item_id - 1] <= high
+
+        with self.__lock:
+            if self.__name_index is None:
+                rows = (row for row in range(len(states)) if states[row] != PURGED)
+                self.__name_index = NameIndex.from_names((row + 1, self.__name(row)) for row in rows)
+            item_ids = self.__name_index.search(query, lambda item_id: self.__name(item_id - 1), accept)
+            if scan_observer is not None:
+                visited = count()
+                item_ids = map(lambda item_id, _: item_id, item_ids, visited)
+
+            items = [self.__item(item_id - 1) for item_id in islice(item_ids, offset, offset + limit)]
+
+        if scan_observer is not None:
+            scan_observer("search", next(visited), len(items))
+        return items
+
+    def update(self, item: Item, expected_version: int | None = None) -> Item:
+        assert item.id
+        with self.__lock:
+            row = self.__row(item.id)
+            assert row is not None
+            version = self.__versions[row]
+            if expected_version is not None and version != expected_version:
+                raise VersionConflictError(f"Item {item.id} is at version {version}, not {expected_version}")
+
+            old_price, old_deleted, old_name = self.__prices[row], self.__states[row] == DELETED, self.__name(row)
+            if old_name != item.name:
+                self.__name_offsets[row], self.__name_lengths[row] = self.__append_name(item.name)
+                if self.__name_index is not None:
+                    self.__name_index.rename(item.id, old_name, item.name)
+            self.__prices[row] = item.price
+            self.__states[row] = DELETED if item.deleted else LIVE
+            self.__versions[row] = version + 1
+
+        self._notify_updated(ItemEntity(item.id, item.name, item.price, item.deleted, version + 1),
+                             old_price, old_deleted)
+        return Item(item.id, item.name, item.price, item.deleted, version + 1)
+
+    def purge_deleted(self, is_referenced: Callable[[int], bool]) -> List[int]:
+        # rows are positions, so a purged row stays as a tombstone and its id is never reused
+        with self.__lock:
+            deleted_rows = compress(range(len(self.__states)), (state == DELETED for state in self.__states))
+            purged_ids = [row + 1 for row in deleted_rows if not is_referenced(row + 1)]
+            for item_id in purged_ids:
+                if self.__name_index is not None:
+                    self.__name_index.remove(item_id, self.__name(item_id - 1))
+                self.__states[item_id - 1] = PURGED
+                self.__name_lengths[item_id - 1] = 0
+        return purged_ids
@@ -0,0 +1,21 @@
+import threading
+from typing import List
+
+from lecture_2.hw.shop_api.storage.base import CartStorage, ItemStorage
+
+
+def compact(item_repository: ItemStorage, cart_repository: CartStorage) -> List[int]:
+    """Purges deleted items that no cart line refers to and returns their ids."""
+    return item_repository.purge_deleted(lambda item_id: not cart_repository.retire_item(item_id))
+
+
+def start_compaction(item_repository: ItemStorage, cart_repository: CartStorage, interval: float) -> threading.Event:
+    """Runs `compact` every `interval` seconds on a daemon thread until the returned event is set."""
+    stopped = threading.Event()
+
+    def run():
+        while not stopped.wait(interval):
+            compact(item_repository, cart_repository)
+
+    threading.Thread(target=run, name="shop-compaction", daemon=True).start()
+    return stopped
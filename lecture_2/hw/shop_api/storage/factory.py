@@ -0,0 +1,64 @@
+import os
+
+from lecture_2.hw.shop_api.storage.base import CartStorage, ItemStorage
+from lecture_2.hw.shop_api.storage.columnar import ColumnarItemRepository
+from lecture_2.hw.shop_api.storage.compaction import start_compaction
+from lecture_2.hw.shop_api.storage.instrumentation import REPOSITORY_METRICS_ENV, instrument
+from lecture_2.hw.shop_api.storage.persistence import PersistentStore
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+from lecture_2.hw.shop_api.storage.shared import (SHARED_NAME_ENV, SharedCartRepository, SharedCatalogue,
+                                                   SharedItemRepository)
+from lecture_2.hw.shop_api.storage.sqlite import SqliteCartRepository, SqliteDatabase, SqliteItemRepository
+
+STORAGE_ENV = "SHOP_STORAGE"
+SQLITE_PATH_ENV = "SHOP_SQLITE_PATH"
+DATA_DIR_ENV = "SHOP_DATA_DIR"
+SNAPSHOT_INTERVAL_ENV = "SHOP_SNAPSHOT_INTERVAL"
+COMPACTION_INTERVAL_ENV = "SHOP_COMPACTION_INTERVAL"
+
+
+def create_repositories(storage: str | None = None, sqlite_path: str | None = None) -> tuple[ItemStorage, CartStorage]:
+    item_repository, cart_repository = open_repositories(storage, sqlite_path)
+
+    # off by default: timing every call costs a few microseconds
+    if os.environ.get(REPOSITORY_METRICS_ENV):
+        instrument(item_repository)
+        instrument(cart_repository)
+
+    # off by default: purged items disappear from show_deleted listings
+    if os.environ.get(COMPACTION_INTERVAL_ENV):
+        start_compaction(item_repository, cart_repository, float(os.environ[COMPACTION_INTERVAL_ENV]))
+    return item_repository, cart_repository
+
+
+def open_repositories(storage: str | None = None, sqlite_path: str | None = None) -> tuple[ItemStorage, CartStorage]:
+    storage = storage or os.environ.get(STORAGE_ENV, "memory")
+
+    if storage == "memory" and os.environ.get(DATA_DIR_ENV):
+        store = PersistentStore(os.environ[DATA_DIR_ENV])
+        store.start_snapshots(float(os.environ.get(SNAPSHOT_INTERVAL_ENV, 300)))
+        return store.item_repository, store.cart_repository
+
+    if storage == "memory":
+        item_repository, cart_repository = ItemRepository(), CartRepository()
+        item_repository.add_update_listener(cart_repository.on_item_updated)
+        return item_repository, cart_repository
+
+    if storage == "columnar":
+        item_repository, cart_repository = ColumnarItemRepository(), CartRepository()
+        item_repository.add_update_listener(cart_repository.on_item_updated)
+        return item_repository, cart_repository
+
+    if storage == "shared":
+        # items and carts are shared by all workers
+        catalogue = SharedCatalogue.attach(os.environ[SHARED_NAME_ENV])
+        item_repository = SharedItemRepository(catalogue)
+        cart_repository = SharedCartRepository(catalogue, item_repository)
+        item_repository.add_update_listener(cart_repository.on_item_updated)
+        return item_repository, cart_repository
+
+    if storage == "sqlite":
+        database = SqliteDatabase(sqlite_path or os.environ.get(SQLITE_PATH_ENV, "shop.db"))
+        return SqliteItemRepository(database), SqliteCartRepository(database)
+
+    raise ValueError(f"Unknown {STORAGE_ENV} backend: {storage!r}")
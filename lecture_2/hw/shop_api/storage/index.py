@@ -0,0 +1,357 @@
+import math
+import re
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from itertools import chain, islice
+from typing import Any, Callable, Iterable, Iterator, List
+
+WORD = re.compile(r"\w+")
+# sorts after every word starting with a given prefix: no word character is greater
+PREFIX_END = "\U0010ffff"
+
+
+class SortedIndex:
+    """Ordered set of keys stored as a list of bounded sorted chunks (a flat B-tree level).
+
+    Adding/removing a key costs a bisect over chunk maxima plus a memmove inside one chunk,
+    and `irange` starts from any key without visiting the keys before it.
+    """
+
+    CHUNK_SIZE = 512
+
+    __chunks: list[list[Any]]
+    __maxes: list[Any]
+    __len: int
+
+    def __init__(self, keys: Iterable[Any] = ()):
+        self.__chunks = []
+        self.__maxes = []
+        self.__len = 0
+        for key in keys:
+            self.add(key)
+
+    @classmethod
+    def from_sorted(cls, keys: List[Any]) -> "SortedIndex":
+        index = cls()
+        index.__chunks = [keys[i:i + cls.CHUNK_SIZE] for i in range(0, len(keys), cls.CHUNK_SIZE)]
+        index.__maxes = [chunk[-1] for chunk in index.__chunks]
+        index.__len = len(keys)
+        return index
+
+    def __len__(self) -> int:
+        return self.__len
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.irange()
+
+    def __contains__(self, key: Any) -> bool:
+        pos = bisect_left(self.__maxes, key)
+        if pos == len(self.__maxes):
+            return False
+        chunk = self.__chunks[pos]
+        idx = bisect_left(chunk, key)
+        return idx < len(chunk) and chunk[idx] == key
+
+    def add(self, key: Any) -> None:
+        if not self.__maxes:
+            self.__chunks.append([key])
+            self.__maxes.append(key)
+            self.__len += 1
+            return
+
+        pos = bisect_left(self.__maxes, key)
+        if pos == len(self.__maxes):
+            pos -= 1
+            self.__chunks[pos].append(key)
+            self.__maxes[pos] = key
+        else:
+            insort(self.__chunks[pos], key)
+
+        self.__len += 1
+        self.__split(pos)
+
+    def update(self, keys: Iterable[Any]) -> None:
+        keys = sorted(keys)
+        if len(keys) * 4 < self.__len:
+            for key in keys:
+                self.add(key)
+            return
+
+        merged = sorted([*self.irange(), *keys])
+        self.__chunks = [merged[i:i + self.CHUNK_SIZE] for i in range(0, len(merged), self.CHUNK_SIZE)]
+        self.__maxes = [chunk[-1] for chunk in self.__chunks]
+        self.__len = len(merged)
+
+    def remove(self, key: Any) -> None:
+        if not self.discard(key):
+            raise KeyError(key)
+
+    def discard(self, key: Any) -> bool:
+        pos = bisect_left(self.__maxes, key)
+        if pos == len(self.__maxes):
+            return False
+
+        chunk = self.__chunks[pos]
+        idx = bisect_left(chunk, key)
+        if idx == len(chunk) or chunk[idx] != key:
+            return False
+
+        del chunk[idx]
+        self.__len -= 1
+        if chunk:
+            self.__maxes[pos] = chunk[-1]
+        else:
+            del self.__chunks[pos]
+            del self.__maxes[pos]
+        return True
+
+    def count(self, minimum: Any, maximum: Any) -> int:
+        """Number of keys from `minimum` inclusive up to `maximum` exclusive, without visiting them."""
+        low_pos = bisect_left(self.__maxes, minimum)
+        high_pos = bisect_left(self.__maxes, maximum)
+        low_idx = bisect_left(self.__chunks[low_pos], minimum) if low_pos < len(self.__chunks) else 0
+        high_idx = bisect_left(self.__chunks[high_pos], maximum) if high_pos < len(self.__chunks) else 0
+        return sum(map(len, self.__chunks[low_pos:high_pos])) - low_idx + high_idx
+
+    def irange(self, minimum: Any = None, maximum: Any = None, exclude_minimum: bool = False) -> Iterator[Any]:
+        """Yields keys in ascending order from `minimum` up to `maximum` inclusive."""
+        pos, idx = 0, 0
+        if minimum is not None:
+            bisect = bisect_right if exclude_minimum else bisect_left
+            pos = bisect(self.__maxes, minimum)
+            if pos == len(self.__maxes):
+                return
+            idx = bisect(self.__chunks[pos], minimum)
+
+        while pos < len(self.__chunks):
+            chunk = self.__chunks[pos]
+            while idx < len(chunk):
+                key = chunk[idx]
+                if maximum is not None and key > maximum:
+                    return
+                yield key
+                idx += 1
+            pos, idx = pos + 1, 0
+
+    def __split(self, pos: int) -> None:
+        chunk = self.__chunks[pos]
+        if len(chunk) <= 2 * self.CHUNK_SIZE:
+            return
+
+        tail = chunk[self.CHUNK_SIZE:]
+        del chunk[self.CHUNK_SIZE:]
+        self.__maxes[pos] = chunk[-1]
+        self.__chunks.insert(pos + 1, tail)
+        self.__maxes.insert(pos + 1, tail[-1])
+
+
+class ItemIndex:
+    """Item ids and (price, id) keys, with live and deleted items in separate partitions.
+
+    Listings without deleted items walk the live partition only; with them, both partitions are merged in order.
+    """
+
+    __live_ids: SortedIndex
+    __live_prices: SortedIndex
+    __deleted_ids: SortedIndex
+    __deleted_prices: SortedIndex
+
+    def __init__(self):
+        self.__live_ids = SortedIndex()
+        self.__live_prices = SortedIndex()
+        self.__deleted_ids = SortedIndex()
+        self.__deleted_prices = SortedIndex()
+
+    @classmethod
+    def from_sorted(cls, live_ids: List[int], deleted_ids: List[int],
+                    price_keys: List[tuple[float, int]]) -> "ItemIndex":
+        """`price_keys` are the live keys in order followed by the deleted ones, as returned by `price_keys()`."""
+        index = cls()
+        index.__live_ids = SortedIndex.from_sorted(live_ids)
+        index.__deleted_ids = SortedIndex.from_sorted(deleted_ids)
+        index.__live_prices = SortedIndex.from_sorted(price_keys[:len(live_ids)])
+        index.__deleted_prices = SortedIndex.from_sorted(price_keys[len(live_ids):])
+        return index
+
+    def __ids(self, deleted: bool) -> SortedIndex:
+        return self.__deleted_ids if deleted else self.__live_ids
+
+    def __prices(self, deleted: bool) -> SortedIndex:
+        return self.__deleted_prices if deleted else self.__live_prices
+
+    def add(self, item_id: int, price: float, deleted: bool) -> None:
+        self.__ids(deleted).add(item_id)
+        self.__prices(deleted).add((price, item_id))
+
+    def add_many(self, entries: List[tuple[int, float, bool]]) -> None:
+        for deleted in (False, True):
+            partition = [(item_id, price) for item_id, price, item_deleted in entries if item_deleted == deleted]
+            if partition:
+                self.__ids(deleted).update(item_id for item_id, _ in partition)
+                self.__prices(deleted).update((price, item_id) for item_id, price in partition)
+
+    def remove(self, item_id: int, price: float, deleted: bool) -> None:
+        self.__ids(deleted).remove(item_id)
+        self.__prices(deleted).remove((price, item_id))
+
+    def move(self, item_id: int, old_price: float, old_deleted: bool, price: float, deleted: bool) -> None:
+        if old_price != price or old_deleted != deleted:
+            self.__prices(old_deleted).remove((old_price, item_id))
+            self.__prices(deleted).add((price, item_id))
+        if old_deleted != deleted:
+            self.__ids(old_deleted).remove(item_id)
+            self.__ids(deleted).add(item_id)
+
+    def price_keys(self) -> List[tuple[float, int]]:
+        return [*self.__live_prices, *self.__deleted_prices]
+
+    def deleted_ids(self) -> List[int]:
+        return list(self.__deleted_ids)
+
+    def ids(self, after_id: int | None = None, show_deleted: bool = False) -> Iterator[int]:
+        item_ids = self.__live_ids.irange(minimum=after_id, exclude_minimum=True)
+        if show_deleted:
+            item_ids = merge(item_ids, self.__deleted_ids.irange(minimum=after_id, exclude_minimum=True))
+        return item_ids
+
+    def ids_by_price(self, min_price: float | None = None, max_price: float | None = None,
+                     after: tuple[float, int] | None = None, show_deleted: bool = False) -> Iterator[int]:
+        """Ids ordered by (price, id) within the inclusive price bounds, starting after the `after` key."""
+        # (min_price,) sorts before every (min_price, id) key, so excluding it still keeps min_price inclusive
+        minimum = (min_price,) if min_price is not None else None
+        if after is not None and (minimum is None or after > minimum):
+            minimum = after
+        maximum = (max_price, math.inf) if max_price is not None else None
+
+        keys = self.__live_prices.irange(minimum=minimum, maximum=maximum, exclude_minimum=True)
+        if show_deleted:
+            keys = merge(keys, self.__deleted_prices.irange(minimum=minimum, maximum=maximum, exclude_minimum=True))
+        return (item_id for _, item_id in keys)
+
+
+def tokenize(text: str) -> List[str]:
+    """Distinct case-folded words of `text`, in order of appearance."""
+    return list(dict.fromkeys(WORD.findall(text.casefold())))
+
+
+def _holds(posting: List[int], item_id: int) -> bool:
+    pos = bisect_left(posting, item_id)
+    return pos < len(posting) and posting[pos] == item_id
+
+
+class NameIndex:
+    """Words of item names mapped to sorted ids of the items holding them (an inverted index),
+    with the words themselves kept in a `SortedIndex` so that all words starting with a prefix are one range.
+
+    `search` yields ids lazily, so a page costs about as many postings as it needs, not the whole range.
+    """
+
+    # a search with whole words checks the names of up to this many candidates rather than walk the prefix range
+    DIRECT_CANDIDATES = 256
+    # words of the range whose postings are checked against the candidates at once
+    RANGE_BATCH = 64
+
+    __postings: dict[str, List[int]]
+    __words: SortedIndex
+
+    def __init__(self):
+        self.__postings = dict()
+        self.__words = SortedIndex()
+
+    @classmethod
+    def from_names(cls, names: Iterable[tuple[int, str]]) -> "NameIndex":
+        """Builds the index from (id, name) pairs given in id order."""
+        index = cls()
+        postings = index.__postings
+        for item_id, name in names:
+            for word in tokenize(name):
+                posting = postings.get(word)
+                if posting is None:
+                    postings[word] = [item_id]
+                else:
+                    posting.append(item_id)
+        index.__words = SortedIndex.from_sorted(sorted(postings))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.__postings)
+
+    def add(self, item_id: int, name: str) -> None:
+        for word in tokenize(name):
+            posting = self.__postings.get(word)
+            if posting is None:
+                self.__postings[word] = [item_id]
+                self.__words.add(word)
+            elif posting[-1] < item_id:
+                posting.append(item_id)
+            else:
+                insort(posting, item_id)
+
+    def remove(self, item_id: int, name: str) -> None:
+        for word in tokenize(name):
+            posting = self.__postings[word]
+            del posting[bisect_left(posting, item_id)]
+            if not posting:
+                del self.__postings[word]
+                self.__words.remove(word)
+
+    def rename(self, item_id: int, old_name: str, name: str) -> None:
+        if old_name != name:
+            self.remove(item_id, old_name)
+            self.add(item_id, name)
+
+    def search(self, query: str, name_of: Callable[[int], str], accept: Callable[[int], bool]) -> Iterator[int]:
+        """Ids of the items whose names hold every word of `query` but the last, and a word starting with the last.
+
+        Ids come ordered by the smallest name word the last query word is a prefix of, then by id.
+        `name_of` returns the current name of an indexed item; items for which `accept` is false are skipped.
+        """
+        words = WORD.findall(query.casefold())
+        if not words:
+            return iter(())
+
+        *whole_words, prefix = words
+        postings = [self.__postings.get(word) for word in dict.fromkeys(whole_words)]
+        if None in postings:
+            return iter(())
+        if not postings:
+            return self.__search_range(prefix, None, accept)
+
+        postings.sort(key=len)
+        candidates = postings[0]
+        if len(postings) > 1:
+            candidates = [item_id for item_id in candidates if all(_holds(posting, item_id) for posting in postings[1:])]
+        # checking a name costs about as much as walking past one word of the range
+        if len(candidates) < max(self.DIRECT_CANDIDATES, self.__words.count(prefix, prefix + PREFIX_END)):
+            return self.__search_candidates(candidates, prefix, accept, name_of)
+        return self.__search_range(prefix, set(candidates), accept)
+
+    @staticmethod
+    def __search_candidates(candidates: List[int], prefix: str, accept: Callable[[int], bool],
+                            name_of: Callable[[int], str]) -> Iterator[int]:
+        word_start = re.compile(r"\b" + re.escape(prefix) + r"\w*")
+        keys = []
+        for item_id in filter(accept, candidates):
+            matched = word_start.findall(name_of(item_id).casefold())
+            if matched:
+                keys.append((min(matched), item_id))
+        keys.sort()
+        return (item_id for _, item_id in keys)
+
+    def __search_range(self, prefix: str, candidates: set[int] | None,
+                       accept: Callable[[int], bool]) -> Iterator[int]:
+        # words come in order, so an item is first met at the smallest of its words that match
+        seen = set()
+        words = self.__words.irange(minimum=prefix, maximum=prefix + PREFIX_END)
+        while batch := [self.__postings[word] for word in islice(words, self.RANGE_BATCH)]:
+            if candidates is not None:
+                # most words hold none of the candidates: skip them a batch at a time
+                if candidates.isdisjoint(chain.from_iterable(batch)):
+                    continue
+                batch = [filter(candidates.__contains__, posting) for posting in batch]
+
+            for posting in batch:
+                for item_id in posting:
+                    if item_id not in seen and accept(item_id):
+                        seen.add(item_id)
+                        yield item_id
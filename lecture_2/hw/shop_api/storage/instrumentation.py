@@ -0,0 +1,70 @@
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable
+
+from prometheus_client import Histogram
+
+from lecture_2.hw.shop_api.storage.base import CartEntity, CartStorage, ItemStorage
+
+REPOSITORY_METRICS_ENV = "SHOP_REPOSITORY_METRICS"
+
+ITEM_METHODS = ("create", "create_many", "get", "get_entity", "get_entities", "query", "search", "update",
+                "purge_deleted")
+CART_METHODS = ("create_cart", "get_cart", "add_item_to_cart", "add_items_to_cart", "references_item",
+                "retire_item", "carts_with_item", "stats", "query_carts")
+# methods returning a single cart, whose line count is recorded
+CART_RESULT_METHODS = {"get_cart", "add_item_to_cart", "add_items_to_cart"}
+
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, float("inf"))
+
+CALL_SECONDS = Histogram("shop_repository_call_seconds", "Time spent in repository methods",
+                         ["repository", "method"],
+                         buckets=(.00001, .00005, .0001, .0005, .001, .005, .01, .05, .1, .5, 1, float("inf")))
+ROWS_SCANNED = Histogram("shop_repository_rows_scanned", "Rows a query visited", ["repository", "method"],
+                         buckets=ROW_BUCKETS)
+ROWS_RETURNED = Histogram("shop_repository_rows_returned", "Rows a query returned", ["repository", "method"],
+                          buckets=ROW_BUCKETS)
+CART_LINES = Histogram("shop_cart_lines", "Lines in the cart read or changed by a repository call", ["repository"],
+                       buckets=(0, 1, 2, 5, 10, 20, 50, 100, float("inf")))
+
+
+def instrument(storage: ItemStorage | CartStorage) -> None:
+    """Times the public methods of `storage` and records the rows its queries scan and return.
+
+    The timed wrappers shadow the methods on this instance only, so an uninstrumented storage runs exactly the
+    code it always did, and the only cost left in the repositories is a `scan_observer is None` check per query.
+    """
+    repository = type(storage).__name__
+    for method in ITEM_METHODS if isinstance(storage, ItemStorage) else CART_METHODS:
+        on_result = _count_lines(CART_LINES.labels(repository)) if method in CART_RESULT_METHODS else None
+        setattr(storage, method, _timed(getattr(storage, method), CALL_SECONDS.labels(repository, method), on_result))
+
+    def observe_scan(method: str, scanned: int, returned: int) -> None:
+        ROWS_SCANNED.labels(repository, method).observe(scanned)
+        ROWS_RETURNED.labels(repository, method).observe(returned)
+
+    storage.scan_observer = observe_scan
+
+
+def _timed(method: Callable[..., Any], seconds: Histogram,
+           on_result: Callable[[Any], None] | None) -> Callable[..., Any]:
+    @wraps(method)
+    def timed(*args, **kwargs):
+        started = perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            seconds.observe(perf_counter() - started)
+
+        if on_result is not None and result is not None:
+            on_result(result)
+        return result
+
+    return timed
+
+
+def _count_lines(cart_lines: Histogram) -> Callable[[CartEntity], None]:
+    def count_lines(cart: CartEntity) -> None:
+        cart_lines.observe(len(cart.items))
+
+    return count_lines
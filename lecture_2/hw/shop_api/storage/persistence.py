@@ -0,0 +1,372 @@
+import gc
+import mmap
+import os
+import struct
+import threading
+from array import array
+from enum import IntEnum
+from itertools import accumulate
+from typing import BinaryIO, Callable, Iterator, List
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.base import CartEntity, ItemEntity
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+
+SNAPSHOT_FILE = "snapshot.bin"
+JOURNAL_FILE = "journal.log"
+
+SNAPSHOT_MAGIC = b"SHOPSNAP"
+SNAPSHOT_VERSION = 3
+JOURNAL_MAGIC = b"SHOPLOG1"
+
+# magic, version, journal generation, journal offset, last item id, items, carts, cart lines, name arena bytes
+_SNAPSHOT_HEADER = struct.Struct("<8sHQQQQQQQ")
+# magic, generation
+_JOURNAL_HEADER = struct.Struct("<8sQ")
+# payload length, op
+_RECORD_HEADER = struct.Struct("<IB")
+# id, price, deleted; followed by the utf-8 name
+_ITEM_RECORD = struct.Struct("<qd?")
+_CART_RECORD = struct.Struct("<q")
+# cart id, item id, quantity
+_CART_LINE_RECORD = struct.Struct("<qqq")
+_NAME_SEPARATOR = "\x00"
+
+
+class Op(IntEnum):
+    ITEM_CREATE = 1
+    ITEM_UPDATE = 2
+    CART_CREATE = 3
+    CART_ADD = 4
+    ITEM_PURGE = 5
+
+
+def _record(op: Op, payload: bytes) -> bytes:
+    return _RECORD_HEADER.pack(len(payload), op) + payload
+
+
+def _item_record(op: Op, item_entity: ItemEntity) -> bytes:
+    return _record(op, _ITEM_RECORD.pack(item_entity.id, item_entity.price, item_entity.deleted)
+                   + item_entity.name.encode())
+
+
+class Journal:
+    """Append-only mutation log. Each compaction starts a new generation holding only the records after the snapshot."""
+
+    path: str
+    generation: int
+    lock: threading.Lock
+    __file: BinaryIO
+
+    def __init__(self, path: str, generation: int):
+        self.path = path
+        self.lock = threading.Lock()
+        if not os.path.exists(path):
+            with open(path, "wb") as file:
+                file.write(_JOURNAL_HEADER.pack(JOURNAL_MAGIC, generation))
+        self.generation = Journal.read_generation(path)
+        self.__file = open(path, "ab")
+
+    @staticmethod
+    def read_generation(path: str) -> int:
+        with open(path, "rb") as file:
+            magic, generation = _JOURNAL_HEADER.unpack(file.read(_JOURNAL_HEADER.size))
+        if magic != JOURNAL_MAGIC:
+            raise ValueError(f"{path} is not a shop journal")
+        return generation
+
+    @staticmethod
+    def records(path: str, offset: int = 0) -> Iterator[tuple[Op, bytes]]:
+        """Yields records from `offset` (0 means right after the header) and cuts off a torn trailing record."""
+        with open(path, "r+b") as file:
+            file.seek(max(offset, _JOURNAL_HEADER.size))
+            while True:
+                position = file.tell()
+                header = file.read(_RECORD_HEADER.size)
+                if len(header) == _RECORD_HEADER.size:
+                    length, op = _RECORD_HEADER.unpack(header)
+                    payload = file.read(length)
+                    if len(payload) == length:
+                        yield Op(op), payload
+                        continue
+
+                file.truncate(position)
+                return
+
+    def offset(self) -> int:
+        return self.__file.tell()
+
+    def append(self, records: bytes) -> None:
+        self.__file.write(records)
+        self.__file.flush()
+
+    def rotate(self, offset: int) -> None:
+        """Starts the next generation with the records written after `offset`. Call with `lock` held."""
+        self.__file.flush()
+        next_path = self.path + ".next"
+        with open(self.path, "rb") as current, open(next_path, "wb") as following:
+            following.write(_JOURNAL_HEADER.pack(JOURNAL_MAGIC, self.generation + 1))
+            current.seek(offset)
+            following.write(current.read())
+            following.flush()
+            os.fsync(following.fileno())
+
+        self.__file.close()
+        os.replace(next_path, self.path)
+        self.generation += 1
+        self.__file = open(self.path, "ab")
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class JournaledItemRepository(ItemRepository):
+    # writes append to the journal and wait out a snapshot holding its lock
+    blocking_writes = True
+
+    __journal: Journal
+
+    def __init__(self, journal: Journal):
+        super().__init__()
+        self.__journal = journal
+
+    def create(self, item: Item) -> Item:
+        with self.__journal.lock:
+            created_item = super().create(item)
+            self.__journal.append(_item_record(Op.ITEM_CREATE, self.get_entity(created_item.id)))
+        return created_item
+
+    def create_many(self, items: List[Item]) -> List[Item]:
+        with self.__journal.lock:
+            created_items = super().create_many(items)
+            self.__journal.append(b"".join(_item_record(Op.ITEM_CREATE, self.get_entity(item.id))
+                                           for item in created_items))
+        return created_items
+
+    def update(self, item: Item, expected_version: int | None = None) -> Item:
+        with self.__journal.lock:
+            # a conflict raises before anything is journaled; replaying the update bumps the version again
+            updated_item = super().update(item, expected_version)
+            self.__journal.append(_item_record(Op.ITEM_UPDATE, self.get_entity(updated_item.id)))
+        return updated_item
+
+    def purge_deleted(self, is_referenced: Callable[[int], bool]) -> List[int]:
+        with self.__journal.lock:
+            purged_ids = super().purge_deleted(is_referenced)
+            if purged_ids:
+                self.__journal.append(_record(Op.ITEM_PURGE, array("q", purged_ids).tobytes()))
+        return purged_ids
+
+
+class JournaledCartRepository(CartRepository):
+    blocking_writes = True
+
+    __journal: Journal
+
+    def __init__(self, journal: Journal):
+        super().__init__()
+        self.__journal = journal
+
+    def create_cart(self) -> CartEntity:
+        with self.__journal.lock:
+            cart = super().create_cart()
+            self.__journal.append(_record(Op.CART_CREATE, _CART_RECORD.pack(cart.id)))
+        return cart
+
+    def add_item_to_cart(self, cart_id: int, item: ItemEntity, quantity: int = 1) -> CartEntity:
+        with self.__journal.lock:
+            cart = super().add_item_to_cart(cart_id, item, quantity)
+            self.__journal.append(_record(Op.CART_ADD, _CART_LINE_RECORD.pack(cart_id, item.id, quantity)))
+        return cart
+
+    def add_items_to_cart(self, cart_id: int, lines: List[tuple[ItemEntity, int]]) -> CartEntity:
+        with self.__journal.lock:
+            cart = super().add_items_to_cart(cart_id, lines)
+            self.__journal.append(b"".join(_record(Op.CART_ADD, _CART_LINE_RECORD.pack(cart_id, item.id, quantity))
+                                           for item, quantity in lines))
+        return cart
+
+
+def encode_snapshot(item_entities: List[ItemEntity], price_keys: List[tuple[float, int]], last_item_id: int,
+                    carts: List[CartEntity], generation: int, offset: int) -> bytes:
+    names = [item_entity.name for item_entity in item_entities]
+    arena = _NAME_SEPARATOR.join(names).encode()
+    lines = [(cart.id, cart_item.item.id, cart_item.quantity) for cart in carts for cart_item in cart.items]
+
+    return b"".join([
+        _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, generation, offset, last_item_id,
+                              len(item_entities), len(carts), len(lines), len(arena)),
+        array("q", [item_entity.id for item_entity in item_entities]).tobytes(),
+        array("d", [item_entity.price for item_entity in item_entities]).tobytes(),
+        bytes(item_entity.deleted for item_entity in item_entities),
+        array("Q", [item_entity.version for item_entity in item_entities]).tobytes(),
+        # name ends are counted in characters (separators included) so the decoded arena can be sliced
+        array("Q", accumulate(len(name) + 1 for name in names)).tobytes(),
+        arena,
+        # the live and deleted price indexes in order, so loading them needs no sort
+        array("d", [price for price, _ in price_keys]).tobytes(),
+        array("q", [item_id for _, item_id in price_keys]).tobytes(),
+        array("q", [cart.id for cart in carts]).tobytes(),
+        array("q", [line[0] for line in lines]).tobytes(),
+        array("q", [line[1] for line in lines]).tobytes(),
+        array("q", [line[2] for line in lines]).tobytes(),
+    ])
+
+
+class _SnapshotReader:
+    def __init__(self, view: memoryview):
+        self.view = view
+        self.position = 0
+
+    def take_bytes(self, size: int) -> memoryview:
+        chunk = self.view[self.position:self.position + size]
+        self.position += size
+        return chunk
+
+    def take_array(self, typecode: str, count: int) -> array:
+        values = array(typecode)
+        values.frombytes(self.take_bytes(count * values.itemsize))
+        return values
+
+
+def read_snapshot_position(path: str) -> tuple[int, int]:
+    """The journal (generation, offset) covered by the snapshot at `path`."""
+    with open(path, "rb") as file:
+        magic, version, generation, offset, *_ = _SNAPSHOT_HEADER.unpack(file.read(_SNAPSHOT_HEADER.size))
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} shop snapshot")
+    return generation, offset
+
+
+def load_snapshot(path: str, item_repository: ItemRepository, cart_repository: CartRepository) -> None:
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            reader = _SnapshotReader(view)
+            _, _, _, _, last_item_id, item_count, cart_count, line_count, arena_size = \
+                _SNAPSHOT_HEADER.unpack(reader.take_bytes(_SNAPSHOT_HEADER.size))
+
+            ids = reader.take_array("q", item_count)
+            prices = reader.take_array("d", item_count)
+            deleted = bytes(reader.take_bytes(item_count))
+            versions = reader.take_array("Q", item_count)
+            name_ends = reader.take_array("Q", item_count)
+            names = str(reader.take_bytes(arena_size), "utf-8")
+            price_key_prices = reader.take_array("d", item_count)
+            price_key_ids = reader.take_array("q", item_count)
+            cart_ids = reader.take_array("q", cart_count)
+            line_cart_ids = reader.take_array("q", line_count)
+            line_item_ids = reader.take_array("q", line_count)
+            line_quantities = reader.take_array("q", line_count)
+            del reader
+
+    item_names = names.split(_NAME_SEPARATOR) if item_count else []
+    if len(item_names) != item_count:
+        # some name contains the separator itself
+        name_starts = [0, *name_ends[:-1]]
+        item_names = list(map(names.__getitem__, map(slice, name_starts, (end - 1 for end in name_ends))))
+    item_entities = list(map(ItemEntity, ids, item_names, prices, map(bool, deleted), versions))
+    item_repository.restore(item_entities, list(zip(price_key_prices, price_key_ids)), last_item_id)
+    lines = zip(line_cart_ids, map(item_repository.get_entity, line_item_ids), line_quantities)
+    # lines of purged items, which snapshots taken before lines and purges were mutually exclusive may hold
+    cart_repository.restore(list(cart_ids), (line for line in lines if line[1] is not None))
+
+
+def replay(path: str, offset: int, item_repository: ItemRepository, cart_repository: CartRepository) -> None:
+    # the plain repository methods apply the records without journaling them a second time
+    for op, payload in Journal.records(path, offset):
+        if op in (Op.ITEM_CREATE, Op.ITEM_UPDATE):
+            item_id, price, deleted = _ITEM_RECORD.unpack_from(payload)
+            name = payload[_ITEM_RECORD.size:].decode()
+            if op == Op.ITEM_CREATE:
+                created_item = ItemRepository.create(item_repository, Item(name=name, price=price, deleted=deleted))
+                assert created_item.id == item_id, f"Journal item {item_id} replayed as {created_item.id}"
+            else:
+                ItemRepository.update(item_repository, Item(item_id, name, price, deleted))
+        elif op == Op.CART_CREATE:
+            (cart_id,) = _CART_RECORD.unpack(payload)
+            cart = CartRepository.create_cart(cart_repository)
+            assert cart.id == cart_id, f"Journal cart {cart_id} replayed as {cart.id}"
+        elif op == Op.CART_ADD:
+            cart_id, item_id, quantity = _CART_LINE_RECORD.unpack(payload)
+            item_entity = item_repository.get_entity(item_id)
+            if item_entity is None:
+                # a line for an item purged before it, which journals written before lines and purges were
+                # mutually exclusive may hold
+                continue
+            CartRepository.add_item_to_cart(cart_repository, cart_id, item_entity, quantity)
+        elif op == Op.ITEM_PURGE:
+            purged_ids = set(array("q", payload))
+            ItemRepository.purge_deleted(item_repository, lambda item_id: item_id not in purged_ids)
+
+
+class PersistentStore:
+    """In-memory repositories that survive restarts: a periodic snapshot plus the journal written since."""
+
+    directory: str
+    journal: Journal
+    item_repository: JournaledItemRepository
+    cart_repository: JournaledCartRepository
+    __stopped: threading.Event
+    __snapshot_thread: threading.Thread | None
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        journal_path = os.path.join(directory, JOURNAL_FILE)
+
+        generation, offset = read_snapshot_position(snapshot_path) if os.path.exists(snapshot_path) else (0, 0)
+        self.journal = Journal(journal_path, generation + 1)
+        self.item_repository = JournaledItemRepository(self.journal)
+        self.cart_repository = JournaledCartRepository(self.journal)
+        self.item_repository.add_update_listener(self.cart_repository.on_item_updated)
+
+        # millions of freshly allocated entities would otherwise trigger repeated full collections mid-load
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if os.path.exists(snapshot_path):
+                load_snapshot(snapshot_path, self.item_repository, self.cart_repository)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        if self.journal.generation == generation:
+            replay(journal_path, offset, self.item_repository, self.cart_repository)
+        elif self.journal.generation == generation + 1:
+            replay(journal_path, 0, self.item_repository, self.cart_repository)
+        else:
+            raise ValueError(f"Journal generation {self.journal.generation} does not follow snapshot {generation}")
+
+        self.__stopped = threading.Event()
+        self.__snapshot_thread = None
+
+    def snapshot(self) -> None:
+        with self.journal.lock:
+            generation, offset = self.journal.generation, self.journal.offset()
+            data = encode_snapshot(self.item_repository.entities(), self.item_repository.price_keys(),
+                                   self.item_repository.last_id(), self.cart_repository.carts(), generation, offset)
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(snapshot_path + ".next", "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(snapshot_path + ".next", snapshot_path)
+
+        with self.journal.lock:
+            self.journal.rotate(offset)
+
+    def start_snapshots(self, interval: float) -> None:
+        def run():
+            while not self.__stopped.wait(interval):
+                self.snapshot()
+
+        self.__snapshot_thread = threading.Thread(target=run, name="shop-snapshots", daemon=True)
+        self.__snapshot_thread.start()
+
+    def close(self) -> None:
+        self.__stopped.set()
+        if self.__snapshot_thread is not None:
+            self.__snapshot_thread.join()
+        self.journal.close()
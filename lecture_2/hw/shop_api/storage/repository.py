@@ -1,143 +1,369 @@
-from dataclasses import dataclass
-from typing import List
+import math
+from itertools import count, islice
+from threading import Lock
+from typing import Callable, Iterable, Iterator, List
 
-from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.routes.model import CartStats, Item
+from lecture_2.hw.shop_api.storage.base import (CartEntity, CartItemEntity, CartStorage, ItemEntity, ItemStorage,
+                                                 PurgedItemError, VersionConflictError)
+from lecture_2.hw.shop_api.storage.index import ItemIndex, NameIndex, SortedIndex
+from lecture_2.hw.shop_api.storage.stats import CartStatistics
 
 
-def id_generator():
-    i = 0
-    while True:
-        i += 1
-        yield i
+def id_generator() -> Iterator[int]:
+    # next() on itertools.count is a single C call, so concurrent handlers never share or skip an id
+    # (a generator function raises "generator already executing" when two threads advance it at once)
+    return count(1)
 
 
-class ItemRepository:
-    @dataclass(slots=True)
-    class ItemEntity:
-        id: int
-        name: str
-        price: float
-        deleted: bool
-
+class ItemRepository(ItemStorage):
     __item_table: dict[int, ItemEntity]
-    __item_id_generator = id_generator()
+    __index: ItemIndex
+    __names: NameIndex
+    __item_id_generator: Iterator[int]
+    __last_item_id: int
+    __lock: Lock
 
     def __init__(self):
+        super().__init__()
         self.__item_table = dict()
+        self.__index = ItemIndex()
+        self.__names = NameIndex()
+        self.__item_id_generator = id_generator()
+        self.__last_item_id = 0
+        self.__lock = Lock()
 
     def create(self, item: Item) -> Item:
-        item_entity = ItemRepository.ItemEntity(next(self.__item_id_generator), item.name, item.price, item.deleted)
-        self.__item_table[item_entity.id] = item_entity
-
-        item.id = item_entity.id
+        with self.__lock:
+            # drawn under the lock, so the table holds items in id order and its unfiltered listing pages like the index
+            item_entity = ItemEntity(next(self.__item_id_generator), item.name, item.price, item.deleted)
+            self.__item_table[item_entity.id] = item_entity
+            self.__index.add(item_entity.id, item_entity.price, item_entity.deleted)
+            self.__names.add(item_entity.id, item_entity.name)
+            self.__last_item_id = max(self.__last_item_id, item_entity.id)
+
+        item.id, item.version = item_entity.id, item_entity.version
         return item
 
-    def get(self, item_id: int) -> Item:
-        assert item_id
+    def create_many(self, items: List[Item]) -> List[Item]:
+        with self.__lock:
+            item_entities = [
+                ItemEntity(next(self.__item_id_generator), item.name, item.price, item.deleted)
+                for item in items
+            ]
+            for item_entity in item_entities:
+                self.__item_table[item_entity.id] = item_entity
+                self.__names.add(item_entity.id, item_entity.name)
+            self.__index.add_many([(item_entity.id, item_entity.price, item_entity.deleted)
+                                   for item_entity in item_entities])
+            if item_entities:
+                self.__last_item_id = max(self.__last_item_id, item_entities[-1].id)
+
+        for item, item_entity in zip(items, item_entities):
+            item.id, item.version = item_entity.id, item_entity.version
+        return items
+
+    def entities(self) -> List[ItemEntity]:
+        with self.__lock:
+            return list(self.__item_table.values())
+
+    def last_id(self) -> int:
+        """The highest id ever handed out, including items purged since."""
+        with self.__lock:
+            return self.__last_item_id
+
+    def price_keys(self) -> List[tuple[float, int]]:
+        """(price, id) keys of live items in order, followed by those of deleted items in order."""
+        with self.__lock:
+            return self.__index.price_keys()
+
+    def restore(self, item_entities: List[ItemEntity], price_keys: List[tuple[float, int]] | None = None,
+                last_id: int | None = None) -> None:
+        """Replaces the contents with `item_entities` given in id order, e.g. loaded from a snapshot.
+
+        `price_keys` are the matching keys already in order, as returned by `price_keys()`.
+        """
+        live_ids = [item_entity.id for item_entity in item_entities if not item_entity.deleted]
+        deleted_ids = [item_entity.id for item_entity in item_entities if item_entity.deleted]
+        if price_keys is None:
+            price_keys = [*sorted((item_entity.price, item_entity.id)
+                                  for item_entity in item_entities if not item_entity.deleted),
+                          *sorted((item_entity.price, item_entity.id)
+                                  for item_entity in item_entities if item_entity.deleted)]
+        if last_id is None:
+            last_id = item_entities[-1].id if item_entities else 0
+        names = NameIndex.from_names((item_entity.id, item_entity.name) for item_entity in item_entities)
+
+        with self.__lock:
+            self.__item_table = {item_entity.id: item_entity for item_entity in item_entities}
+            self.__index = ItemIndex.from_sorted(live_ids, deleted_ids, price_keys)
+            self.__names = names
+            self.__last_item_id = last_id
+            self.__item_id_generator = count(last_id + 1)
+
+    def get(self, item_id: int) -> Item | None:
         item_entity = self.__item_table.get(item_id)
-        assert item_entity, f"Item with id {item_id} not found"
-        return Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted)
-
-    def query(self, offset=0, limit=10, min_price: int | None = None, max_price: int | None = None,
-              show_deleted=False) -> list[Item]:
-        item_entities = list(self.__item_table.values())
-        item_entities = item_entities[offset:]
-
-        query_result: list[Item] = []
+        if item_entity is None:
+            return None
+        return Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted, item_entity.version)
 
-        for item_entity in item_entities:
-            if len(query_result) == limit:
-                break
+    def get_entity(self, item_id: int) -> ItemEntity | None:
+        return self.__item_table.get(item_id)
 
-            if min_price is not None and item_entity.price < min_price:
-                continue
-            if max_price is not None and item_entity.price > max_price:
-                continue
-            if not show_deleted and item_entity.deleted:
-                continue
+    def get_entities(self, item_ids: List[int]) -> List[ItemEntity | None]:
+        return list(map(self.__item_table.get, item_ids))
 
-            query_result.append(Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted))
-
-        return query_result[:limit]
-
-    def update(self, item: Item) -> Item:
+    def query(self, offset=0, limit=10, min_price: int | None = None, max_price: int | None = None,
+              show_deleted=False, after: tuple[float, int] | None = None) -> list[Item]:
+        """`after` is the (price, id) of the last item of the previous page."""
+        with self.__lock:
+            if min_price is None and max_price is None and after is None and show_deleted:
+                item_entities = iter(self.__item_table.values())
+            else:
+                if min_price is None and max_price is None:
+                    item_ids = self.__index.ids(after[1] if after is not None else None, show_deleted)
+                else:
+                    item_ids = self.__index.ids_by_price(min_price, max_price, after, show_deleted)
+                item_entities = map(self.__item_table.__getitem__, item_ids)
+
+            items = [Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted, item_entity.version)
+                     for item_entity in islice(item_entities, offset, offset + limit)]
+
+        if self.scan_observer is not None:
+            # the table and the indexes yield matching rows only, the skipped offset included
+            self.scan_observer("query", offset + len(items), len(items))
+        return items
+
+    def search(self, query: str, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+               show_deleted=False) -> List[Item]:
+        low = min_price if min_price is not None else -math.inf
+        high = max_price if max_price is not None else math.inf
+        scan_observer = self.scan_observer
+
+        def accept(item_id: int) -> bool:
+            item_entity = item_table[item_id]
+            return (show_deleted or not item_entity.deleted) and low <= item_entity.price <= high
+
+        with self.__lock:
+            item_table = self.__item_table
+            item_ids = self.__names.search(query, lambda item_id: item_table[item_id].name, accept)
+            if scan_observer is not None:
+                visited = count()
+                item_ids = map(lambda item_id, _: item_id, item_ids, visited)
+
+            items = [Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted, item_entity.version)
+                     for item_entity in map(item_table.__getitem__, islice(item_ids, offset, offset + limit))]
+
+        if scan_observer is not None:
+            scan_observer("search", next(visited), len(items))
+        return items
+
+    def update(self, item: Item, expected_version: int | None = None) -> Item:
         assert item.id
         item_entity = self.__item_table.get(item.id)
         assert item_entity
 
-        item_entity.name = item.name
-        item_entity.price = item.price
-        item_entity.deleted = item.deleted
-
-        return Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted)
+        with self.__lock:
+            if expected_version is not None and item_entity.version != expected_version:
+                raise VersionConflictError(f"Item {item.id} is at version {item_entity.version}, "
+                                           f"not {expected_version}")
 
+            old_price, old_deleted = item_entity.price, item_entity.deleted
+            self.__index.move(item_entity.id, old_price, old_deleted, item.price, item.deleted)
+            self.__names.rename(item_entity.id, item_entity.name, item.name)
 
-@dataclass(slots=True)
-class CartItemEntity:
-    id: int
-    item: ItemRepository.ItemEntity
-    quantity: int
+            item_entity.name = item.name
+            item_entity.price = item.price
+            item_entity.deleted = item.deleted
+            item_entity.version += 1
+            updated_item = Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted,
+                                item_entity.version)
 
-    def available(self) -> bool:
-        return not self.item.deleted
+        self._notify_updated(item_entity, old_price, old_deleted)
 
+        return updated_item
 
-@dataclass(slots=True)
-class CartEntity:
-    id: int
-    items: List[CartItemEntity]
+    def purge_deleted(self, is_referenced: Callable[[int], bool]) -> List[int]:
+        with self.__lock:
+            purged_ids = [item_id for item_id in self.__index.deleted_ids() if not is_referenced(item_id)]
+            for item_id in purged_ids:
+                item_entity = self.__item_table.pop(item_id)
+                self.__index.remove(item_id, item_entity.price, True)
+                self.__names.remove(item_id, item_entity.name)
+        return purged_ids
 
-    def price(self) -> float:
-        price = 0
-        for cart_item in self.items:
-            if cart_item.available():
-                price += cart_item.quantity * cart_item.item.price
 
-        return price
+class CartRepository(CartStorage):
+    LOCK_STRIPES = 64
 
-
-class CartRepository:
     __cart_table: dict[int, CartEntity]
+    __cart_id_index: SortedIndex
     __cart_item_table: dict[int, CartItemEntity]
-    __cart_id_generator = id_generator()
-    __cart_item_id_generator = id_generator()
+    __item_cart_index: dict[int, dict[int, CartItemEntity]]
+    __retired_item_ids: set[int]
+    __cart_id_generator: Iterator[int]
+    __cart_item_id_generator: Iterator[int]
+    __statistics: CartStatistics
+    __table_lock: Lock
+    __cart_locks: list[Lock]
+    # held to open a line or retire an item, so compaction never purges an item a new line refers to
+    __item_lines_lock: Lock
 
     def __init__(self):
         self.__cart_table = dict()
+        self.__cart_id_index = SortedIndex()
         self.__cart_item_table = dict()
+        self.__item_cart_index = dict()
+        self.__retired_item_ids = set()
+        self.__cart_id_generator = id_generator()
+        self.__cart_item_id_generator = id_generator()
+        self.__statistics = CartStatistics()
+        self.__table_lock = Lock()
+        self.__cart_locks = [Lock() for _ in range(self.LOCK_STRIPES)]
+        self.__item_lines_lock = Lock()
+
+    def __cart_lock(self, cart_id: int) -> Lock:
+        return self.__cart_locks[cart_id % self.LOCK_STRIPES]
 
     def create_cart(self) -> CartEntity:
         cart_id = next(self.__cart_id_generator)
         new_cart = CartEntity(id=cart_id, items=[])
-        self.__cart_table[cart_id] = new_cart
+        with self.__table_lock:
+            self.__cart_table[cart_id] = new_cart
+            self.__cart_id_index.add(cart_id)
+        self.__statistics.add(new_cart.total_price, new_cart.total_quantity)
         return new_cart
 
-    def get_cart(self, cart_id: int) -> CartEntity:
+    def get_cart(self, cart_id: int) -> CartEntity | None:
+        return self.__cart_table.get(cart_id)
+
+    def carts(self) -> List[CartEntity]:
+        with self.__table_lock:
+            return list(self.__cart_table.values())
+
+    def restore(self, cart_ids: List[int], lines: Iterable[tuple[int, ItemEntity, int]]) -> None:
+        """Replaces the contents with carts `cart_ids` (ascending) holding `lines` of (cart_id, item, quantity)."""
+        with self.__table_lock:
+            self.__cart_table = {cart_id: CartEntity(id=cart_id, items=[]) for cart_id in cart_ids}
+            self.__cart_id_index = SortedIndex.from_sorted(cart_ids)
+            self.__cart_item_table = dict()
+            self.__item_cart_index = dict()
+            self.__cart_id_generator = count(cart_ids[-1] + 1 if cart_ids else 1)
+
+            for cart_id, item, quantity in lines:
+                cart = self.__cart_table[cart_id]
+                if item.id in cart.items_by_item_id:
+                    self.__add_line(cart, item, quantity)
+                    continue
+
+                # a line new to the cart, which is what snapshots hold: skip the generic merge-and-reprice path
+                unit_price = 0 if item.deleted else item.price
+                cart_item = CartItemEntity(next(self.__cart_item_id_generator), item, quantity, unit_price)
+                cart.items.append(cart_item)
+                cart.items_by_item_id[item.id] = cart_item
+                cart.total_quantity += quantity
+                cart.total_price += quantity * unit_price
+                self.__cart_item_table[cart_item.id] = cart_item
+                self.__item_cart_index.setdefault(item.id, dict())[cart_id] = cart_item
+
+            self.__statistics = CartStatistics((cart.total_price, cart.total_quantity)
+                                               for cart in self.__cart_table.values())
+
+    def add_item_to_cart(self, cart_id: int, item: ItemEntity, quantity: int = 1) -> CartEntity:
         assert cart_id
         cart = self.__cart_table.get(cart_id)
         assert cart, f"Cart with id {cart_id} not found"
+
+        with self.__cart_lock(cart_id):
+            self.__open_lines(cart, [item])
+            old_price, old_quantity = cart.total_price, cart.total_quantity
+            self.__add_line(cart, item, quantity)
+            self.__statistics.move(old_price, old_quantity, cart.total_price, cart.total_quantity)
         return cart
 
-    def add_item_to_cart(self, cart_id: int, item: ItemRepository.ItemEntity, quantity: int = 1) -> CartEntity:
+    def add_items_to_cart(self, cart_id: int, lines: List[tuple[ItemEntity, int]]) -> CartEntity:
         assert cart_id
         cart = self.__cart_table.get(cart_id)
         assert cart, f"Cart with id {cart_id} not found"
 
-        for cart_item in cart.items:
-            if cart_item.item.id == item.id:
-                cart_item.quantity += quantity
-                return cart
-
-        cart_item_id = next(self.__cart_item_id_generator)
-        new_cart_item = CartItemEntity(
-            id=cart_item_id,
-            item=item,
-            quantity=quantity
-        )
-        cart.items.append(new_cart_item)
-        self.__cart_item_table[cart_item_id] = new_cart_item
+        with self.__cart_lock(cart_id):
+            # every line is opened first, so a purged item fails the batch before any of it is applied
+            self.__open_lines(cart, [item for item, _ in lines])
+            old_price, old_quantity = cart.total_price, cart.total_quantity
+            for item, quantity in lines:
+                self.__add_line(cart, item, quantity)
+            self.__statistics.move(old_price, old_quantity, cart.total_price, cart.total_quantity)
         return cart
 
+    def __open_lines(self, cart: CartEntity, items: List[ItemEntity]) -> None:
+        """Adds empty lines for the items the cart holds no line for yet. Call with the cart's lock held."""
+        new_items = [item for item in items if item.id not in cart.items_by_item_id]
+        if not new_items:
+            return
+
+        with self.__item_lines_lock:
+            retired_ids = sorted({item.id for item in new_items} & self.__retired_item_ids)
+            if retired_ids:
+                raise PurgedItemError(f"Items {retired_ids} were purged")
+
+            for item in new_items:
+                if item.id in cart.items_by_item_id:
+                    # the same item twice in one batch
+                    continue
+                cart_item_id = next(self.__cart_item_id_generator)
+                cart_item = CartItemEntity(
+                    id=cart_item_id,
+                    item=item,
+                    quantity=0
+                )
+                cart.items.append(cart_item)
+                cart.items_by_item_id[item.id] = cart_item
+                self.__cart_item_table[cart_item_id] = cart_item
+                # indexed before the price is read: an item update either sees this line or happened before the read
+                self.__item_cart_index.setdefault(item.id, dict())[cart.id] = cart_item
+
+    def __add_line(self, cart: CartEntity, item: ItemEntity, quantity: int) -> None:
+        cart_item = cart.items_by_item_id[item.id]
+        # storages that hand out copies may have given the line an older state, or a newer one since the caller's read
+        if item.version >= cart_item.item.version:
+            cart_item.item = item
+        self.__reprice_line(cart, cart_item)
+        cart_item.quantity += quantity
+        cart.total_quantity += quantity
+        cart.total_price += quantity * cart_item.unit_price
+
+    @staticmethod
+    def __reprice_line(cart: CartEntity, cart_item: CartItemEntity) -> None:
+        unit_price = 0 if cart_item.item.deleted else cart_item.item.price
+        cart.total_price += cart_item.quantity * (unit_price - cart_item.unit_price)
+        cart_item.unit_price = unit_price
+
+    def references_item(self, item_id: int) -> bool:
+        return bool(self.__item_cart_index.get(item_id))
+
+    def retire_item(self, item_id: int) -> bool:
+        with self.__item_lines_lock:
+            if self.__item_cart_index.get(item_id):
+                return False
+            self.__retired_item_ids.add(item_id)
+            return True
+
+    def carts_with_item(self, item_id: int) -> List[int]:
+        return list(self.__item_cart_index.get(item_id, {}))
+
+    def on_item_updated(self, item: ItemEntity, old_price: float, old_deleted: bool) -> None:
+        for cart_id, cart_item in list(self.__item_cart_index.get(item.id, {}).items()):
+            with self.__cart_lock(cart_id):
+                # storages that hand out copies of entities pass the new state here
+                cart_item.item = item
+                cart = self.__cart_table[cart_id]
+                old_total = cart.total_price
+                self.__reprice_line(cart, cart_item)
+                self.__statistics.move(old_total, cart.total_quantity, cart.total_price, cart.total_quantity)
+
+    def stats(self) -> CartStats:
+        return self.__statistics.snapshot()
+
     def query_carts(
             self,
             offset: int = 0,
@@ -145,32 +371,40 @@ class CartRepository:
             min_price: float = None,
             max_price: float = None,
             min_quantity: int = None,
-            max_quantity: int = None
+            max_quantity: int = None,
+            after_id: int = None
     ) -> List[CartEntity]:
-        cart_entities = list(self.__cart_table.values())
-        cart_entities = cart_entities[offset:]
-
         query_result: List[CartEntity] = []
-        for cart_entity in cart_entities:
-            if len(query_result) == limit:
-                break
-
-            total_price = cart_entity.price()
-            total_quantity = sum(item.quantity for item in cart_entity.items)
-
-            if min_price is not None and total_price < min_price:
-                continue
-            if max_price is not None and total_price > max_price:
-                continue
-            if min_quantity is not None and total_quantity < min_quantity:
-                continue
-            if max_quantity is not None and total_quantity > max_quantity:
-                continue
-
-            query_result.append(cart_entity)
-
-        return query_result[:limit]
-
+        scan_observer = self.scan_observer
+        with self.__table_lock:
+            if after_id is None:
+                cart_entities = iter(self.__cart_table.values())
+            else:
+                cart_ids = self.__cart_id_index.irange(minimum=after_id, exclude_minimum=True)
+                cart_entities = (self.__cart_table[cart_id] for cart_id in cart_ids)
+
+            if scan_observer is not None:
+                # counts the carts pulled from the table, so the loop below stays as cheap as without it
+                visited = count()
+                cart_entities = map(lambda cart_entity, _: cart_entity, cart_entities, visited)
+
+            for cart_entity in cart_entities:
+                if len(query_result) == offset + limit:
+                    break
+
+                if min_price is not None and cart_entity.total_price < min_price:
+                    continue
+                if max_price is not None and cart_entity.total_price > max_price:
+                    continue
+                if min_quantity is not None and cart_entity.total_quantity < min_quantity:
+                    continue
+                if max_quantity is not None and cart_entity.total_quantity > max_quantity:
+                    continue
+
+                query_result.append(cart_entity)
+
+        carts = query_result[offset:]
+        if scan_observer is not None:
+            scan_observer("query_carts", next(visited), len(carts))
+        return carts
 
-item_repository = ItemRepository()
-cart_repository = CartRepository()
@@ -0,0 +1,538 @@
+import fcntl
+import math
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from itertools import count, groupby, islice
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from operator import itemgetter
+from typing import Callable, Iterator, List
+
+from lecture_2.hw.shop_api.routes.model import CartStats, Item
+from lecture_2.hw.shop_api.storage.base import CartEntity, CartStorage, ItemEntity, ItemStorage, VersionConflictError
+from lecture_2.hw.shop_api.storage.index import ItemIndex, NameIndex
+from lecture_2.hw.shop_api.storage.repository import CartRepository
+
+SHARED_NAME_ENV = "SHOP_SHARED_NAME"
+SHARED_CAPACITY_ENV = "SHOP_SHARED_CAPACITY"
+
+SHARED_MAGIC = b"SHOPSHM2"
+# seconds a reader waits for a half-written record before it gives up on the writer
+TORN_RECORD_TIMEOUT = 1.0
+
+# magic, item capacity, name arena bytes, change log entries, cart log entries
+_LAYOUT = struct.Struct("<8sQQQQ")
+# items created, name arena bytes used, changes logged
+_COUNTERS = struct.Struct("<QQQ")
+# cart events logged
+_CART_COUNTERS = struct.Struct("<Q")
+# version (odd while the record is rewritten, grows by two per write), deleted, price, name offset, name length
+_RECORD = struct.Struct("<I?3xdQI4x")
+_VERSION = struct.Struct("<I")
+_LOG_ENTRY = struct.Struct("<q")
+# cart id, item id (_NEW_CART for the cart's creation), quantity
+_CART_EVENT = struct.Struct("<qqq")
+_NEW_CART = 0
+
+
+class CatalogueFullError(RuntimeError):
+    pass
+
+
+class TornRecordError(RuntimeError):
+    """A record stayed half-written, as its writer died in the middle of the write."""
+
+
+def lock_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+
+class SharedCatalogue:
+    """Item records in one shared memory segment: a fixed-width record per id, a UTF-8 name arena
+    and a ring log of changed ids that lets every process keep its own indexes up to date.
+    Carts are kept as a log of their creations and added lines, which every process replays.
+
+    Writers take `write_lock()`, which also excludes other processes. Readers take no lock:
+    a record's version is odd while it is being rewritten, and a read that saw it change is retried.
+    """
+
+    name: str
+    capacity: int
+    arena_capacity: int
+    log_capacity: int
+    cart_log_capacity: int
+    __memory: SharedMemory
+    __buffer: memoryview
+    __records_offset: int
+    __log_offset: int
+    __cart_log_offset: int
+    __arena_offset: int
+    __thread_lock: threading.Lock
+    __lock_file: object
+
+    def __init__(self, memory: SharedMemory):
+        self.__memory = memory
+        self.__buffer = memory.buf
+        magic, self.capacity, self.arena_capacity, self.log_capacity, self.cart_log_capacity = \
+            _LAYOUT.unpack_from(self.__buffer, 0)
+        if magic != SHARED_MAGIC:
+            raise ValueError(f"Shared memory segment {memory.name} is not a shop catalogue")
+
+        self.name = memory.name
+        self.__records_offset = _LAYOUT.size + _COUNTERS.size + _CART_COUNTERS.size
+        self.__log_offset = self.__records_offset + self.capacity * _RECORD.size
+        self.__cart_log_offset = self.__log_offset + self.log_capacity * _LOG_ENTRY.size
+        self.__arena_offset = self.__cart_log_offset + self.cart_log_capacity * _CART_EVENT.size
+        self.__thread_lock = threading.Lock()
+        self.__lock_file = open(lock_path(self.name), "a+b")
+
+    @classmethod
+    def create(cls, name: str, capacity: int, arena_capacity: int | None = None, log_capacity: int | None = None,
+               cart_log_capacity: int | None = None) -> "SharedCatalogue":
+        arena_capacity = arena_capacity if arena_capacity is not None else capacity * 64
+        log_capacity = log_capacity if log_capacity is not None else max(capacity // 16, 1024)
+        cart_log_capacity = cart_log_capacity if cart_log_capacity is not None else max(capacity, 1024)
+        size = (_LAYOUT.size + _COUNTERS.size + _CART_COUNTERS.size + capacity * _RECORD.size
+                + log_capacity * _LOG_ENTRY.size + cart_log_capacity * _CART_EVENT.size + arena_capacity)
+
+        memory = SharedMemory(name, create=True, size=size)
+        _LAYOUT.pack_into(memory.buf, 0, SHARED_MAGIC, capacity, arena_capacity, log_capacity, cart_log_capacity)
+        _COUNTERS.pack_into(memory.buf, _LAYOUT.size, 0, 0, 0)
+        _CART_COUNTERS.pack_into(memory.buf, _LAYOUT.size + _COUNTERS.size, 0)
+        return cls(memory)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedCatalogue":
+        if sys.version_info >= (3, 13):
+            return cls(SharedMemory(name, track=False))
+
+        # before 3.13 attaching registers the segment with the resource tracker, which workers share with
+        # the process that created it; unregistering afterwards would drop the creator's registration too
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return cls(SharedMemory(name))
+        finally:
+            resource_tracker.register = register
+
+    def close(self) -> None:
+        self.__buffer = None
+        self.__memory.close()
+        self.__lock_file.close()
+
+    def unlink(self) -> None:
+        self.__memory.unlink()
+        if os.path.exists(lock_path(self.name)):
+            os.remove(lock_path(self.name))
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        # flock excludes other processes, the thread lock other threads of this one (they share the descriptor)
+        with self.__thread_lock:
+            fcntl.flock(self.__lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.__lock_file, fcntl.LOCK_UN)
+
+    def counters(self) -> tuple[int, int, int]:
+        """Items created, name arena bytes used and changes logged so far."""
+        return _COUNTERS.unpack_from(self.__buffer, _LAYOUT.size)
+
+    def __record_offset(self, item_id: int) -> int:
+        return self.__records_offset + (item_id - 1) * _RECORD.size
+
+    def read(self, item_id: int) -> ItemEntity | None:
+        """The item as last written, or None if it was never created."""
+        if item_id < 1 or item_id > self.counters()[0]:
+            return None
+
+        offset = self.__record_offset(item_id)
+        deadline = None
+        while True:
+            version, deleted, price, name_offset, name_length = _RECORD.unpack_from(self.__buffer, offset)
+            if version & 1:
+                # a writer that died halfway through the record never finishes it
+                if deadline is None:
+                    deadline = time.monotonic() + TORN_RECORD_TIMEOUT
+                elif time.monotonic() > deadline:
+                    raise TornRecordError(f"Item {item_id} in {self.name} stayed half-written")
+                time.sleep(0)
+                continue
+            start = self.__arena_offset + name_offset
+            name = str(self.__buffer[start:start + name_length], "utf-8")
+            if _VERSION.unpack_from(self.__buffer, offset)[0] == version:
+                return ItemEntity(item_id, name, price, deleted, version // 2 + 1)
+
+    def append(self, items: List[Item]) -> List[int]:
+        """Writes new records and returns their ids. Call with `write_lock()` held."""
+        count, arena_used, changes = self.counters()
+        if count + len(items) > self.capacity:
+            raise CatalogueFullError(f"Shared catalogue {self.name} holds at most {self.capacity} items")
+
+        item_ids = []
+        for item in items:
+            count += 1
+            name_offset, arena_used = self.__append_name(item.name, arena_used)
+            _RECORD.pack_into(self.__buffer, self.__record_offset(count), 0, item.deleted, item.price,
+                              name_offset, arena_used - name_offset)
+            item_ids.append(count)
+
+        # publishing the counters last makes the new records visible only once they are complete
+        _COUNTERS.pack_into(self.__buffer, _LAYOUT.size, count, arena_used, changes)
+        return item_ids
+
+    def write(self, item_id: int, name: str, price: float, deleted: bool) -> None:
+        """Rewrites an existing record and logs the change. Call with `write_lock()` held."""
+        count, arena_used, changes = self.counters()
+        offset = self.__record_offset(item_id)
+        version, _, _, name_offset, name_length = _RECORD.unpack_from(self.__buffer, offset)
+
+        start = self.__arena_offset + name_offset
+        if str(self.__buffer[start:start + name_length], "utf-8") != name:
+            # the old name stays in the arena as garbage; renames are rare next to reads
+            name_offset, arena_used = self.__append_name(name, arena_used)
+            name_length = arena_used - name_offset
+
+        _VERSION.pack_into(self.__buffer, offset, version + 1)
+        _RECORD.pack_into(self.__buffer, offset, version + 1, deleted, price, name_offset, name_length)
+        _VERSION.pack_into(self.__buffer, offset, version + 2)
+
+        _LOG_ENTRY.pack_into(self.__buffer, self.__log_offset + (changes % self.log_capacity) * _LOG_ENTRY.size,
+                             item_id)
+        _COUNTERS.pack_into(self.__buffer, _LAYOUT.size, count, arena_used, changes + 1)
+
+    def __append_name(self, name: str, arena_used: int) -> tuple[int, int]:
+        encoded = name.encode()
+        if arena_used + len(encoded) > self.arena_capacity:
+            raise CatalogueFullError(f"Shared catalogue {self.name} is out of name space")
+        start = self.__arena_offset + arena_used
+        self.__buffer[start:start + len(encoded)] = encoded
+        return arena_used, arena_used + len(encoded)
+
+    def changed_ids(self, seen: int, changes: int) -> List[int] | None:
+        """Ids changed by changes `seen`..`changes`, or None if the ring log no longer holds all of them."""
+        if changes - seen > self.log_capacity:
+            return None
+        entries = array("q", [
+            _LOG_ENTRY.unpack_from(self.__buffer, self.__log_offset + (change % self.log_capacity) * _LOG_ENTRY.size)[0]
+            for change in range(seen, changes)
+        ])
+        # a writer may have wrapped around over the entries while they were read
+        if self.counters()[2] - seen > self.log_capacity:
+            return None
+        return list(entries)
+
+    def cart_events_logged(self) -> int:
+        return _CART_COUNTERS.unpack_from(self.__buffer, _LAYOUT.size + _COUNTERS.size)[0]
+
+    def log_cart_events(self, events: List[tuple[int, int, int]]) -> None:
+        """Appends (cart id, item id, quantity) events. Call with `write_lock()` held."""
+        logged = self.cart_events_logged()
+        if logged + len(events) > self.cart_log_capacity:
+            raise CatalogueFullError(f"Shared catalogue {self.name} holds at most {self.cart_log_capacity} "
+                                     f"cart changes")
+
+        for index, event in enumerate(events, logged):
+            _CART_EVENT.pack_into(self.__buffer, self.__cart_log_offset + index * _CART_EVENT.size, *event)
+        # publishing the counter last makes a batch visible at once
+        _CART_COUNTERS.pack_into(self.__buffer, _LAYOUT.size + _COUNTERS.size, logged + len(events))
+
+    def cart_events(self, seen: int, logged: int) -> List[tuple[int, int, int]]:
+        """Cart events `seen`..`logged`; the log is never overwritten."""
+        return [_CART_EVENT.unpack_from(self.__buffer, self.__cart_log_offset + index * _CART_EVENT.size)
+                for index in range(seen, logged)]
+
+
+class SharedItemRepository(ItemStorage):
+    """An item storage every worker process attaches to. Records are read straight from shared memory;
+    each process keeps its own price, id and name indexes and catches up with other writers from the change log.
+    """
+
+    shared_across_processes = True
+
+    __catalogue: SharedCatalogue
+    __index: ItemIndex
+    __keys: dict[int, tuple[float, bool]]
+    __names: dict[int, str]
+    __name_index: NameIndex
+    __seen_items: int
+    __seen_changes: int
+    __lock: threading.Lock
+
+    def __init__(self, catalogue: SharedCatalogue):
+        super().__init__()
+        self.__catalogue = catalogue
+        self.__index = ItemIndex()
+        self.__keys = dict()
+        self.__names = dict()
+        self.__name_index = NameIndex()
+        self.__seen_items = 0
+        self.__seen_changes = 0
+        self.__lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Catches up with the writes of every worker, so update listeners hear of changes made elsewhere too."""
+        with self.__lock:
+            self.__refresh()
+
+    def __refresh(self) -> None:
+        """Applies records created and changed since the last refresh to the local indexes and notifies the update
+        listeners of changed prices and deleted flags. Call with `__lock` held.
+        """
+        count, _, changes = self.__catalogue.counters()
+        if count == self.__seen_items and changes == self.__seen_changes:
+            return
+
+        old_keys = dict()
+        changed_ids = self.__catalogue.changed_ids(self.__seen_changes, changes)
+        if changed_ids is None:
+            # fell too far behind the ring log: start over from the records
+            old_keys = self.__keys
+            self.__index, self.__keys, self.__seen_items = ItemIndex(), dict(), 0
+            self.__names, self.__name_index = dict(), NameIndex()
+            changed_ids = []
+
+        updates = []
+        new_entries = []
+        for item_entity in map(self.__catalogue.read, range(self.__seen_items + 1, count + 1)):
+            old_key = old_keys.get(item_entity.id)
+            if old_key is None and item_entity.version > 1:
+                # updated before this worker indexed it, while a cart may already hold the record as first read;
+                # that state is unknown here and a NaN price differs from any other
+                old_key = (math.nan, item_entity.deleted)
+            if old_key is not None:
+                updates.append((item_entity, *old_key))
+            self.__keys[item_entity.id] = (item_entity.price, item_entity.deleted)
+            self.__names[item_entity.id] = item_entity.name
+            self.__name_index.add(item_entity.id, item_entity.name)
+            new_entries.append((item_entity.id, item_entity.price, item_entity.deleted))
+        self.__index.add_many(new_entries)
+
+        # records are re-read rather than replayed, so ids logged twice or already seen as new are harmless
+        for item_id in changed_ids:
+            if item_id > count:
+                continue
+            item_entity = self.__catalogue.read(item_id)
+            old_price, old_deleted = self.__keys[item_id]
+            if (item_entity.price, item_entity.deleted) != (old_price, old_deleted):
+                self.__index.move(item_id, old_price, old_deleted, item_entity.price, item_entity.deleted)
+                self.__keys[item_id] = (item_entity.price, item_entity.deleted)
+                updates.append((item_entity, old_price, old_deleted))
+            self.__name_index.rename(item_id, self.__names[item_id], item_entity.name)
+            self.__names[item_id] = item_entity.name
+
+        self.__seen_items, self.__seen_changes = count, changes
+        # still under the lock, so listeners hear of the changes to an item in the order they were made
+        for item_entity, old_price, old_deleted in updates:
+            self._notify_updated(item_entity, old_price, old_deleted)
+
+    def create(self, item: Item) -> Item:
+        return self.create_many([item])[0]
+
+    def create_many(self, items: List[Item]) -> List[Item]:
+        with self.__catalogue.write_lock():
+            item_ids = self.__catalogue.append(items)
+
+        for item, item_id in zip(items, item_ids):
+            item.id, item.version = item_id, 1
+        return items
+
+    def get(self, item_id: int) -> Item | None:
+        item_entity = self.__catalogue.read(item_id)
+        if item_entity is None:
+            return None
+        return Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted, item_entity.version)
+
+    def get_entity(self, item_id: int) -> ItemEntity | None:
+        return self.__catalogue.read(item_id)
+
+    def get_entities(self, item_ids: List[int]) -> List[ItemEntity | None]:
+        return list(map(self.__catalogue.read, item_ids))
+
+    def query(self, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+              show_deleted=False, after: tuple[float, int] | None = None) -> List[Item]:
+        with self.__lock:
+            self.__refresh()
+            if min_price is None and max_price is None:
+                item_ids = list(islice(self.__index.ids(after[1] if after is not None else None, show_deleted),
+                                       offset, offset + limit))
+            else:
+                item_ids = list(islice(self.__index.ids_by_price(min_price, max_price, after, show_deleted),
+                                       offset, offset + limit))
+
+        items = []
+        for item_entity in map(self.__catalogue.read, item_ids):
+            # a record may have changed after the refresh
+            if item_entity is not None and (show_deleted or not item_entity.deleted):
+                items.append(Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted,
+                                  item_entity.version))
+
+        if self.scan_observer is not None:
+            self.scan_observer("query", offset + len(item_ids), len(items))
+        return items
+
+    def search(self, query: str, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+               show_deleted=False) -> List[Item]:
+        low = min_price if min_price is not None else -math.inf
+        high = max_price if max_price is not None else math.inf
+        scan_observer = self.scan_observer
+        def accept(item_id: int) -> bool:
+            price, deleted = self.__keys[item_id]
+            return (show_deleted or not deleted) and low <= price <= high
+
+        with self.__lock:
+            self.__refresh()
+            item_ids = self.__name_index.search(query, self.__names.__getitem__, accept)
+            if scan_observer is not None:
+                visited = count()
+                item_ids = map(lambda item_id, _: item_id, item_ids, visited)
+            item_ids = list(islice(item_ids, offset, offset + limit))
+
+        items = []
+        for item_entity in map(self.__catalogue.read, item_ids):
+            # a record may have changed after the refresh
+            if show_deleted or not item_entity.deleted:
+                items.append(Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted,
+                                  item_entity.version))
+
+        if scan_observer is not None:
+            scan_observer("search", next(visited), len(items))
+        return items
+
+    def update(self, item: Item, expected_version: int | None = None) -> Item:
+        assert item.id
+        with self.__catalogue.write_lock():
+            item_entity = self.__catalogue.read(item.id)
+            assert item_entity
+            # the write lock spans every process, so the check and the write are one step for all workers
+            if expected_version is not None and item_entity.version != expected_version:
+                raise VersionConflictError(f"Item {item.id} is at version {item_entity.version}, "
+                                           f"not {expected_version}")
+            self.__catalogue.write(item.id, item.name, item.price, item.deleted)
+
+        # listeners hear of the write from the change log, in order with the writes of other workers
+        self.refresh()
+        return Item(item.id, item.name, item.price, item.deleted, item_entity.version + 1)
+
+    def purge_deleted(self, is_referenced: Callable[[int], bool]) -> List[int]:
+        # ids are offsets of fixed records in the segment, which only grows
+        return []
+
+
+class SharedCartRepository(CartStorage):
+    """A cart storage every worker process attaches to. Creations and added lines go to the catalogue's cart log;
+    each process replays the log into its own `CartRepository`, which serves reads with totals and statistics.
+    """
+
+    shared_across_processes = True
+
+    __catalogue: SharedCatalogue
+    __item_repository: SharedItemRepository
+    __carts: CartRepository
+    __seen_events: int
+    __cart_count: int
+    __lock: threading.Lock
+
+    def __init__(self, catalogue: SharedCatalogue, item_repository: SharedItemRepository):
+        self.__catalogue = catalogue
+        self.__item_repository = item_repository
+        self.__carts = CartRepository()
+        self.__seen_events = 0
+        self.__cart_count = 0
+        self.__lock = threading.Lock()
+
+    def __refresh(self) -> None:
+        # items first, so carts are priced at least as recently as the items a caller may have read
+        self.__item_repository.refresh()
+        self.__replay()
+
+    def __replay(self) -> None:
+        """Applies the cart events logged since the last replay to the local carts."""
+        with self.__lock:
+            logged = self.__catalogue.cart_events_logged()
+            if logged == self.__seen_events:
+                return
+
+            events = self.__catalogue.cart_events(self.__seen_events, logged)
+            # a bulk add is logged as consecutive events of one cart and is applied as one batch again
+            for cart_id, cart_events in groupby(events, key=itemgetter(0)):
+                lines = []
+                for _, item_id, quantity in cart_events:
+                    if item_id == _NEW_CART:
+                        self.__carts.create_cart()
+                        self.__cart_count += 1
+                    else:
+                        # records are never purged, and the current one is the newest state of the item
+                        lines.append((self.__catalogue.read(item_id), quantity))
+                if lines:
+                    self.__carts.add_items_to_cart(cart_id, lines)
+            self.__seen_events = logged
+
+    def create_cart(self) -> CartEntity:
+        with self.__catalogue.write_lock():
+            self.__replay()
+            # local carts are numbered in log order, so every process gives the cart the same id
+            cart_id = self.__cart_count + 1
+            self.__catalogue.log_cart_events([(cart_id, _NEW_CART, 0)])
+            self.__replay()
+        return self.__carts.get_cart(cart_id)
+
+    def get_cart(self, cart_id: int) -> CartEntity | None:
+        self.__refresh()
+        return self.__carts.get_cart(cart_id)
+
+    def add_item_to_cart(self, cart_id: int, item: ItemEntity, quantity: int = 1) -> CartEntity:
+        return self.add_items_to_cart(cart_id, [(item, quantity)])
+
+    def add_items_to_cart(self, cart_id: int, lines: List[tuple[ItemEntity, int]]) -> CartEntity:
+        assert cart_id
+        with self.__catalogue.write_lock():
+            self.__replay()
+            assert self.__carts.get_cart(cart_id), f"Cart with id {cart_id} not found"
+            self.__catalogue.log_cart_events([(cart_id, item.id, quantity) for item, quantity in lines])
+            self.__replay()
+        return self.__carts.get_cart(cart_id)
+
+    def references_item(self, item_id: int) -> bool:
+        self.__refresh()
+        return self.__carts.references_item(item_id)
+
+    def retire_item(self, item_id: int) -> bool:
+        # the shared catalogue never purges
+        return False
+
+    def carts_with_item(self, item_id: int) -> List[int]:
+        self.__refresh()
+        return self.__carts.carts_with_item(item_id)
+
+    def on_item_updated(self, item: ItemEntity, old_price: float, old_deleted: bool) -> None:
+        self.__carts.on_item_updated(item, old_price, old_deleted)
+
+    def stats(self) -> CartStats:
+        self.__refresh()
+        return self.__carts.stats()
+
+    def query_carts(self, offset: int = 0, limit: int = 10, min_price: float = None, max_price: float = None,
+                    min_quantity: int = None, max_quantity: int = None, after_id: int = None) -> List[CartEntity]:
+        self.__refresh()
+        # set by instrumentation after construction
+        self.__carts.scan_observer = self.scan_observer
+        return self.__carts.query_carts(offset, limit, min_price, max_price, min_quantity, max_quantity, after_id)
+
+
+@contextmanager
+def shared_catalogue(name: str, capacity: int) -> Iterator[SharedCatalogue]:
+    """Creates the segment for the lifetime of a multi-worker server and removes it afterwards."""
+    catalogue = SharedCatalogue.create(name, capacity)
+    try:
+        yield catalogue
+    finally:
+        catalogue.close()
+        catalogue.unlink()
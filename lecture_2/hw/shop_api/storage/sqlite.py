@@ -0,0 +1,350 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+from lecture_2.hw.shop_api.routes.model import CartStats, Item
+from lecture_2.hw.shop_api.storage.base import (CartEntity, CartItemEntity, CartStorage, ItemEntity, ItemStorage,
+                                                 PurgedItemError, VersionConflictError)
+from lecture_2.hw.shop_api.storage.index import PREFIX_END, WORD, tokenize
+from lecture_2.hw.shop_api.storage.stats import CartStatistics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS item (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS item_price ON item (price, id);
+CREATE INDEX IF NOT EXISTS item_deleted ON item (deleted, id);
+CREATE INDEX IF NOT EXISTS item_live_price ON item (price, id) WHERE deleted = 0;
+
+-- words of item names; the primary key orders them, so the words with a prefix are one range
+CREATE TABLE IF NOT EXISTS item_word (
+    word TEXT NOT NULL,
+    item_id INTEGER NOT NULL REFERENCES item (id) ON DELETE CASCADE,
+    PRIMARY KEY (word, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS item_word_item ON item_word (item_id);
+
+CREATE TABLE IF NOT EXISTS cart (
+    id INTEGER PRIMARY KEY AUTOINCREMENT
+);
+
+CREATE TABLE IF NOT EXISTS cart_item (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cart_id INTEGER NOT NULL REFERENCES cart (id),
+    item_id INTEGER NOT NULL REFERENCES item (id),
+    quantity INTEGER NOT NULL,
+    UNIQUE (cart_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS cart_item_item ON cart_item (item_id);
+"""
+
+
+class SqliteDatabase:
+    """One connection per thread to a WAL-mode database file shared by every worker process.
+
+    Statements are plain constant strings, so sqlite3's per-connection statement cache keeps them prepared.
+    """
+
+    __local: threading.local
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__local = threading.local()
+        connection = self.connection()
+        indexed_words = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_word'").fetchone() is not None
+        connection.executescript(SCHEMA)
+        # databases created before items were versioned
+        if "version" not in {row[1] for row in connection.execute("PRAGMA table_info(item)")}:
+            connection.execute("ALTER TABLE item ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        # and before their names were indexed
+        if not indexed_words:
+            with self.transaction() as connection:
+                for item_id, name in connection.execute("SELECT id, name FROM item").fetchall():
+                    _insert_words(connection, item_id, name)
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self.__local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def close(self) -> None:
+        connection = getattr(self.__local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.__local.connection = None
+
+
+def _insert_words(connection: sqlite3.Connection, item_id: int, name: str) -> None:
+    connection.executemany("INSERT INTO item_word (word, item_id) VALUES (?, ?)",
+                           ((word, item_id) for word in tokenize(name)))
+
+
+class SqliteItemRepository(ItemStorage):
+    blocking = True
+    shared_across_processes = True
+
+    __database: SqliteDatabase
+
+    def __init__(self, database: SqliteDatabase):
+        super().__init__()
+        self.__database = database
+
+    def create(self, item: Item) -> Item:
+        with self.__database.transaction() as connection:
+            cursor = connection.execute("INSERT INTO item (name, price, deleted) VALUES (?, ?, ?)",
+                                        (item.name, item.price, item.deleted))
+            _insert_words(connection, cursor.lastrowid, item.name)
+        item.id, item.version = cursor.lastrowid, 1
+        return item
+
+    def create_many(self, items: List[Item]) -> List[Item]:
+        with self.__database.transaction() as connection:
+            for item in items:
+                item.id = connection.execute("INSERT INTO item (name, price, deleted) VALUES (?, ?, ?) RETURNING id",
+                                             (item.name, item.price, item.deleted)).fetchone()[0]
+                item.version = 1
+                _insert_words(connection, item.id, item.name)
+        return items
+
+    def get(self, item_id: int) -> Item | None:
+        item_entity = self.get_entity(item_id)
+        if item_entity is None:
+            return None
+        return Item(item_entity.id, item_entity.name, item_entity.price, item_entity.deleted, item_entity.version)
+
+    def get_entity(self, item_id: int) -> ItemEntity | None:
+        row = self.__database.connection().execute(
+            "SELECT id, name, price, deleted, version FROM item WHERE id = ?", (item_id,)).fetchone()
+        return ItemEntity(row[0], row[1], row[2], bool(row[3]), row[4]) if row else None
+
+    def get_entities(self, item_ids: List[int]) -> List[ItemEntity | None]:
+        # the ids go in as one JSON array, so the statement stays constant whatever their number
+        rows = self.__database.connection().execute(
+            "SELECT id, name, price, deleted, version FROM item WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(item_ids),)).fetchall()
+        item_entities = {row[0]: ItemEntity(row[0], row[1], row[2], bool(row[3]), row[4]) for row in rows}
+        return list(map(item_entities.get, item_ids))
+
+    def query(self, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+              show_deleted=False, after: tuple[float, int] | None = None) -> List[Item]:
+        clauses, params = [], []
+        if not show_deleted:
+            clauses.append("deleted = 0")
+
+        if min_price is None and max_price is None:
+            order_by = "id"
+            if after is not None:
+                clauses.append("id > ?")
+                params.append(after[1])
+        else:
+            order_by = "price, id"
+            if min_price is not None:
+                clauses.append("price >= ?")
+                params.append(min_price)
+            if max_price is not None:
+                clauses.append("price <= ?")
+                params.append(max_price)
+            if after is not None:
+                clauses.append("(price, id) > (?, ?)")
+                params.extend(after)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.__database.connection().execute(
+            f"SELECT id, name, price, deleted, version FROM item {where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+            (*params, limit, offset))
+        return [Item(row[0], row[1], row[2], bool(row[3]), row[4]) for row in rows]
+
+    def search(self, query: str, offset=0, limit=10, min_price: float | None = None, max_price: float | None = None,
+               show_deleted=False) -> List[Item]:
+        words = WORD.findall(query.casefold())
+        if not words:
+            return []
+
+        *whole_words, prefix = words
+        clauses, params = ["item_word.word >= ?", "item_word.word < ?"], [prefix, prefix + PREFIX_END]
+        for word in dict.fromkeys(whole_words):
+            clauses.append("item.id IN (SELECT item_id FROM item_word WHERE word = ?)")
+            params.append(word)
+        if not show_deleted:
+            clauses.append("item.deleted = 0")
+        if min_price is not None:
+            clauses.append("item.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            clauses.append("item.price <= ?")
+            params.append(max_price)
+
+        rows = self.__database.connection().execute(
+            "SELECT item.id, item.name, item.price, item.deleted, item.version, MIN(item_word.word) AS matched "
+            f"FROM item_word JOIN item ON item.id = item_word.item_id WHERE {' AND '.join(clauses)} "
+            "GROUP BY item.id ORDER BY matched, item.id LIMIT ? OFFSET ?",
+            (*params, limit, offset))
+        return [Item(row[0], row[1], row[2], bool(row[3]), row[4]) for row in rows]
+
+    def update(self, item: Item, expected_version: int | None = None) -> Item:
+        assert item.id
+        with self.__database.transaction() as connection:
+            row = connection.execute("SELECT price, deleted, version, name FROM item WHERE id = ?",
+                                     (item.id,)).fetchone()
+            assert row
+            if expected_version is not None and row[2] != expected_version:
+                raise VersionConflictError(f"Item {item.id} is at version {row[2]}, not {expected_version}")
+            connection.execute("UPDATE item SET name = ?, price = ?, deleted = ?, version = version + 1 WHERE id = ?",
+                               (item.name, item.price, item.deleted, item.id))
+            if row[3] != item.name:
+                connection.execute("DELETE FROM item_word WHERE item_id = ?", (item.id,))
+                _insert_words(connection, item.id, item.name)
+
+        version = row[2] + 1
+        self._notify_updated(ItemEntity(item.id, item.name, item.price, item.deleted, version), row[0], bool(row[1]))
+        return Item(item.id, item.name, item.price, item.deleted, version)
+
+    def purge_deleted(self, is_referenced: Callable[[int], bool]) -> List[int]:
+        # references are checked by the database in the same statement, which also rules out a concurrent add;
+        # AUTOINCREMENT keeps purged ids from being reused
+        with self.__database.transaction() as connection:
+            rows = connection.execute(
+                "DELETE FROM item WHERE deleted = 1 "
+                "AND NOT EXISTS (SELECT 1 FROM cart_item WHERE cart_item.item_id = item.id) RETURNING id").fetchall()
+        return sorted(row[0] for row in rows)
+
+
+class SqliteCartRepository(CartStorage):
+    blocking = True
+    shared_across_processes = True
+    LOAD_BATCH = 500
+
+    __database: SqliteDatabase
+
+    def __init__(self, database: SqliteDatabase):
+        self.__database = database
+
+    def create_cart(self) -> CartEntity:
+        with self.__database.transaction() as connection:
+            cursor = connection.execute("INSERT INTO cart DEFAULT VALUES")
+        return CartEntity(id=cursor.lastrowid, items=[])
+
+    def get_cart(self, cart_id: int) -> CartEntity | None:
+        connection = self.__database.connection()
+        if connection.execute("SELECT 1 FROM cart WHERE id = ?", (cart_id,)).fetchone() is None:
+            return None
+
+        return self.__load_carts(connection, [cart_id])[0]
+
+    def add_item_to_cart(self, cart_id: int, item: ItemEntity, quantity: int = 1) -> CartEntity:
+        return self.add_items_to_cart(cart_id, [(item, quantity)])
+
+    def add_items_to_cart(self, cart_id: int, lines: List[tuple[ItemEntity, int]]) -> CartEntity:
+        assert cart_id
+        with self.__database.transaction() as connection:
+            assert connection.execute("SELECT 1 FROM cart WHERE id = ?", (cart_id,)).fetchone(), \
+                f"Cart with id {cart_id} not found"
+            try:
+                connection.executemany(
+                    "INSERT INTO cart_item (cart_id, item_id, quantity) VALUES (?, ?, ?) "
+                    "ON CONFLICT (cart_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+                    [(cart_id, item.id, quantity) for item, quantity in lines])
+            except sqlite3.IntegrityError as error:
+                # the cart exists, so the foreign key that failed is an item's
+                raise PurgedItemError(f"Items of {[item.id for item, _ in lines]} were purged") from error
+            return self.__load_carts(connection, [cart_id])[0]
+
+    def references_item(self, item_id: int) -> bool:
+        return self.__database.connection().execute(
+            "SELECT 1 FROM cart_item WHERE item_id = ? LIMIT 1", (item_id,)).fetchone() is not None
+
+    def retire_item(self, item_id: int) -> bool:
+        # the foreign key on cart_item already keeps lines from referring to a purged item
+        return not self.references_item(item_id)
+
+    def carts_with_item(self, item_id: int) -> List[int]:
+        rows = self.__database.connection().execute("SELECT cart_id FROM cart_item WHERE item_id = ?", (item_id,))
+        return [row[0] for row in rows]
+
+    def stats(self) -> CartStats:
+        # aggregated on each call: the totals are not stored, so this scans every cart line
+        rows = self.__database.connection().execute(
+            "SELECT "
+            "COALESCE(SUM(CASE WHEN item.deleted THEN 0 ELSE cart_item.quantity * item.price END), 0), "
+            "COALESCE(SUM(cart_item.quantity), 0) "
+            "FROM cart "
+            "LEFT JOIN cart_item ON cart_item.cart_id = cart.id "
+            "LEFT JOIN item ON item.id = cart_item.item_id "
+            "GROUP BY cart.id")
+        return CartStatistics(rows).snapshot()
+
+    def query_carts(self, offset: int = 0, limit: int = 10, min_price: float = None, max_price: float = None,
+                    min_quantity: int = None, max_quantity: int = None, after_id: int = None) -> List[CartEntity]:
+        having, params = [], []
+        for clause, value in [("total_price >= ?", min_price), ("total_price <= ?", max_price),
+                              ("total_quantity >= ?", min_quantity), ("total_quantity <= ?", max_quantity)]:
+            if value is not None:
+                having.append(clause)
+                params.append(value)
+
+        connection = self.__database.connection()
+        rows = connection.execute(
+            "SELECT cart.id, "
+            "COALESCE(SUM(CASE WHEN item.deleted THEN 0 ELSE cart_item.quantity * item.price END), 0) AS total_price, "
+            "COALESCE(SUM(cart_item.quantity), 0) AS total_quantity "
+            "FROM cart "
+            "LEFT JOIN cart_item ON cart_item.cart_id = cart.id "
+            "LEFT JOIN item ON item.id = cart_item.item_id "
+            "WHERE cart.id > ? "
+            "GROUP BY cart.id "
+            f"{'HAVING ' + ' AND '.join(having) if having else ''} "
+            "ORDER BY cart.id LIMIT ? OFFSET ?",
+            (after_id or 0, *params, limit, offset)).fetchall()
+
+        return self.__load_carts(connection, [row[0] for row in rows])
+
+    @staticmethod
+    def __load_carts(connection: sqlite3.Connection, cart_ids: List[int]) -> List[CartEntity]:
+        carts = {cart_id: CartEntity(id=cart_id, items=[]) for cart_id in cart_ids}
+        if not carts:
+            return []
+
+        rows = []
+        for start in range(0, len(cart_ids), SqliteCartRepository.LOAD_BATCH):
+            batch = cart_ids[start:start + SqliteCartRepository.LOAD_BATCH]
+            rows.extend(connection.execute(
+                "SELECT cart_item.cart_id, cart_item.id, cart_item.quantity, "
+                "item.id, item.name, item.price, item.deleted "
+                "FROM cart_item JOIN item ON item.id = cart_item.item_id "
+                f"WHERE cart_item.cart_id IN ({', '.join('?' * len(batch))}) "
+                "ORDER BY cart_item.id",
+                batch))
+
+        for cart_id, cart_item_id, quantity, item_id, name, price, deleted in rows:
+            cart = carts[cart_id]
+            item = ItemEntity(item_id, name, price, bool(deleted))
+            cart_item = CartItemEntity(cart_item_id, item, quantity, 0 if item.deleted else price)
+            cart.items.append(cart_item)
+            cart.items_by_item_id[item_id] = cart_item
+            cart.total_quantity += quantity
+            cart.total_price += quantity * cart_item.unit_price
+
+        return list(carts.values())
@@ -0,0 +1,109 @@
+import math
+from bisect import bisect_left
+from threading import Lock
+from typing import Iterable, Sequence
+
+from lecture_2.hw.shop_api.routes.model import CartStats, HistogramBucket
+
+# inclusive upper bounds, as Prometheus `le` buckets
+PRICE_BOUNDS = (0.0, *(mantissa * 10.0 ** exponent for exponent in range(6) for mantissa in (1, 2, 5)),
+                1_000_000.0, math.inf)
+QUANTITY_BOUNDS = (0, *(2 ** exponent for exponent in range(11)), math.inf)
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram:
+    """Counts per bucket, bucket `i` holding values in (bounds[i - 1], bounds[i]]."""
+
+    bounds: Sequence[float]
+    counts: list[int]
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.counts[bisect_left(self.bounds, value)] += count
+
+    def move(self, old_value: float, value: float) -> None:
+        old_bucket, bucket = bisect_left(self.bounds, old_value), bisect_left(self.bounds, value)
+        if old_bucket != bucket:
+            self.counts[old_bucket] -= 1
+            self.counts[bucket] += 1
+
+    def quantile(self, q: float) -> float:
+        """Interpolates linearly inside the bucket holding the rank; the unbounded bucket reports its lower bound."""
+        rank = q * sum(self.counts)
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[bucket - 1] if bucket else self.bounds[0]
+                upper = self.bounds[bucket]
+                if math.isinf(upper):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return 0.0
+
+    def buckets(self) -> list[HistogramBucket]:
+        return [HistogramBucket(upper_bound=None if math.isinf(bound) else bound, count=count)
+                for bound, count in zip(self.bounds, self.counts)]
+
+
+class CartStatistics:
+    """Totals and histograms over all carts, kept current by the repository on every change to a cart's totals.
+
+    Reading them costs O(buckets) however many carts there are.
+    """
+
+    __count: int
+    __total_price: float
+    __total_quantity: int
+    __prices: Histogram
+    __quantities: Histogram
+    __lock: Lock
+
+    def __init__(self, totals: Iterable[tuple[float, int]] = ()):
+        self.__count = 0
+        self.__total_price = 0.0
+        self.__total_quantity = 0
+        self.__prices = Histogram(PRICE_BOUNDS)
+        self.__quantities = Histogram(QUANTITY_BOUNDS)
+        self.__lock = Lock()
+        for price, quantity in totals:
+            self.add(price, quantity)
+
+    def add(self, price: float, quantity: int) -> None:
+        with self.__lock:
+            self.__count += 1
+            self.__total_price += price
+            self.__total_quantity += quantity
+            self.__prices.add(price)
+            self.__quantities.add(quantity)
+
+    def move(self, old_price: float, old_quantity: int, price: float, quantity: int) -> None:
+        """Records that a cart's totals changed from (old_price, old_quantity)."""
+        with self.__lock:
+            self.__total_price += price - old_price
+            self.__total_quantity += quantity - old_quantity
+            self.__prices.move(old_price, price)
+            self.__quantities.move(old_quantity, quantity)
+
+    def snapshot(self) -> CartStats:
+        with self.__lock:
+            return cart_stats(self.__count, self.__total_price, self.__total_quantity, self.__prices,
+                              self.__quantities)
+
+
+def cart_stats(count: int, total_price: float, total_quantity: int, prices: Histogram,
+               quantities: Histogram) -> CartStats:
+    return CartStats(
+        count=count,
+        total_price=total_price,
+        mean_price=total_price / count if count else 0.0,
+        price_percentiles={f"p{percentile}": prices.quantile(percentile / 100) for percentile in PERCENTILES},
+        total_quantity=total_quantity,
+        mean_quantity=total_quantity / count if count else 0.0,
+        price_histogram=prices.buckets(),
+        quantity_histogram=quantities.buckets(),
+    )
@@ -1,7 +1,15 @@
-from .contracts import PatchPokemonRequest, PokemonRequest, PokemonResponse
+from .contracts import (
+    BatchEntryResponse,
+    PatchPokemonBatchEntry,
+    PatchPokemonRequest,
+    PokemonRequest,
+    PokemonResponse,
+)
 from .routes import router
 
 __all__ = [
+    "BatchEntryResponse",
+    "PatchPokemonBatchEntry",
     "PokemonResponse",
     "PokemonRequest",
     "PatchPokemonRequest",
@@ -39,3 +39,13 @@ class PatchPokemonRequest(BaseModel):
 
     def as_patch_pokemon_info(self) -> PatchPokemonInfo:
         return PatchPokemonInfo(name=self.name, published=self.published)
+
+
+class PatchPokemonBatchEntry(PatchPokemonRequest):
+    id: int
+
+
+class BatchEntryResponse(BaseModel):
+    id: int
+    status: int
+    pokemon: PokemonResponse | None = None
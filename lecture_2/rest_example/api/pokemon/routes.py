@@ -1,12 +1,14 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi import APIRouter, Body, HTTPException, Query, Response
 from pydantic import NonNegativeInt, PositiveInt
 
 from lecture_2.rest_example import store
 
 from .contracts import (
+    BatchEntryResponse,
+    PatchPokemonBatchEntry,
     PatchPokemonRequest,
     PokemonRequest,
     PokemonResponse,
@@ -14,13 +16,98 @@ from .contracts import (
 
 router = APIRouter(prefix="/pokemon")
 
+# entries per batch request; bigger imports are split into several requests
+MAX_BATCH_SIZE = 10_000
+
 
 @router.get("/")
 async def get_pokemon_list(
     offset: Annotated[NonNegativeInt, Query()] = 0,
     limit: Annotated[PositiveInt, Query()] = 10,
+    after: Annotated[int | None, Query()] = None,
+    published: Annotated[bool | None, Query()] = None,
+    name: Annotated[str | None, Query()] = None,
 ) -> list[PokemonResponse]:
-    return [PokemonResponse.from_entity(e) for e in store.get_many(offset, limit)]
+    return [
+        PokemonResponse.from_entity(e)
+        for e in store.get_many(offset, limit, after, published, name)
+    ]
+
+
+@router.post(
+    "/batch",
+    status_code=HTTPStatus.CREATED,
+)
+async def post_pokemon_batch(
+    infos: Annotated[list[PokemonRequest], Body(max_length=MAX_BATCH_SIZE)],
+) -> list[BatchEntryResponse]:
+    entities = store.add_many([info.as_pokemon_info() for info in infos])
+
+    return [
+        BatchEntryResponse(
+            id=e.id,
+            status=HTTPStatus.CREATED,
+            pokemon=PokemonResponse.from_entity(e),
+        )
+        for e in entities
+    ]
+
+
+@router.patch(
+    "/batch",
+    responses={
+        HTTPStatus.OK: {
+            "description": "Successfully patched every pokemon",
+        },
+        HTTPStatus.CONFLICT: {
+            "description": "Patched nothing as some pokemon were not found",
+        },
+    },
+)
+async def patch_pokemon_batch(
+    patches: Annotated[list[PatchPokemonBatchEntry], Body(max_length=MAX_BATCH_SIZE)],
+    response: Response,
+) -> list[BatchEntryResponse]:
+    entities = store.patch_many(
+        [(patch.id, patch.as_patch_pokemon_info()) for patch in patches]
+    )
+
+    if any(e is None for e in entities):
+        # all or nothing: entries that were found are reported as not applied
+        response.status_code = HTTPStatus.CONFLICT
+        return [
+            BatchEntryResponse(
+                id=patch.id,
+                status=(
+                    HTTPStatus.NOT_FOUND if e is None else HTTPStatus.FAILED_DEPENDENCY
+                ),
+            )
+            for patch, e in zip(patches, entities)
+        ]
+
+    return [
+        BatchEntryResponse(
+            id=e.id,
+            status=HTTPStatus.OK,
+            pokemon=PokemonResponse.from_entity(e),
+        )
+        for e in entities
+    ]
+
+
+@router.delete("/batch")
+async def delete_pokemon_batch(
+    ids: Annotated[list[int], Body(max_length=MAX_BATCH_SIZE)],
+) -> list[BatchEntryResponse]:
+    deleted = store.delete_many(ids)
+
+    return [
+        BatchEntryResponse(
+            id=id,
+            status=HTTPStatus.OK if was_stored else HTTPStatus.NOT_FOUND,
+        )
+        for id, was_stored in zip(ids, deleted)
+    ]
 
 
 @router.get(
@@ -0,0 +1,67 @@
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from lecture_2.rest_example import store
+from lecture_2.rest_example.api.pokemon.routes import MAX_BATCH_SIZE
+from lecture_2.rest_example.main import app
+from lecture_2.rest_example.store import queries
+from lecture_2.rest_example.store.models import PokemonInfo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pokemon API: one PATCH per update vs PATCH /pokemon/batch")
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=5_000, help="updates also sent one request each")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--store-size", type=int, default=1_000_000, help="pokemon stored for the flip and delete runs")
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    ids = []
+    for start in range(0, args.updates, args.batch_size):
+        infos = [{"name": f"pokemon {i}", "published": False} for i in range(start, min(start + args.batch_size, args.updates))]
+        ids.extend(entry["id"] for entry in client.post("/pokemon/batch", json=infos).json())
+
+    started = time.perf_counter()
+    for id in ids[: args.single]:
+        client.patch(f"/pokemon/{id}", json={"published": True})
+    single = (time.perf_counter() - started) / args.single
+
+    started = time.perf_counter()
+    requests = 0
+    for start in range(0, len(ids), args.batch_size):
+        patches = [{"id": id, "published": True} for id in ids[start : start + args.batch_size]]
+        assert client.patch("/pokemon/batch", json=patches).status_code == 200
+        requests += 1
+    batched = (time.perf_counter() - started) / len(ids)
+
+    print(f"{'mode':>10} {'requests':>9} {'per update, us':>15} {'for all, s':>11}")
+    print(f"{'single':>10} {len(ids):>9} {single * 1e6:>15.1f} {single * len(ids):>11.2f}")
+    print(f"{'batched':>10} {requests:>9} {batched * 1e6:>15.1f} {batched * len(ids):>11.2f}")
+
+    # flips and deletes move ids between the index lists, which grow with the store
+    while len(queries._data) < args.store_size:
+        count = min(args.batch_size, args.store_size - len(queries._data))
+        store.add_many([PokemonInfo(f"pokemon {len(queries._data) + i}", published=False) for i in range(count)])
+    # spread over the whole store: ids near the end would only touch the tails of the lists
+    ids = queries._ids[:: len(queries._ids) // (args.batch_size * 2)][: args.batch_size * 2]
+
+    started = time.perf_counter()
+    patches = [{"id": id, "published": True} for id in ids[: args.batch_size]]
+    assert client.patch("/pokemon/batch", json=patches).status_code == 200
+    flipped = time.perf_counter() - started
+
+    started = time.perf_counter()
+    assert client.request("DELETE", "/pokemon/batch", json=ids[args.batch_size :]).status_code == 200
+    deleted = time.perf_counter() - started
+
+    print()
+    print(f"{'request':>10} {'pokemon':>9} {'batch':>6} {'time, s':>8}")
+    print(f"{'flip':>10} {args.store_size:>9} {args.batch_size:>6} {flipped:>8.3f}")
+    print(f"{'delete':>10} {args.store_size:>9} {args.batch_size:>6} {deleted:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
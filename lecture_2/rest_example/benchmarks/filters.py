@@ -0,0 +1,47 @@
+import argparse
+import random
+import timeit
+
+from lecture_2.rest_example import store
+from lecture_2.rest_example.store import queries
+from lecture_2.rest_example.store.models import PokemonInfo
+
+
+def scan(offset: int, limit: int, published: bool | None, name: str | None) -> list[int]:
+    # what a filtered listing costs without the indexes: a walk over every entry
+    found = [
+        id
+        for id, info in queries._data.items()
+        if (published is None or info.published == published) and (name is None or info.name == name)
+    ]
+    return found[offset : offset + limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pokemon store get_many filters: full scan vs indexes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--names", type=int, default=1_000, help="distinct pokemon names")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'pokemon':>10} {'filter':>18} {'scan, us':>12} {'indexed, us':>12} {'speedup':>8}")
+    for size in args.sizes:
+        while len(queries._data) < size:
+            store.add(PokemonInfo(f"pokemon {rng.randrange(args.names)}", published=rng.random() < 0.1))
+
+        filters = [
+            ("published", dict(published=True)),
+            ("published, deep", dict(published=True, offset=size // 20)),
+            ("name", dict(name="pokemon 7")),
+            ("name, unpublished", dict(name="pokemon 7", published=False)),
+        ]
+        for label, params in filters:
+            params = dict(offset=0, limit=10, published=None, name=None) | params
+            scanned = timeit.timeit(lambda: scan(**params), number=args.repeat) / args.repeat
+            indexed = timeit.timeit(lambda: list(store.get_many(**params)), number=args.repeat) / args.repeat
+            print(f"{size:>10} {label:>18} {scanned * 1e6:>12.1f} {indexed * 1e6:>12.1f} {scanned / indexed:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
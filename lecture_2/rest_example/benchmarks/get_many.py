@@ -0,0 +1,44 @@
+import argparse
+import timeit
+from typing import Iterable
+
+from lecture_2.rest_example import store
+from lecture_2.rest_example.store import queries
+from lecture_2.rest_example.store.models import PokemonEntity, PokemonInfo
+
+
+def legacy_get_many(offset: int = 0, limit: int = 10) -> Iterable[PokemonEntity]:
+    # the walk over every entry that get_many did before the id index
+    curr = 0
+    for id, info in queries._data.items():
+        if offset <= curr < offset + limit:
+            yield PokemonEntity(id, info)
+
+        curr += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pokemon store get_many: walk over every entry vs id index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'pokemon':>10} {'page':>18} {'legacy, us':>12} {'indexed, us':>12} {'speedup':>8}")
+    for size in args.sizes:
+        while len(queries._data) < size:
+            store.add(PokemonInfo(f"pokemon {len(queries._data)}", published=True))
+
+        first_id = queries._ids[0]
+        pages = [
+            ("first", dict(offset=0, limit=10), dict(offset=0, limit=10)),
+            ("middle by offset", dict(offset=size // 2, limit=10), dict(offset=size // 2, limit=10)),
+            ("middle by cursor", dict(offset=size // 2, limit=10), dict(after=first_id + size // 2 - 1, limit=10)),
+        ]
+        for name, legacy_params, params in pages:
+            legacy = timeit.timeit(lambda: list(legacy_get_many(**legacy_params)), number=args.repeat) / args.repeat
+            indexed = timeit.timeit(lambda: list(store.get_many(**params)), number=args.repeat) / args.repeat
+            print(f"{size:>10} {name:>18} {legacy * 1e6:>12.1f} {indexed * 1e6:>12.1f} {legacy / indexed:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import copy
+import threading
+import time
+from dataclasses import dataclass
+
+from lecture_2.rest_example import store
+from lecture_2.rest_example.store.models import PatchPokemonInfo, PokemonInfo
+
+
+@dataclass(slots=True)
+class MutableInfo:
+    name: str
+    published: bool
+
+
+class CopyingStore:
+    """What safe reads took before immutable versions: a lock and a copy per read."""
+
+    def __init__(self, ids: list[int]):
+        self.data = {id: MutableInfo(f"{id} False", False) for id in ids}
+        self.lock = threading.Lock()
+
+    def get_one(self, id: int) -> MutableInfo:
+        with self.lock:
+            return copy.copy(self.data[id])
+
+    def patch(self, id: int, published: bool) -> None:
+        with self.lock:
+            self.data[id].name = f"{id} {published}"
+            self.data[id].published = published
+
+
+def torn(id: int, info) -> bool:
+    # the writer changes the name and the flag together, so they always agree
+    return info.name != f"{id} {info.published}"
+
+
+def run(read, write, ids: list[int], readers: int, seconds: float) -> tuple[int, int, int]:
+    stop = threading.Event()
+    counts = [[0, 0] for _ in range(readers)]
+
+    def reader(index: int) -> None:
+        reads = torn_reads = 0
+        while not stop.is_set():
+            for id in ids:
+                reads += 1
+                torn_reads += torn(id, read(id))
+        counts[index] = [reads, torn_reads]
+
+    writes = 0
+
+    def writer() -> None:
+        nonlocal writes
+        while not stop.is_set():
+            for id in ids:
+                write(id, writes % 2 == 0)
+                writes += 1
+
+    threads = [threading.Thread(target=reader, args=(index,)) for index in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(reads for reads, _ in counts), sum(torn for _, torn in counts), writes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pokemon store reads under writes: locked copies vs immutable versions")
+    parser.add_argument("--pokemon", type=int, default=1_000)
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    ids = [store.add(PokemonInfo(f"{i}", False)).id for i in range(args.pokemon)]
+    for id in ids:
+        store.update(id, PokemonInfo(f"{id} False", False))
+    copying = CopyingStore(ids)
+
+    def read_version(id: int) -> PokemonInfo:
+        return store.get_one(id).info
+
+    def write_version(id: int, published: bool) -> None:
+        store.patch(id, PatchPokemonInfo(name=f"{id} {published}", published=published))
+
+    print(f"{'store':>20} {'readers':>8} {'reads/s':>11} {'writes/s':>10} {'torn reads':>11}")
+    for readers in args.readers:
+        for label, read, write in [
+            ("locked copies", copying.get_one, copying.patch),
+            ("immutable versions", read_version, write_version),
+        ]:
+            reads, torn_reads, writes = run(read, write, ids, readers, args.seconds)
+            print(f"{label:>20} {readers:>8} {reads / args.seconds:>11.0f} "
+                  f"{writes / args.seconds:>10.0f} {torn_reads:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
 from .models import PatchPokemonInfo, PokemonEntity, PokemonInfo
-from .queries import add, delete, get_many, get_one, patch, update, upsert
+from .queries import (
+    add,
+    add_many,
+    delete,
+    delete_many,
+    get_many,
+    get_one,
+    patch,
+    patch_many,
+    update,
+    upsert,
+)
 
 __all__ = [
     "PokemonEntity",
     "PokemonInfo",
     "PatchPokemonInfo",
     "add",
+    "add_many",
     "delete",
+    "delete_many",
     "get_many",
     "get_one",
     "update",
     "upsert",
     "patch",
+    "patch_many",
 ]
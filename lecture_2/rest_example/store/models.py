@@ -1,13 +1,13 @@
 from dataclasses import dataclass
 
 
-@dataclass(slots=True)
+@dataclass(frozen=True, slots=True)
 class PokemonInfo:
     name: str
     published: bool
 
 
-@dataclass(slots=True)
+@dataclass(frozen=True, slots=True)
 class PokemonEntity:
     id: int
     info: PokemonInfo
@@ -1,3 +1,6 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import replace
+from threading import RLock
 from typing import Iterable
 
 from lecture_2.rest_example.store.models import (
@@ -6,8 +9,21 @@ from lecture_2.rest_example.store.models import (
     PokemonInfo,
 )
 
+# every value is an immutable version: writers replace it and readers use whatever
+# version they looked up without copying or locking
 _data = dict[int, PokemonInfo]()
 
+# serializes writers, so the indexes below move from one consistent state to the next
+_write_lock = RLock()
+
+# ids of _data in ascending order, so a page is a slice rather than a walk over all
+_ids = list[int]()
+
+# the same for every value of the published flag and every name, so filtered pages
+# are slices too
+_ids_by_published = {True: list[int](), False: list[int]()}
+_ids_by_name = dict[str, list[int]]()
+
 
 def int_id_generator() -> Iterable[int]:
     i = 0
@@ -19,57 +35,254 @@ def int_id_generator() -> Iterable[int]:
 _id_generator = int_id_generator()
 
 
+def _insert(ids: list[int], id: int) -> None:
+    # generated ids only grow, so adding is an append; upserted ids may land anywhere
+    if not ids or ids[-1] < id:
+        ids.append(id)
+        return
+
+    pos = bisect_left(ids, id)
+    if pos == len(ids) or ids[pos] != id:
+        ids.insert(pos, id)
+
+
+def _remove(ids: list[int], id: int) -> None:
+    del ids[bisect_left(ids, id)]
+
+
+def _index(id: int, info: PokemonInfo) -> None:
+    _insert(_ids_by_published[info.published], id)
+    _insert(_ids_by_name.setdefault(info.name, []), id)
+
+
+def _unindex(id: int, info: PokemonInfo) -> None:
+    _remove(_ids_by_published[info.published], id)
+
+    named = _ids_by_name[info.name]
+    _remove(named, id)
+    if not named:
+        del _ids_by_name[info.name]
+
+
+# below this many ids per list, inserts and deletes in place cost less than a rebuild
+_REBUILD_THRESHOLD = 64
+
+
+def _index_keys(info: PokemonInfo | None) -> set[tuple[str, object]]:
+    if info is None:
+        return set()
+    return {("ids", None), ("published", info.published), ("name", info.name)}
+
+
+def _rebuilt(ids: list[int], added: set[int], removed: set[int]) -> list[int]:
+    if len(added) + len(removed) < _REBUILD_THRESHOLD:
+        for id in removed:
+            _remove(ids, id)
+        for id in sorted(added):
+            _insert(ids, id)
+        return ids
+
+    # a new list rather than edits in place: one pass instead of an O(n) move per id
+    kept = [id for id in ids if id not in removed]
+    kept.extend(added)
+    kept.sort()
+    return kept
+
+
+def _reindex(changes: dict[int, tuple[PokemonInfo | None, PokemonInfo | None]]) -> None:
+    """Moves ids between the indexes as they go from the old version to the new one
+    (None when not stored), touching each index list once for the whole batch."""
+    global _ids
+
+    moves = dict[tuple[str, object], tuple[set[int], set[int]]]()
+    for id, (old, new) in changes.items():
+        old_keys, new_keys = _index_keys(old), _index_keys(new)
+        for key in old_keys - new_keys:
+            moves.setdefault(key, (set(), set()))[1].add(id)
+        for key in new_keys - old_keys:
+            moves.setdefault(key, (set(), set()))[0].add(id)
+
+    for (index, key), (added, removed) in moves.items():
+        if index == "ids":
+            _ids = _rebuilt(_ids, added, removed)
+        elif index == "published":
+            _ids_by_published[key] = _rebuilt(_ids_by_published[key], added, removed)
+        else:
+            named = _rebuilt(_ids_by_name.get(key, []), added, removed)
+            if named:
+                _ids_by_name[key] = named
+            else:
+                _ids_by_name.pop(key, None)
+
+
+def _matches(
+    info: PokemonInfo | None,
+    published: bool | None,
+    name: str | None,
+) -> bool:
+    # a reader may meet an id that a writer is moving between indexes
+    return (
+        info is not None
+        and (published is None or info.published == published)
+        and (name is None or info.name == name)
+    )
+
+
 def add(info: PokemonInfo) -> PokemonEntity:
-    _id = next(_id_generator)
-    _data[_id] = info
+    with _write_lock:
+        _id = next(_id_generator)
+        # upsert may have taken the id already, and overwriting it would leave stale
+        # index entries behind
+        while _id in _data:
+            _id = next(_id_generator)
+
+        _data[_id] = info
+        _insert(_ids, _id)
+        _index(_id, info)
 
     return PokemonEntity(_id, info)
 
 
+def add_many(infos: list[PokemonInfo]) -> list[PokemonEntity]:
+    with _write_lock:
+        return [add(info) for info in infos]
+
+
 def delete(id: int) -> None:
-    if id in _data:
-        del _data[id]
+    with _write_lock:
+        if id in _data:
+            _unindex(id, _data.pop(id))
+            _remove(_ids, id)
+
+
+def delete_many(ids: list[int]) -> list[bool]:
+    """Deletes every stored id of `ids`; tells for each whether it was stored."""
+    deleted, changes = [], {}
+    with _write_lock:
+        for id in ids:
+            info = _data.pop(id, None)
+            deleted.append(info is not None)
+            if info is not None:
+                changes[id] = (info, None)
+
+        _reindex(changes)
+
+    return deleted
 
 
 def get_one(id: int) -> PokemonEntity | None:
-    if id not in _data:
+    info = _data.get(id)
+    if info is None:
         return None
 
-    return PokemonEntity(id=id, info=_data[id])
+    return PokemonEntity(id=id, info=info)
+
+
+def get_many(
+    offset: int = 0,
+    limit: int = 10,
+    after: int | None = None,
+    published: bool | None = None,
+    name: str | None = None,
+) -> Iterable[PokemonEntity]:
+    """Pokemon in id order, skipping `offset` of them after the id `after`.
+
+    `after` is the last id of the previous page. `published` and `name` keep only
+    the pokemon with that flag and that exact name.
+
+    Takes no lock: each pokemon is the version stored when it was reached, and one
+    that a concurrent write deleted or moved out of the filter is left out.
+    """
+    if name is not None:
+        ids = _ids_by_name.get(name, [])
+        if published is not None:
+            # few pokemon share a name, so the flag is checked on each of them
+            ids = [id for id in ids if _matches(_data.get(id), published, None)]
+    elif published is not None:
+        ids = _ids_by_published[published]
+    else:
+        ids = _ids
 
+    start = bisect_right(ids, after) if after is not None else 0
 
-def get_many(offset: int = 0, limit: int = 10) -> Iterable[PokemonEntity]:
-    curr = 0
-    for id, info in _data.items():
-        if offset <= curr < offset + limit:
+    for id in ids[start + offset : start + offset + limit]:
+        info = _data.get(id)
+        if _matches(info, published, name):
             yield PokemonEntity(id, info)
 
-        curr += 1
+
+def _publish(id: int, info: PokemonInfo) -> None:
+    if id in _data:
+        _unindex(id, _data[id])
+    else:
+        _insert(_ids, id)
+
+    _data[id] = info
+    _index(id, info)
 
 
 def update(id: int, info: PokemonInfo) -> PokemonEntity | None:
-    if id not in _data:
-        return None
+    with _write_lock:
+        if id not in _data:
+            return None
 
-    _data[id] = info
+        _publish(id, info)
 
     return PokemonEntity(id=id, info=info)
 
 
 def upsert(id: int, info: PokemonInfo) -> PokemonEntity:
-    _data[id] = info
+    with _write_lock:
+        _publish(id, info)
 
     return PokemonEntity(id=id, info=info)
 
 
-def patch(id: int, patch_info: PatchPokemonInfo) -> PokemonEntity | None:
-    if id not in _data:
-        return None
-
+def _patched(info: PokemonInfo, patch_info: PatchPokemonInfo) -> PokemonInfo:
+    # a new version, as the stored one may already be in a reader's hands
     if patch_info.name is not None:
-        _data[id].name = patch_info.name
+        info = replace(info, name=patch_info.name)
 
     if patch_info.published is not None:
-        _data[id].published = patch_info.published
+        info = replace(info, published=patch_info.published)
+
+    return info
+
+
+def patch(id: int, patch_info: PatchPokemonInfo) -> PokemonEntity | None:
+    with _write_lock:
+        info = _data.get(id)
+        if info is None:
+            return None
+
+        info = _patched(info, patch_info)
+        _publish(id, info)
+
+    return PokemonEntity(id=id, info=info)
+
+
+def patch_many(
+    patches: list[tuple[int, PatchPokemonInfo]],
+) -> list[PokemonEntity | None]:
+    """Applies all patches in order, or none of them if any id is not stored.
+
+    Ids that are not stored are None in the result.
+    """
+    with _write_lock:
+        if not all(id in _data for id, _ in patches):
+            return [
+                PokemonEntity(id, _data[id]) if id in _data else None
+                for id, _ in patches
+            ]
+
+        entities, changes = [], {}
+        for id, patch_info in patches:
+            old = _data[id]
+            info = _data[id] = _patched(old, patch_info)
+            # an id patched twice moves from its version before the batch to the last
+            changes[id] = (changes[id][0] if id in changes else old, info)
+            entities.append(PokemonEntity(id, info))
+
+        _reindex(changes)
 
-    return PokemonEntity(id=id, info=_data[id])
+    return entities
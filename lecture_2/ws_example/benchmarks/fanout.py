@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass, field
+
+from lecture_2.ws_example.server import Broadcaster, SlowConsumerPolicy
+
+
+@dataclass(slots=True, eq=False)
+class LocalSocket:
+    """A subscriber in the same process; a slow one takes `delay` seconds per message."""
+
+    delay: float = 0.0
+    received: dict[int, float] = field(default_factory=dict)
+    closed: bool = False
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, message: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received[int(message)] = time.perf_counter()
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+
+@dataclass(slots=True)
+class SequentialBroadcaster:
+    """What publish did before writer tasks: awaiting every subscriber in turn."""
+
+    subscribers: list[LocalSocket] = field(default_factory=list)
+
+    async def subscribe(self, ws: LocalSocket) -> None:
+        await ws.accept()
+        self.subscribers.append(ws)
+
+    async def publish(self, message: str) -> None:
+        for ws in self.subscribers:
+            await ws.send_text(message)
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    cuts = statistics.quantiles(samples, n=100)
+    return cuts[49] * 1e3, cuts[98] * 1e3
+
+
+async def run(name: str, args: argparse.Namespace) -> None:
+    sockets = [
+        LocalSocket(args.slow_delay if index % args.slow_every == 0 else 0.0)
+        for index in range(args.subscribers)
+    ]
+    if name == "sequential":
+        broadcaster = SequentialBroadcaster()
+    else:
+        broadcaster = Broadcaster(args.max_queue, SlowConsumerPolicy(name))
+    for ws in sockets:
+        await broadcaster.subscribe(ws)
+    await asyncio.sleep(0)
+
+    published_at, publish_times = {}, []
+    started_at = time.perf_counter()
+    for message in range(args.messages):
+        started = published_at[message] = time.perf_counter()
+        if name == "sequential":
+            await broadcaster.publish(str(message))
+        else:
+            broadcaster.publish(str(message))
+        publish_times.append(time.perf_counter() - started)
+        await asyncio.sleep(args.interval)
+
+    rate = args.messages / (time.perf_counter() - started_at)
+    # give fast subscribers time to drain what is left
+    await asyncio.sleep(0.5)
+
+    fast = [ws for ws in sockets if not ws.delay]
+    slow = [ws for ws in sockets if ws.delay]
+    lags = [ws.received[m] - published_at[m] for ws in fast for m in ws.received]
+    delivered = sum(len(ws.received) for ws in fast) / (len(fast) * args.messages)
+    slow_received = sum(len(ws.received) for ws in slow)
+    disconnected = sum(ws.closed for ws in sockets)
+
+    publish_p50, publish_p99 = percentiles(publish_times)
+    lag_p50, lag_p99 = percentiles(lags)
+    print(f"{name:>12} {rate:>7.2f} {publish_p50:>10.3f} {publish_p99:>10.3f} {lag_p50:>10.2f} {lag_p99:>10.2f} "
+          f"{delivered:>9.1%} {slow_received:>9} {disconnected:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcaster fan-out to local subscribers, some of them slow")
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--slow-every", type=int, default=100, help="every n-th subscriber is slow")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="seconds a slow subscriber takes per message")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between messages")
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--sequential-messages", type=int, default=3, help="messages for the sequential broadcaster")
+    args = parser.parse_args()
+
+    print(f"{'broadcaster':>12} {'msg/s':>7} {'pub p50,ms':>10} {'pub p99,ms':>10} {'lag p50,ms':>10} "
+          f"{'lag p99,ms':>10} {'fast got':>9} {'slow got':>9} {'disconnected':>13}")
+    asyncio.run(run("sequential", argparse.Namespace(**{**vars(args), "messages": args.sequential_messages})))
+    for policy in SlowConsumerPolicy:
+        asyncio.run(run(policy, args))
+
+
+if __name__ == "__main__":
+    main()
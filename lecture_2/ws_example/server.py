@@ -1,25 +1,122 @@
+import asyncio
+from contextlib import suppress
 from dataclasses import dataclass, field
+from enum import StrEnum
 from uuid import uuid4
 
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, status
 
 app = FastAPI()
 
 
+class SlowConsumerPolicy(StrEnum):
+    # skip what the subscriber has not sent yet and go on from the oldest kept message
+    DROP_OLDEST = "drop_oldest"
+    # close the connection, the client has to resubscribe
+    DISCONNECT = "disconnect"
+
+
+@dataclass(slots=True)
+class Subscriber:
+    ws: WebSocket
+    # sequence number of the next message to send
+    cursor: int
+    dropped: int = 0
+    writer: asyncio.Task | None = None
+
+
 @dataclass(slots=True)
 class Broadcaster:
-    subscribers: list[WebSocket] = field(init=False, default_factory=list)
+    """Fan-out of messages to websockets, each written by its own task.
+
+    Messages go into one ring of the last `max_queue` messages. A subscriber's
+    outbound queue is the part of the ring after its cursor, so it is bounded by
+    `max_queue` and `publish` does not touch subscribers at all. A subscriber
+    that falls more than `max_queue` messages behind is handled by `policy`
+    once its writer comes back for the next message. Under DISCONNECT a send
+    that takes longer than `send_timeout` seconds disconnects the subscriber
+    too, as the writer would otherwise never come back to check.
+    """
+
+    max_queue: int = 1024
+    policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST
+    send_timeout: float | None = 10.0
+    subscribers: dict[WebSocket, Subscriber] = field(init=False, default_factory=dict)
+    messages: list[str | None] = field(init=False, default_factory=list)
+    # sequence number of the next message to publish
+    head: int = field(init=False, default=0)
+    # resolved by the next publish, awaited by every writer that is up to date
+    published: asyncio.Future | None = field(init=False, default=None)
+
+    def __post_init__(self) -> None:
+        self.messages = [None] * self.max_queue
 
     async def subscribe(self, ws: WebSocket) -> None:
         await ws.accept()
-        self.subscribers.append(ws)
+        subscriber = Subscriber(ws, self.head)
+        subscriber.writer = asyncio.create_task(self.write(subscriber))
+        self.subscribers[ws] = subscriber
 
     async def unsubscribe(self, ws: WebSocket) -> None:
-        self.subscribers.remove(ws)
+        subscriber = self.subscribers.pop(ws, None)
+        if subscriber is None or subscriber.writer is None:
+            return
+
+        subscriber.writer.cancel()
+        with suppress(asyncio.CancelledError):
+            await subscriber.writer
+
+    def publish(self, message: str) -> None:
+        self.messages[self.head % self.max_queue] = message
+        self.head += 1
+
+        if self.published is not None:
+            # writers are woken on the next loop iteration, not by the publisher
+            published, self.published = self.published, None
+            published.get_loop().call_soon(published.set_result, None)
+
+    async def next_publish(self) -> None:
+        if self.published is None:
+            self.published = asyncio.get_running_loop().create_future()
+        # every waiting writer shares the future, so cancelling one writer must not cancel it
+        await asyncio.shield(self.published)
+
+    async def disconnect(self, subscriber: Subscriber) -> None:
+        self.subscribers.pop(subscriber.ws, None)
+        with suppress(WebSocketDisconnect, RuntimeError, OSError, TimeoutError):
+            async with asyncio.timeout(self.send_timeout):
+                await subscriber.ws.close(status.WS_1013_TRY_AGAIN_LATER)
+
+    async def write(self, subscriber: Subscriber) -> None:
+        while True:
+            if subscriber.cursor == self.head:
+                await self.next_publish()
+                continue
+
+            oldest = self.head - self.max_queue
+            if subscriber.cursor < oldest:
+                if self.policy == SlowConsumerPolicy.DISCONNECT:
+                    await self.disconnect(subscriber)
+                    return
+
+                subscriber.dropped += oldest - subscriber.cursor
+                subscriber.cursor = oldest
 
-    async def publish(self, message: str) -> None:
-        for ws in self.subscribers:
-            await ws.send_text(message)
+            message = self.messages[subscriber.cursor % self.max_queue]
+            subscriber.cursor += 1
+            try:
+                if self.policy == SlowConsumerPolicy.DISCONNECT:
+                    async with asyncio.timeout(self.send_timeout):
+                        await subscriber.ws.send_text(message)
+                else:
+                    # a stalled send only delays this subscriber, which then skips what it missed
+                    await subscriber.ws.send_text(message)
+            except TimeoutError:
+                await self.disconnect(subscriber)
+                return
+            except (WebSocketDisconnect, RuntimeError, OSError):
+                # the connection is gone, its receive loop unsubscribes it
+                return
 
 
 broadcaster = Broadcaster()
@@ -28,19 +125,19 @@ broadcaster = Broadcaster()
 @app.post("/publish")
 async def post_publish(request: Request):
     message = (await request.body()).decode()
-    await broadcaster.publish(message)
+    broadcaster.publish(message)
 
 
 @app.websocket("/subscribe")
 async def ws_subscribe(ws: WebSocket):
     client_id = uuid4()
     await broadcaster.subscribe(ws)
-    await broadcaster.publish(f"client {client_id} subscribed")
+    broadcaster.publish(f"client {client_id} subscribed")
 
     try:
         while True:
             text = await ws.receive_text()
-            await broadcaster.publish(text)
+            broadcaster.publish(text)
     except WebSocketDisconnect:
-        broadcaster.unsubscribe(ws)
-        await broadcaster.publish(f"client {client_id} unsubscribed")
+        await broadcaster.unsubscribe(ws)
+        broadcaster.publish(f"client {client_id} unsubscribed")
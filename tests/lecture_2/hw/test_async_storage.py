@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.aio import AsyncCartRepository, AsyncItemRepository
+from lecture_2.hw.shop_api.storage.factory import create_repositories
+from lecture_2.hw.shop_api.storage.persistence import PersistentStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repositories(request, tmp_path) -> tuple[AsyncItemRepository, AsyncCartRepository]:
+    item_storage, cart_storage = create_repositories(request.param, str(tmp_path / "shop.db"))
+    return AsyncItemRepository(item_storage), AsyncCartRepository(cart_storage)
+
+
+@pytest.mark.asyncio
+async def test_only_blocking_storage_leaves_the_event_loop(repositories):
+    item_repository, _ = repositories
+    storage, threads = item_repository.storage, []
+    get = storage.get
+    storage.get = lambda item_id: threads.append(threading.get_ident()) or get(item_id)
+
+    item = await item_repository.create(Item(name="item", price=1.0, deleted=False))
+
+    assert await item_repository.get(item.id) == Item(item.id, "item", 1.0, False)
+    assert (threads == [threading.get_ident()]) != storage.blocking
+
+
+@pytest.mark.asyncio
+async def test_journaled_writes_leave_the_event_loop(tmp_path):
+    store = PersistentStore(str(tmp_path))
+    item_repository = AsyncItemRepository(store.item_repository)
+    storage, threads = store.item_repository, {}
+    for method in ("create", "get"):
+        call = getattr(storage, method)
+        setattr(storage, method, lambda *args, method=method, call=call:
+                threads.setdefault(method, threading.get_ident()) and call(*args))
+
+    try:
+        item = await item_repository.create(Item(name="item", price=1.0, deleted=False))
+        assert await item_repository.get(item.id) == Item(item.id, "item", 1.0, False)
+    finally:
+        store.close()
+
+    # a snapshot holds the journal lock every write takes, so writes must not stall the loop; reads never take it
+    assert threads["create"] != threading.get_ident()
+    assert threads["get"] == threading.get_ident()
+
+@pytest.mark.asyncio
+async def test_cart_lines_and_queries(repositories):
+    item_repository, cart_repository = repositories
+    item = await item_repository.create(Item(name="item", price=2.5, deleted=False))
+    cart = await cart_repository.create_cart()
+
+    await cart_repository.add_item_to_cart(cart.id, await item_repository.get_entity(item.id), 2)
+    cart = await cart_repository.add_items_to_cart(cart.id, [(await item_repository.get_entity(item.id), 1)])
+
+    assert (cart.total_price, cart.total_quantity) == pytest.approx((7.5, 3))
+    assert [found.id for found in await cart_repository.query_carts(min_quantity=3)] == [cart.id]
+    assert [found.id for found in await item_repository.query(max_price=3.0)] == [item.id]
@@ -0,0 +1,90 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.bulk import NDJSON_MEDIA_TYPE
+
+client = TestClient(app)
+
+ROWS = [
+    {"name": "bulk item 0", "price": 10.0},
+    {"name": "", "price": 10.0},
+    {"name": "bulk item 2", "price": 20.0},
+    {"price": 5.0},
+]
+
+
+def assert_item_results(results: list[dict]) -> None:
+    assert [result["status"] for result in results] == [
+        HTTPStatus.CREATED, HTTPStatus.UNPROCESSABLE_ENTITY, HTTPStatus.CREATED, HTTPStatus.UNPROCESSABLE_ENTITY,
+    ]
+    for row, result in zip(ROWS, results):
+        if result["status"] == HTTPStatus.CREATED:
+            assert client.get(f"/item/{result['item']['id']}").json() == {**row, "id": result["item"]["id"],
+                                                                          "deleted": False}
+
+
+def test_create_items_bulk_json() -> None:
+    response = client.post("/item/bulk", json=ROWS)
+
+    assert response.status_code == HTTPStatus.OK
+    assert_item_results(response.json())
+
+
+def test_create_items_bulk_ndjson() -> None:
+    body = "\n".join(json.dumps(row) for row in ROWS) + "\n"
+    response = client.post("/item/bulk", content=body, headers={"content-type": NDJSON_MEDIA_TYPE})
+
+    assert response.status_code == HTTPStatus.OK
+    assert_item_results(response.json())
+
+
+def test_create_items_bulk_ndjson_reports_malformed_lines() -> None:
+    lines = [json.dumps(ROWS[0]), "{not json", json.dumps(ROWS[2])]
+    response = client.post("/item/bulk", content="\n".join(lines), headers={"content-type": NDJSON_MEDIA_TYPE})
+
+    assert response.status_code == HTTPStatus.OK
+    results = response.json()
+    assert [result["status"] for result in results] == [
+        HTTPStatus.CREATED, HTTPStatus.UNPROCESSABLE_ENTITY, HTTPStatus.CREATED,
+    ]
+    assert results[1] == {"index": 1, "status": HTTPStatus.UNPROCESSABLE_ENTITY, "item": None,
+                          "detail": "Line is not valid JSON"}
+
+
+@pytest.mark.parametrize("body", ["{not json", '{"name": "not a list"}'])
+def test_create_items_bulk_rejects_malformed_body(body: str) -> None:
+    response = client.post("/item/bulk", content=body, headers={"content-type": "application/json"})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_add_items_to_cart_bulk() -> None:
+    item_ids = [result["item"]["id"] for result in client.post("/item/bulk", json=ROWS[::2]).json()]
+    cart_id = client.post("/cart").json()["id"]
+
+    response = client.post(f"/cart/{cart_id}/add-bulk", json=[
+        {"item_id": item_ids[0], "quantity": 2},
+        {"item_id": 10 ** 9},
+        {"item_id": item_ids[1], "quantity": 0},
+        {"item_id": item_ids[1]},
+        {"item_id": item_ids[0]},
+    ])
+
+    assert response.status_code == HTTPStatus.OK
+    data = response.json()
+    assert [result["status"] for result in data["results"]] == [
+        HTTPStatus.OK, HTTPStatus.NOT_FOUND, HTTPStatus.UNPROCESSABLE_ENTITY, HTTPStatus.OK, HTTPStatus.OK,
+    ]
+    assert [(item["id"], item["quantity"]) for item in data["cart"]["items"]] == [(item_ids[0], 3), (item_ids[1], 1)]
+    assert data["cart"]["price"] == pytest.approx(3 * 10.0 + 20.0)
+    assert client.get(f"/cart/{cart_id}").json() == data["cart"]
+
+
+def test_add_items_to_missing_cart_bulk() -> None:
+    response = client.post(f"/cart/{10 ** 9}/add-bulk", json=[])
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
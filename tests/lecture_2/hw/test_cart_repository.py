@@ -0,0 +1,77 @@
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.base import ItemEntity
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+
+
+@pytest.fixture
+def item_repository() -> ItemRepository:
+    return ItemRepository()
+
+
+@pytest.fixture
+def cart_repository(item_repository: ItemRepository) -> CartRepository:
+    repository = CartRepository()
+    item_repository.add_update_listener(repository.on_item_updated)
+    return repository
+
+
+@pytest.fixture
+def items(item_repository: ItemRepository) -> list[ItemEntity]:
+    created = [item_repository.create(Item(name=f"item {i}", price=10.0 * i, deleted=False)) for i in range(1, 4)]
+    return [item_repository.get_entity(item.id) for item in created]
+
+
+def test_add_item_to_cart_maintains_totals(cart_repository, items):
+    cart = cart_repository.create_cart()
+    cart_repository.add_item_to_cart(cart.id, items[0], 2)
+    cart_repository.add_item_to_cart(cart.id, items[1])
+    cart_repository.add_item_to_cart(cart.id, items[0])
+
+    assert [(cart_item.item.id, cart_item.quantity) for cart_item in cart.items] == [(items[0].id, 3), (items[1].id, 1)]
+    assert cart.total_quantity == 4
+    assert cart.total_price == pytest.approx(3 * 10.0 + 20.0)
+
+
+def test_item_price_change_updates_every_cart(item_repository, cart_repository, items):
+    carts = [cart_repository.create_cart() for _ in range(3)]
+    for quantity, cart in enumerate(carts, start=1):
+        cart_repository.add_item_to_cart(cart.id, items[0], quantity)
+        cart_repository.add_item_to_cart(cart.id, items[2])
+
+    item_repository.update(Item(id=items[0].id, name=items[0].name, price=15.0, deleted=False))
+
+    assert [cart.total_price for cart in carts] == pytest.approx([15.0 + 30.0, 30.0 + 30.0, 45.0 + 30.0])
+
+
+def test_deleted_item_is_excluded_from_price_but_not_quantity(item_repository, cart_repository, items):
+    cart = cart_repository.create_cart()
+    cart_repository.add_item_to_cart(cart.id, items[1], 2)
+    cart_repository.add_item_to_cart(cart.id, items[2])
+
+    item_repository.update(Item(id=items[1].id, name=items[1].name, price=items[1].price, deleted=True))
+    assert cart.total_price == pytest.approx(30.0)
+    assert cart.total_quantity == 3
+
+    item_repository.update(Item(id=items[1].id, name=items[1].name, price=25.0, deleted=False))
+    assert cart.total_price == pytest.approx(2 * 25.0 + 30.0)
+
+
+def test_query_carts_filters_on_totals(cart_repository, items):
+    cheap, expensive = cart_repository.create_cart(), cart_repository.create_cart()
+    cart_repository.add_item_to_cart(cheap.id, items[0])
+    cart_repository.add_item_to_cart(expensive.id, items[2], 5)
+
+    assert cart_repository.query_carts(min_price=100.0) == [expensive]
+    assert cart_repository.query_carts(max_quantity=1) == [cheap]
+
+
+def test_add_item_to_cart_keeps_line_order_and_index(cart_repository, items):
+    cart = cart_repository.create_cart()
+    for item in [items[2], items[0], items[2], items[1], items[0]]:
+        cart_repository.add_item_to_cart(cart.id, item)
+
+    assert [cart_item.item.id for cart_item in cart.items] == [items[2].id, items[0].id, items[1].id]
+    assert all(cart.items_by_item_id[cart_item.item.id] is cart_item for cart_item in cart.items)
+    assert cart.items_by_item_id[items[2].id].quantity == 2
@@ -0,0 +1,77 @@
+import random
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+from lecture_2.hw.shop_api.storage.stats import PRICE_BOUNDS, CartStatistics, Histogram
+
+client = TestClient(app)
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = Histogram((0.0, 10.0, 20.0, float("inf")))
+    assert histogram.quantile(0.5) == 0.0
+
+    for value in [0.0, 5.0, 15.0, 15.0, 1_000.0]:
+        histogram.add(value)
+    assert [bucket.count for bucket in histogram.buckets()] == [1, 1, 2, 1]
+    assert histogram.buckets()[-1].upper_bound is None
+    assert histogram.quantile(0.2) == 0.0
+    assert histogram.quantile(0.5) == pytest.approx(12.5)
+    assert histogram.quantile(0.99) == 20.0
+
+    histogram.move(1_000.0, 0.0)
+    assert [bucket.count for bucket in histogram.buckets()] == [2, 1, 2, 0]
+
+
+def test_maintained_stats_match_a_recount():
+    rng = random.Random(3)
+    item_repository, cart_repository = ItemRepository(), CartRepository()
+    item_repository.add_update_listener(cart_repository.on_item_updated)
+    items = item_repository.create_many([Item(name=f"item {i}", price=float(rng.randrange(1, 300)), deleted=False)
+                                         for i in range(30)])
+    carts = [cart_repository.create_cart() for _ in range(200)]
+
+    for _ in range(2_000):
+        item = rng.choice(items)
+        if rng.random() < 0.8:
+            cart_repository.add_item_to_cart(rng.choice(carts).id, item_repository.get_entity(item.id),
+                                             rng.randrange(1, 4))
+        else:
+            item_repository.update(Item(item.id, item.name, float(rng.randrange(1, 300)), rng.random() < 0.3))
+
+    all_carts = cart_repository.query_carts(limit=len(carts))
+    expected = CartStatistics((cart.total_price, cart.total_quantity) for cart in all_carts).snapshot()
+    stats = cart_repository.stats()
+    assert stats.total_price == pytest.approx(expected.total_price)
+    assert (stats.count, stats.total_quantity) == (expected.count, expected.total_quantity)
+    assert stats.price_histogram == expected.price_histogram
+    assert stats.quantity_histogram == expected.quantity_histogram
+
+    cart_repository.restore([cart.id for cart in all_carts],
+                            [(cart.id, cart_item.item, cart_item.quantity) for cart in all_carts
+                             for cart_item in cart.items])
+    assert cart_repository.stats().price_histogram == expected.price_histogram
+
+
+def test_get_cart_stats():
+    before = client.get("/cart/stats").json()
+    item_id = client.post("/item/", json={"name": "stats item", "price": 40.0}).json()["id"]
+    cart_id = client.post("/cart/").json()["id"]
+    client.post(f"/cart/{cart_id}/add/{item_id}", params={"quantity": 3})
+
+    response = client.get("/cart/stats")
+    assert response.status_code == HTTPStatus.OK
+    stats = response.json()
+    assert stats["count"] == before["count"] + 1
+    assert stats["total_price"] == pytest.approx(before["total_price"] + 120.0)
+    assert stats["total_quantity"] == before["total_quantity"] + 3
+    assert set(stats["price_percentiles"]) == {"p50", "p90", "p99"}
+    assert len(stats["price_histogram"]) == len(PRICE_BOUNDS)
+
+    client.delete(f"/item/{item_id}")
+    assert client.get("/cart/stats").json()["total_price"] == pytest.approx(before["total_price"])
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage import columnar
+from lecture_2.hw.shop_api.storage.columnar import ColumnarItemRepository
+from lecture_2.hw.shop_api.storage.repository import ItemRepository
+
+
+@pytest.fixture(params=["numpy", "python"])
+def repository(request, monkeypatch) -> ColumnarItemRepository:
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(columnar, "numpy", None)
+    return ColumnarItemRepository()
+
+
+def test_queries_match_the_indexed_repository(repository):
+    rng = random.Random(7)
+    reference = ItemRepository()
+    rows = [(f"товар {i}", float(rng.randrange(50)), rng.random() < 0.3) for i in range(500)]
+    for storage in (reference, repository):
+        storage.create_many([Item(name=name, price=price, deleted=deleted) for name, price, deleted in rows])
+        for item_id in range(1, 501, 7):
+            storage.update(Item(item_id, f"renamed {item_id}", float(item_id % 13), item_id % 2 == 0))
+
+    for params in [{}, {"show_deleted": True}, {"offset": 40, "limit": 25}, {"after": (0.0, 250)},
+                   {"min_price": 10.0, "max_price": 20.0, "limit": 50}, {"max_price": 5.0, "show_deleted": True},
+                   {"min_price": 12.0, "after": (12.0, 300), "limit": 30}, {"min_price": 0.0, "limit": 0},
+                   {"min_price": 100.0}]:
+        assert repository.query(**params) == reference.query(**params), params
+
+
+def test_get_update_and_purge(repository):
+    items = repository.create_many([Item(name="a", price=1.0, deleted=False), Item(name="b", price=2.0, deleted=True)])
+    assert [item.id for item in items] == [1, 2]
+    assert repository.get_entity(1).name == "a"
+
+    repository.update(Item(1, "длинное имя", 3.0, False))
+    assert repository.get(1) == Item(1, "длинное имя", 3.0, False)
+
+    assert repository.purge_deleted(lambda item_id: False) == [2]
+    assert repository.get(2) is None
+    assert repository.query(show_deleted=True) == [Item(1, "длинное имя", 3.0, False)]
+    assert repository.create(Item(name="c", price=1.0, deleted=False)).id == 3
+
+
+def test_name_index_built_by_the_first_search_follows_writes(repository):
+    repository.create_many([Item(name="red apple", price=1.0, deleted=True), Item(name="pear", price=2.0, deleted=False)])
+    repository.purge_deleted(lambda item_id: False)
+    assert [item.id for item in repository.search("app", show_deleted=True)] == []
+    assert [item.id for item in repository.search("pe")] == [2]
+
+    repository.create(Item(name="apple pie", price=3.0, deleted=False))
+    repository.update(Item(2, "green apple", 2.0, False))
+    assert [item.id for item in repository.search("apple")] == [2, 3]
+    assert repository.search("pear") == []
@@ -0,0 +1,84 @@
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+
+THREADS = 16
+ADDS_PER_THREAD = 2_000
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.fixture
+def item_repository() -> ItemRepository:
+    return ItemRepository()
+
+
+@pytest.fixture
+def cart_repository(item_repository: ItemRepository) -> CartRepository:
+    repository = CartRepository()
+    item_repository.add_update_listener(repository.on_item_updated)
+    return repository
+
+
+def run_concurrently(worker, count: int = THREADS) -> list:
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        return [future.result() for future in [executor.submit(worker, i) for i in range(count)]]
+
+
+def test_concurrent_creates_allocate_unique_ids(item_repository):
+    def create_items(_):
+        return [item_repository.create(Item(name="item", price=1.0, deleted=False)).id for _ in range(1_000)]
+
+    ids = [item_id for item_ids in run_concurrently(create_items) for item_id in item_ids]
+
+    assert len(set(ids)) == len(ids) == THREADS * 1_000
+    assert len(item_repository.query(limit=len(ids))) == len(ids)
+    # the unfiltered listing walks the table, cursor pages walk the index: both must be in id order
+    assert [item.id for item in item_repository.query(limit=len(ids), show_deleted=True)] == sorted(ids)
+
+
+def test_concurrent_add_item_to_cart_keeps_totals(item_repository, cart_repository):
+    items = [item_repository.create(Item(name=f"item {i}", price=float(i), deleted=False)) for i in range(1, 21)]
+    entities = [item_repository.get_entity(item.id) for item in items]
+    carts = [cart_repository.create_cart() for _ in range(4)]
+
+    def add_items(seed):
+        rng = random.Random(seed)
+        added = 0
+        for _ in range(ADDS_PER_THREAD):
+            quantity = rng.randint(1, 3)
+            cart_repository.add_item_to_cart(rng.choice(carts).id, rng.choice(entities), quantity)
+            added += quantity
+        return added
+
+    def reprice_items(seed):
+        rng = random.Random(seed)
+        for _ in range(ADDS_PER_THREAD // 10):
+            item = rng.choice(items)
+            item_repository.update(Item(id=item.id, name=item.name, price=float(rng.randint(1, 50)),
+                                        deleted=rng.random() < 0.2))
+        return 0
+
+    def worker(i):
+        return reprice_items(i) if i % 4 == 0 else add_items(i)
+
+    added = sum(run_concurrently(worker))
+
+    assert sum(cart.total_quantity for cart in carts) == added
+    assert sum(cart_item.quantity for cart in carts for cart_item in cart.items) == added
+    for cart in carts:
+        assert len(cart.items) == len({cart_item.item.id for cart_item in cart.items})
+        expected_price = sum(cart_item.quantity * cart_item.item.price for cart_item in cart.items
+                             if not cart_item.item.deleted)
+        assert cart.total_price == pytest.approx(expected_price)
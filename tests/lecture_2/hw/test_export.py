@@ -0,0 +1,57 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes import cart_routes, item_routes
+from lecture_2.hw.shop_api.routes.bulk import NDJSON_MEDIA_TYPE
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch) -> None:
+    # several batches even for the handful of rows created here
+    monkeypatch.setattr(item_routes, "EXPORT_BATCH_SIZE", 3)
+    monkeypatch.setattr(cart_routes, "EXPORT_BATCH_SIZE", 3)
+
+
+def read_ndjson(path: str, **params) -> list[dict]:
+    with client.stream("GET", path, params=params) as response:
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+        return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def read_pages(path: str, **params) -> list[dict]:
+    rows, offset = [], 0
+    while page := client.get(path, params={**params, "offset": offset, "limit": 100}).json():
+        rows.extend(page)
+        offset += len(page)
+    return rows
+
+
+def test_export_items_matches_listing() -> None:
+    created = client.post("/item/bulk", json=[{"name": f"export {i}", "price": 1000.0 + i % 4} for i in range(10)])
+    client.delete(f"/item/{created.json()[0]['item']['id']}")
+
+    for params in [{}, {"show_deleted": True}, {"min_price": 1001.0, "max_price": 1002.0},
+                   {"min_price": 1000.0, "show_deleted": True}]:
+        assert read_ndjson("/item/export", **params) == read_pages("/item/", **params)
+
+
+def test_export_carts_matches_listing() -> None:
+    item_id = client.post("/item/", json={"name": "export item", "price": 7.0}).json()["id"]
+    for quantity in range(1, 8):
+        cart_id = client.post("/cart/").json()["id"]
+        client.post(f"/cart/{cart_id}/add/{item_id}", params={"quantity": quantity})
+
+    for params in [{}, {"min_quantity": 3, "max_quantity": 6}, {"max_price": 14.0}]:
+        assert read_ndjson("/cart/export", **params) == read_pages("/cart/", **params)
+
+
+def test_export_validates_filters() -> None:
+    assert client.get("/item/export", params={"min_price": -1}).status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert client.get("/cart/export", params={"min_quantity": -1}).status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.instrumentation import instrument
+from lecture_2.hw.shop_api.storage.repository import CartRepository, ItemRepository
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_uninstrumented_repositories_are_untouched():
+    repository = ItemRepository()
+    assert "query" not in vars(repository)
+    assert repository.scan_observer is None
+
+
+def test_instrumented_repositories_record_calls_and_scans():
+    item_repository, cart_repository = ItemRepository(), CartRepository()
+    item_repository.add_update_listener(cart_repository.on_item_updated)
+    instrument(item_repository)
+    instrument(cart_repository)
+    labels = {"repository": "CartRepository", "method": "query_carts"}
+    calls, scanned, returned = (sample("shop_repository_call_seconds_count", **labels),
+                                sample("shop_repository_rows_scanned_sum", **labels),
+                                sample("shop_repository_rows_returned_sum", **labels))
+    lines = sample("shop_cart_lines_sum", repository="CartRepository")
+
+    item = item_repository.create(Item(name="item", price=10.0, deleted=False))
+    carts = [cart_repository.create_cart() for _ in range(5)]
+    cart_repository.add_items_to_cart(carts[3].id, [(item_repository.get_entity(item.id), 2)])
+    assert [cart.id for cart in cart_repository.query_carts(min_quantity=1)] == [carts[3].id]
+    assert [found.id for found in item_repository.query(limit=5)] == [item.id]
+
+    assert sample("shop_repository_call_seconds_count", **labels) == calls + 1
+    assert sample("shop_repository_rows_scanned_sum", **labels) == scanned + 5
+    assert sample("shop_repository_rows_returned_sum", **labels) == returned + 1
+    assert sample("shop_cart_lines_sum", repository="CartRepository") == lines + 1
+    assert sample("shop_repository_rows_returned_count", repository="ItemRepository", method="query") >= 1
+
+
+def test_metrics_are_exposed():
+    assert "shop_repository_call_seconds" in TestClient(app).get("/metrics").text
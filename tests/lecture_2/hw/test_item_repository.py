@@ -0,0 +1,41 @@
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.repository import ItemRepository
+
+
+@pytest.fixture
+def item_repository() -> ItemRepository:
+    repository = ItemRepository()
+    for price in [50.0, 10.0, 30.0, 20.0, 40.0]:
+        repository.create(Item(name=f"item {price}", price=price, deleted=False))
+    return repository
+
+
+def test_query_price_range_is_ordered_by_price(item_repository):
+    items = item_repository.query(min_price=15.0, max_price=40.0)
+
+    assert [item.price for item in items] == [20.0, 30.0, 40.0]
+
+
+def test_query_price_range_with_offset_and_limit(item_repository):
+    items = item_repository.query(offset=1, limit=2, min_price=10.0)
+
+    assert [item.price for item in items] == [20.0, 30.0]
+
+
+def test_query_price_range_follows_updates(item_repository):
+    item = item_repository.query(min_price=50.0)[0]
+    item_repository.update(Item(id=item.id, name=item.name, price=5.0, deleted=False))
+
+    assert item_repository.query(min_price=45.0) == []
+    assert [item.price for item in item_repository.query(max_price=10.0)] == [5.0, 10.0]
+
+
+def test_query_skips_deleted_items(item_repository):
+    item = item_repository.query(min_price=30.0, max_price=30.0)[0]
+    item_repository.update(Item(id=item.id, name=item.name, price=item.price, deleted=True))
+
+    assert item_repository.query(min_price=30.0, max_price=30.0) == []
+    assert len(item_repository.query(min_price=30.0, max_price=30.0, show_deleted=True)) == 1
+    assert len(item_repository.query()) == 4
@@ -0,0 +1,61 @@
+from http import HTTPStatus
+
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+
+client = TestClient(app)
+
+
+def create_item() -> tuple[int, str]:
+    response = client.post("/item/", json={"name": "versioned", "price": 10.0})
+    assert response.status_code == HTTPStatus.CREATED
+    return response.json()["id"], response.headers["etag"]
+
+
+def test_etag_tracks_the_item_version():
+    item_id, etag = create_item()
+
+    response = client.get(f"/item/{item_id}")
+    assert response.headers["etag"] == etag == '"v1"'
+    assert "version" not in response.json()
+
+    updated = client.patch(f"/item/{item_id}", json={"price": 11.0})
+    assert updated.headers["etag"] == '"v2"'
+    assert client.get(f"/item/{item_id}").headers["etag"] == '"v2"'
+
+
+def test_matching_if_match_updates():
+    item_id, etag = create_item()
+
+    response = client.put(f"/item/{item_id}", json={"name": "renamed", "price": 12.0}, headers={"if-match": etag})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["name"] == "renamed"
+    assert response.headers["etag"] != etag
+
+
+def test_stale_if_match_is_rejected():
+    item_id, etag = create_item()
+    client.patch(f"/item/{item_id}", json={"price": 20.0}, headers={"if-match": etag})
+
+    for request in [client.patch(f"/item/{item_id}", json={"price": 30.0}, headers={"if-match": etag}),
+                    client.put(f"/item/{item_id}", json={"name": "lost", "price": 30.0}, headers={"if-match": etag}),
+                    client.request("DELETE", f"/item/{item_id}", headers={"if-match": etag})]:
+        assert request.status_code == HTTPStatus.PRECONDITION_FAILED
+
+    item = client.get(f"/item/{item_id}").json()
+    assert (item["name"], item["price"]) == ("versioned", 20.0)
+
+
+def test_wildcard_and_weak_if_match():
+    item_id, etag = create_item()
+
+    weak = client.patch(f"/item/{item_id}", json={"price": 1.0}, headers={"if-match": f"W/{etag}"})
+    assert weak.status_code == HTTPStatus.PRECONDITION_FAILED
+
+    wildcard = client.patch(f"/item/{item_id}", json={"price": 2.0}, headers={"if-match": "*"})
+    assert wildcard.status_code == HTTPStatus.OK
+
+    listed = client.delete(f"/item/{item_id}", headers={"if-match": f'"v0", {wildcard.headers["etag"]}'})
+    assert listed.status_code == HTTPStatus.OK
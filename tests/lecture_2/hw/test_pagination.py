@@ -0,0 +1,81 @@
+from http import HTTPStatus
+from typing import Any
+
+import pytest
+from faker import Faker
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.cursor import NEXT_CURSOR_HEADER
+
+client = TestClient(app)
+faker = Faker()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def existing_items() -> list[int]:
+    items = [
+        client.post("/item", json={"name": f"item {i}", "price": faker.pyfloat(min_value=10.0, max_value=100.0)})
+        for i in range(30)
+    ]
+    return [item.json()["id"] for item in items]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def existing_carts(existing_items: list[int]) -> list[int]:
+    carts = []
+    for _ in range(15):
+        cart_id = client.post("/cart").json()["id"]
+        client.post(f"/cart/{cart_id}/add/{faker.random_element(existing_items)}")
+        carts.append(cart_id)
+    return carts
+
+
+def crawl(path: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+    pages, cursor = [], None
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == HTTPStatus.OK
+        pages.extend(response.json())
+
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"limit": 7},
+        {"limit": 7, "show_deleted": True},
+        {"limit": 4, "min_price": 30.0, "max_price": 70.0},
+        {"limit": 4, "max_price": 50.0},
+    ],
+)
+def test_item_cursor_crawl_matches_single_page(params: dict[str, Any]) -> None:
+    expected = client.get("/item", params={**params, "limit": 100_000}).json()
+
+    assert crawl("/item", params) == expected
+
+
+def test_cart_cursor_crawl_matches_single_page() -> None:
+    expected = client.get("/cart", params={"limit": 100_000}).json()
+
+    assert crawl("/cart", {"limit": 6}) == expected
+
+
+def test_cursor_combines_with_offset() -> None:
+    first_page = client.get("/item", params={"limit": 3})
+    cursor = first_page.headers[NEXT_CURSOR_HEADER]
+
+    expected = client.get("/item", params={"offset": 5, "limit": 2}).json()
+    response = client.get("/item", params={"cursor": cursor, "offset": 2, "limit": 2})
+
+    assert response.json() == expected
+
+
+@pytest.mark.parametrize("path", ["/item", "/cart"])
+def test_invalid_cursor(path: str) -> None:
+    response = client.get(path, params={"cursor": "not a cursor"})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
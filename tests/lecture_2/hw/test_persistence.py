@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.persistence import JOURNAL_FILE, SNAPSHOT_FILE, PersistentStore
+
+
+def fill(store: PersistentStore, first_item: int) -> None:
+    items = store.item_repository.create_many([Item(name=f"товар {first_item + i}", price=float(first_item + i),
+                                                    deleted=False) for i in range(5)])
+    store.item_repository.update(Item(items[1].id, "renamed", 100.0, False))
+    store.item_repository.update(Item(items[2].id, items[2].name, items[2].price, True))
+
+    cart = store.cart_repository.create_cart()
+    store.cart_repository.add_item_to_cart(cart.id, store.item_repository.get_entity(items[0].id), 2)
+    store.cart_repository.add_items_to_cart(cart.id, [(store.item_repository.get_entity(items[1].id), 1),
+                                                      (store.item_repository.get_entity(items[2].id), 3)])
+    store.cart_repository.create_cart()
+
+
+def state(store: PersistentStore):
+    items = store.item_repository.query(limit=1_000, show_deleted=True)
+    carts = [(cart.id, [(line.item.id, line.quantity) for line in cart.items], round(cart.total_price, 6),
+              cart.total_quantity) for cart in store.cart_repository.query_carts(limit=1_000)]
+    found = [item.id for item in store.item_repository.search("товар", limit=1_000, show_deleted=True)]
+    return items, carts, found
+
+
+@pytest.mark.parametrize("snapshot_after_first_fill", [False, True])
+def test_restart_restores_state(tmp_path, snapshot_after_first_fill):
+    store = PersistentStore(str(tmp_path))
+    fill(store, 0)
+    if snapshot_after_first_fill:
+        store.snapshot()
+    fill(store, 10)
+    expected = state(store)
+    store.close()
+
+    restored = PersistentStore(str(tmp_path))
+
+    assert state(restored) == expected
+    assert restored.item_repository.create(Item(name="next", price=1.0, deleted=False)).id == 11
+    assert restored.cart_repository.create_cart().id == 5
+    restored.close()
+
+
+@pytest.mark.parametrize("snapshot_between_updates", [False, True])
+def test_versions_survive_restart(tmp_path, snapshot_between_updates):
+    store = PersistentStore(str(tmp_path))
+    item = store.item_repository.create(Item(name="versioned", price=1.0, deleted=False))
+    store.item_repository.update(Item(item.id, item.name, 2.0, False), expected_version=1)
+    if snapshot_between_updates:
+        store.snapshot()
+    store.item_repository.update(Item(item.id, item.name, 3.0, False), expected_version=2)
+    store.close()
+
+    restored = PersistentStore(str(tmp_path))
+
+    assert restored.item_repository.get(item.id).version == 3
+    assert restored.item_repository.update(Item(item.id, item.name, 4.0, False), expected_version=3).version == 4
+    restored.close()
+
+
+def test_snapshot_compacts_journal(tmp_path):
+    store = PersistentStore(str(tmp_path))
+    fill(store, 0)
+    journal_size = os.path.getsize(tmp_path / JOURNAL_FILE)
+
+    store.snapshot()
+
+    assert os.path.getsize(tmp_path / JOURNAL_FILE) < journal_size
+    assert os.path.exists(tmp_path / SNAPSHOT_FILE)
+    store.close()
+
+
+def test_crash_between_snapshot_and_rotation_does_not_replay_twice(tmp_path):
+    store = PersistentStore(str(tmp_path))
+    fill(store, 0)
+    journal_before_snapshot = (tmp_path / JOURNAL_FILE).read_bytes()
+    store.snapshot()
+    fill(store, 10)
+    expected = state(store)
+    store.close()
+
+    # the snapshot was renamed into place but the journal is still the previous generation
+    (tmp_path / JOURNAL_FILE).write_bytes(journal_before_snapshot)
+    restored = PersistentStore(str(tmp_path))
+    first_fill = [item for item in expected[0] if item.id <= 5]
+
+    assert state(restored)[0] == first_fill
+    restored.close()
+
+
+def test_torn_journal_tail_is_dropped(tmp_path):
+    store = PersistentStore(str(tmp_path))
+    fill(store, 0)
+    expected = state(store)
+    store.item_repository.create(Item(name="half written", price=1.0, deleted=False))
+    store.close()
+
+    with open(tmp_path / JOURNAL_FILE, "r+b") as journal:
+        journal.truncate(os.path.getsize(tmp_path / JOURNAL_FILE) - 3)
+
+    restored = PersistentStore(str(tmp_path))
+    assert state(restored) == expected
+    restored.close()
+
+
+@pytest.mark.parametrize("snapshot_after_purge", [False, True])
+def test_purged_items_stay_purged_after_restart(tmp_path, snapshot_after_purge):
+    store = PersistentStore(str(tmp_path))
+    fill(store, 0)
+    last = store.item_repository.create(Item(name="last", price=1.0, deleted=True))
+    assert store.item_repository.purge_deleted(store.cart_repository.references_item) == [last.id]
+    if snapshot_after_purge:
+        store.snapshot()
+    expected = state(store)
+    store.close()
+
+    restored = PersistentStore(str(tmp_path))
+
+    assert state(restored) == expected
+    assert restored.item_repository.create(Item(name="next", price=1.0, deleted=False)).id == last.id + 1
+    restored.close()
+
+
+@pytest.mark.parametrize("snapshot_after_add", [False, True])
+def test_lines_of_purged_items_are_dropped_on_restart(tmp_path, snapshot_after_add):
+    store = PersistentStore(str(tmp_path))
+    item = store.item_repository.create(Item(name="purged", price=1.0, deleted=True))
+    stale_entity = store.item_repository.get_entity(item.id)
+    cart = store.cart_repository.create_cart()
+    # what a line added while compaction ran could leave behind before the two were mutually exclusive
+    assert store.item_repository.purge_deleted(store.cart_repository.references_item) == [item.id]
+    store.cart_repository.add_item_to_cart(cart.id, stale_entity)
+    if snapshot_after_add:
+        store.snapshot()
+    store.close()
+
+    restored = PersistentStore(str(tmp_path))
+
+    assert restored.cart_repository.get_cart(cart.id).items == []
+    restored.close()
@@ -0,0 +1,126 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes import cache
+from lecture_2.hw.shop_api.routes.cache import ResponseCache
+from lecture_2.hw.shop_api.storage.repository import ItemRepository
+from lecture_2.hw.shop_api.storage.sqlite import SqliteDatabase, SqliteItemRepository
+
+client = TestClient(app)
+
+
+class FakeClock:
+    now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def counter(name: str, kind: str) -> float:
+    return REGISTRY.get_sample_value(f"shop_response_cache_{name}_total", {"kind": kind}) or 0.0
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def test_lru_eviction(clock):
+    cache = ResponseCache(max_entries=2, ttl=60, clock=clock)
+    for key in [1, 2]:
+        cache.put("item", key, b"{}", cache.stamp())
+    cache.get("item", 1)
+    cache.put("item", 3, b"{}", cache.stamp())
+
+    assert cache.get("item", 2) is None
+    assert cache.get("item", 1) is not None
+    assert cache.get("item", 3) is not None
+
+
+def test_ttl_expiry(clock):
+    cache = ResponseCache(max_entries=10, ttl=5, clock=clock)
+    cache.put("item", 1, b"{}", cache.stamp())
+
+    clock.now = 4.9
+    assert cache.get("item", 1) is not None
+    clock.now = 5.0
+    assert cache.get("item", 1) is None
+    assert len(cache) == 0
+
+
+def test_put_after_invalidation_is_not_cached(clock):
+    cache = ResponseCache(clock=clock)
+    stamp = cache.stamp()
+    cache.invalidate("item", 1)
+
+    assert cache.put("item", 1, b"stale", stamp).body == b"stale"
+    assert cache.get("item", 1) is None
+
+
+def test_etag_and_not_modified():
+    item_id = client.post("/item", json={"name": "cached", "price": 10.0}).json()["id"]
+    response = client.get(f"/item/{item_id}")
+    etag = response.headers["etag"]
+
+    hits = counter("hits", "item")
+    not_modified = client.get(f"/item/{item_id}", headers={"if-none-match": etag})
+
+    assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+    assert not_modified.content == b""
+    assert counter("hits", "item") == hits + 1
+    assert client.get(f"/item/{item_id}", headers={"if-none-match": '"other"'}).json() == response.json()
+
+
+def test_item_update_invalidates_item_and_carts():
+    item_id = client.post("/item", json={"name": "cached", "price": 10.0}).json()["id"]
+    cart_id = client.post("/cart").json()["id"]
+    client.post(f"/cart/{cart_id}/add/{item_id}", params={"quantity": 2})
+    etag = client.get(f"/item/{item_id}").headers["etag"]
+    assert client.get(f"/cart/{cart_id}").json()["price"] == 20.0
+
+    client.patch(f"/item/{item_id}", json={"name": "renamed", "price": 15.0})
+
+    response = client.get(f"/item/{item_id}", headers={"if-none-match": etag})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["name"] == "renamed"
+    cart = client.get(f"/cart/{cart_id}").json()
+    assert (cart["price"], cart["items"][0]["name"]) == (30.0, "renamed")
+
+    client.delete(f"/item/{item_id}")
+    assert client.get(f"/item/{item_id}").status_code == HTTPStatus.NOT_FOUND
+    assert client.get(f"/cart/{cart_id}").json()["items"][0]["available"] is False
+
+
+def test_add_to_cart_invalidates_cart():
+    item_id = client.post("/item", json={"name": "cached", "price": 10.0}).json()["id"]
+    cart_id = client.post("/cart").json()["id"]
+    assert client.get(f"/cart/{cart_id}").json()["items"] == []
+
+    client.post(f"/cart/{cart_id}/add/{item_id}")
+    assert client.get(f"/cart/{cart_id}").json()["price"] == 10.0
+
+    client.post(f"/cart/{cart_id}/add-bulk", json=[{"item_id": item_id, "quantity": 2}])
+    assert client.get(f"/cart/{cart_id}").json()["price"] == 30.0
+
+
+def test_counters_are_exposed():
+    client.get("/item/0")
+    metrics = client.get("/metrics").text
+
+    assert "shop_response_cache_hits_total" in metrics
+    assert "shop_response_cache_misses_total" in metrics
+    assert "shop_response_cache_evictions_total" in metrics
+
+
+def test_cache_is_off_by_default_over_storage_shared_across_processes(tmp_path, monkeypatch):
+    assert cache.default_cache_size() > 0
+
+    monkeypatch.setattr(cache, "item_repository", SqliteItemRepository(SqliteDatabase(str(tmp_path / "shop.db"))))
+    assert cache.default_cache_size() == 0
+
+    monkeypatch.setattr(cache, "item_repository", ItemRepository())
+    assert cache.default_cache_size() > 0
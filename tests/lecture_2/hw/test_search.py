@@ -0,0 +1,31 @@
+from http import HTTPStatus
+
+from fastapi.testclient import TestClient
+
+from lecture_2.hw.shop_api.main import app
+
+client = TestClient(app)
+
+
+def test_search_items():
+    created = client.post("/item/bulk", json=[{"name": "Searchable Kettle", "price": 30.0},
+                                              {"name": "searchable kettlebell", "price": 45.0},
+                                              {"name": "searchable teapot", "price": 15.0}]).json()
+    kettle_id, kettlebell_id, teapot_id = (result["item"]["id"] for result in created)
+    client.delete(f"/item/{kettlebell_id}")
+
+    def search(**params) -> list[int]:
+        response = client.get("/item/search", params=params)
+        assert response.status_code == HTTPStatus.OK
+        return [item["id"] for item in response.json()]
+
+    assert search(q="searchable") == [kettle_id, teapot_id]
+    assert search(q="searchable ket") == [kettle_id]
+    assert search(q="searchable ket", show_deleted=True) == [kettle_id, kettlebell_id]
+    assert search(q="searchable", max_price=20) == [teapot_id]
+    assert search(q="searchable", offset=1, limit=1) == [teapot_id]
+    assert search(q="searchable xyz") == []
+
+
+def test_search_requires_a_query():
+    assert client.get("/item/search").status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,53 @@
+import json
+from http import HTTPStatus
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from lecture_2.hw.shop_api.main import app
+from lecture_2.hw.shop_api.routes.cart_routes import to_cart
+from lecture_2.hw.shop_api.routes.model import Cart, Item
+from lecture_2.hw.shop_api.routes.serialization import dump_cart, dump_carts, dump_item, dump_items
+from lecture_2.hw.shop_api.storage.base import ItemEntity
+from lecture_2.hw.shop_api.storage.repository import CartRepository
+
+
+@pytest.fixture()
+def carts() -> list:
+    cart_repository = CartRepository()
+    available = ItemEntity(1, "available", 10.5, False)
+    deleted = ItemEntity(2, "deleted", 3.0, True)
+
+    empty_cart = cart_repository.create_cart()
+    full_cart = cart_repository.create_cart()
+    cart_repository.add_items_to_cart(full_cart.id, [(available, 2), (deleted, 1), (available, 1)])
+    return [empty_cart, full_cart]
+
+
+def test_items_match_response_model():
+    items = [Item(1, "first", 10.0, False), Item(2, "второй", 0.5, True)]
+
+    assert json.loads(dump_item(items[0])) == TypeAdapter(Item).dump_python(items[0])
+    assert json.loads(dump_items(items)) == TypeAdapter(List[Item]).dump_python(items)
+
+
+def test_carts_match_response_model(carts):
+    expected = TypeAdapter(List[Cart]).dump_python([to_cart(cart) for cart in carts], mode="json")
+
+    assert json.loads(dump_carts(carts)) == expected
+    assert json.loads(dump_cart(carts[1])) == expected[1]
+    assert expected[1]["price"] == 31.5
+
+
+def test_not_modified_has_no_body():
+    client = TestClient(app)
+    item_id = client.post("/item", json={"name": "deleted", "price": 1.0}).json()["id"]
+    client.delete(f"/item/{item_id}")
+
+    response = client.patch(f"/item/{item_id}", json={"price": 2.0})
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.content == b""
+    assert "content-length" not in response.headers
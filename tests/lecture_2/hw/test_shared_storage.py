@@ -0,0 +1,134 @@
+import multiprocessing
+import uuid
+from typing import Iterator
+
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage import shared
+from lecture_2.hw.shop_api.storage.shared import (CatalogueFullError, SharedCartRepository, SharedCatalogue,
+                                                   SharedItemRepository, TornRecordError, shared_catalogue)
+
+
+@pytest.fixture
+def catalogue() -> Iterator[SharedCatalogue]:
+    with shared_catalogue(f"shop_test_{uuid.uuid4().hex[:12]}", capacity=100) as catalogue:
+        yield catalogue
+
+
+def worker(catalogue: SharedCatalogue) -> SharedItemRepository:
+    return SharedItemRepository(SharedCatalogue.attach(catalogue.name))
+
+
+def create_in_child(name: str) -> None:
+    repository = SharedItemRepository(SharedCatalogue.attach(name))
+    repository.create_many([Item(name=f"из процесса {i}", price=float(i), deleted=False) for i in range(10)])
+    repository.update(Item(3, "renamed", 100.0, False))
+
+
+def test_writes_are_seen_by_other_workers(catalogue):
+    first, second = worker(catalogue), worker(catalogue)
+    items = first.create_many([Item(name=f"item {price}", price=price, deleted=False) for price in [30.0, 10.0, 20.0]])
+    assert [item.price for item in second.query(min_price=0.0)] == [10.0, 20.0, 30.0]
+
+    second.update(Item(items[0].id, "cheap", 5.0, False))
+    second.update(Item(items[1].id, items[1].name, 10.0, True))
+
+    assert first.get(items[0].id) == Item(items[0].id, "cheap", 5.0, False)
+    assert [item.price for item in first.query(min_price=0.0)] == [5.0, 20.0]
+    assert [item.price for item in first.query(min_price=0.0, show_deleted=True)] == [5.0, 10.0, 20.0]
+    assert [item.id for item in first.query(after=(0.0, items[0].id))] == [items[2].id]
+    assert first.get(10 ** 6) is None
+
+
+def test_lagging_worker_rebuilds_when_the_change_log_wrapped(catalogue):
+    writer, reader = worker(catalogue), worker(catalogue)
+    item = writer.create(Item(name="item", price=1.0, deleted=False))
+    assert len(reader.query()) == 1
+
+    for price in range(catalogue.log_capacity + 5):
+        writer.update(Item(item.id, "item", float(price), False))
+
+    assert [found.price for found in reader.query(min_price=0.0)] == [float(catalogue.log_capacity + 4)]
+
+
+def test_writes_from_another_process(catalogue):
+    process = multiprocessing.get_context("spawn").Process(target=create_in_child, args=(catalogue.name,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    repository = worker(catalogue)
+    assert repository.get(3) == Item(3, "renamed", 100.0, False)
+    assert [item.name for item in repository.query(max_price=1.0)] == ["из процесса 0", "из процесса 1"]
+
+
+def cart_worker(catalogue: SharedCatalogue) -> tuple[SharedItemRepository, SharedCartRepository]:
+    attached = SharedCatalogue.attach(catalogue.name)
+    item_repository = SharedItemRepository(attached)
+    cart_repository = SharedCartRepository(attached, item_repository)
+    item_repository.add_update_listener(cart_repository.on_item_updated)
+    return item_repository, cart_repository
+
+
+def test_carts_are_seen_by_other_workers(catalogue):
+    (first_items, first_carts), (second_items, second_carts) = cart_worker(catalogue), cart_worker(catalogue)
+    items = first_items.create_many([Item(name=f"item {price}", price=price, deleted=False) for price in [10.0, 20.0]])
+
+    first_cart, second_cart = first_carts.create_cart(), second_carts.create_cart()
+    assert (first_cart.id, second_cart.id) == (1, 2)
+
+    second_carts.add_item_to_cart(first_cart.id, second_items.get_entity(items[0].id), 2)
+    first_carts.add_items_to_cart(second_cart.id, [(first_items.get_entity(items[0].id), 1),
+                                                   (first_items.get_entity(items[1].id), 1)])
+
+    assert first_carts.get_cart(first_cart.id).total_price == 20.0
+    assert second_carts.get_cart(second_cart.id).total_price == 30.0
+    assert [cart.id for cart in second_carts.query_carts(min_price=25.0)] == [second_cart.id]
+    assert first_carts.carts_with_item(items[0].id) == [first_cart.id, second_cart.id]
+    assert first_carts.stats().count == 2
+
+
+def test_carts_follow_updates_from_other_workers(catalogue):
+    (first_items, first_carts), (second_items, second_carts) = cart_worker(catalogue), cart_worker(catalogue)
+
+    item = first_items.create(Item(name="item", price=10.0, deleted=False))
+    cart_id = second_carts.create_cart().id
+    second_carts.add_item_to_cart(cart_id, second_items.get_entity(item.id), 2)
+
+    first_items.update(Item(item.id, "item", 99.0, True))
+    cart = second_carts.get_cart(cart_id)
+    assert cart.total_price == 0
+    assert not cart.items[0].available()
+
+    first_items.update(Item(item.id, "item", 99.0, False))
+    cart = second_carts.add_item_to_cart(cart_id, second_items.get_entity(item.id), 1)
+    assert cart.total_price == 3 * 99.0
+    assert cart.items[0].available()
+    assert second_carts.stats().total_price == 3 * 99.0
+    assert first_carts.get_cart(cart_id).total_price == 3 * 99.0
+
+
+def test_half_written_record_fails_the_read(catalogue, monkeypatch):
+    repository = worker(catalogue)
+    item = repository.create(Item(name="item", price=1.0, deleted=False))
+
+    class HalfWritten:
+        # the version stays odd, as when the writer died in the middle of the record
+        size = shared._RECORD.size
+
+        @staticmethod
+        def unpack_from(buffer, offset):
+            return 1, False, 0.0, 0, 0
+
+    monkeypatch.setattr(shared, "_RECORD", HalfWritten)
+    monkeypatch.setattr(shared, "TORN_RECORD_TIMEOUT", 0.01)
+    with pytest.raises(TornRecordError):
+        repository.get(item.id)
+
+
+def test_capacity_is_enforced(catalogue):
+    repository = worker(catalogue)
+    with pytest.raises(CatalogueFullError):
+        repository.create_many([Item(name="item", price=1.0, deleted=False)] * (catalogue.capacity + 1))
+    assert repository.query() == []
@@ -0,0 +1,207 @@
+import uuid
+from typing import Iterator
+
+import pytest
+
+from lecture_2.hw.shop_api.routes.model import Item
+from lecture_2.hw.shop_api.storage.base import CartStorage, ItemStorage, PurgedItemError, VersionConflictError
+from lecture_2.hw.shop_api.storage.compaction import compact
+from lecture_2.hw.shop_api.storage.factory import create_repositories
+from lecture_2.hw.shop_api.storage.shared import SHARED_NAME_ENV, SharedItemRepository, shared_catalogue
+
+
+@pytest.fixture(params=["memory", "sqlite", "shared", "columnar"])
+def repositories(request, tmp_path, monkeypatch) -> Iterator[tuple[ItemStorage, CartStorage]]:
+    if request.param != "shared":
+        yield create_repositories(request.param, str(tmp_path / "shop.db"))
+        return
+
+    with shared_catalogue(f"shop_test_{uuid.uuid4().hex[:12]}", capacity=1_000) as catalogue:
+        monkeypatch.setenv(SHARED_NAME_ENV, catalogue.name)
+        yield create_repositories(request.param)
+
+
+@pytest.fixture
+def item_repository(repositories) -> ItemStorage:
+    return repositories[0]
+
+
+@pytest.fixture
+def cart_repository(repositories) -> CartStorage:
+    return repositories[1]
+
+
+@pytest.fixture
+def items(item_repository) -> list[Item]:
+    return item_repository.create_many([Item(name=f"item {price}", price=price, deleted=False)
+                                        for price in [50.0, 10.0, 30.0, 20.0, 40.0]])
+
+
+def test_get(item_repository, items):
+    assert item_repository.get(items[0].id) == Item(items[0].id, "item 50.0", 50.0, False)
+    assert item_repository.get(10 ** 9) is None
+    assert item_repository.get_entity(10 ** 9) is None
+
+
+def test_get_entities(item_repository, items):
+    item_entities = item_repository.get_entities([items[2].id, 10 ** 9, items[0].id, items[2].id])
+
+    assert [item_entity and (item_entity.id, item_entity.price) for item_entity in item_entities] == [
+        (items[2].id, 30.0), None, (items[0].id, 50.0), (items[2].id, 30.0)]
+    assert item_repository.get_entities([]) == []
+
+
+@pytest.mark.parametrize(
+    ("params", "expected_prices"),
+    [
+        ({}, [50.0, 10.0, 30.0, 20.0, 40.0]),
+        ({"offset": 1, "limit": 2}, [10.0, 30.0]),
+        ({"min_price": 15.0, "max_price": 40.0}, [20.0, 30.0, 40.0]),
+        ({"min_price": 15.0, "offset": 1, "limit": 2}, [30.0, 40.0]),
+    ],
+)
+def test_query(item_repository, items, params, expected_prices):
+    assert [item.price for item in item_repository.query(**params)] == expected_prices
+
+
+def test_query_after(item_repository, items):
+    by_price = item_repository.query(min_price=0.0, limit=2)
+    by_id = item_repository.query(limit=2)
+
+    assert [item.price for item in item_repository.query(min_price=0.0, after=(by_price[-1].price, by_price[-1].id))] \
+           == [30.0, 40.0, 50.0]
+    assert [item.price for item in item_repository.query(after=(by_id[-1].price, by_id[-1].id))] == [30.0, 20.0, 40.0]
+
+
+def test_update_and_deleted(item_repository, items):
+    item_repository.update(Item(items[1].id, "renamed", 60.0, True))
+
+    assert item_repository.get(items[1].id) == Item(items[1].id, "renamed", 60.0, True)
+    assert items[1].id not in [item.id for item in item_repository.query()]
+    assert [item.price for item in item_repository.query(min_price=55.0, show_deleted=True)] == [60.0]
+
+
+
+def test_update_compares_and_swaps_versions(item_repository, items):
+    assert item_repository.get(items[0].id).version == 1
+    assert item_repository.get_entity(items[0].id).version == 1
+
+    updated = item_repository.update(Item(items[0].id, "first", 1.0, False), expected_version=1)
+    assert updated.version == 2
+    with pytest.raises(VersionConflictError):
+        item_repository.update(Item(items[0].id, "lost", 2.0, False), expected_version=1)
+
+    assert item_repository.get(items[0].id) == Item(items[0].id, "first", 1.0, False)
+    assert item_repository.update(Item(items[0].id, "blind", 3.0, False)).version == 3
+    assert item_repository.get(items[0].id).version == 3
+
+
+
+def test_search(item_repository, items):
+    item_repository.update(Item(items[1].id, "Red apple", 10.0, False))
+    item_repository.update(Item(items[3].id, "apple pie", 20.0, True))
+
+    assert [item.id for item in item_repository.search("ite")] == [items[0].id, items[2].id, items[4].id]
+    assert [item.id for item in item_repository.search("app")] == [items[1].id]
+    assert [item.id for item in item_repository.search("app", show_deleted=True)] == [items[1].id, items[3].id]
+    assert [item.id for item in item_repository.search("red app")] == [items[1].id]
+    assert [item.price for item in item_repository.search("item", min_price=35.0)] == [50.0, 40.0]
+    assert [item.price for item in item_repository.search("item", offset=1, limit=1)] == [30.0]
+    assert item_repository.search("10") == []
+
+
+def test_cart_lines_and_totals(item_repository, cart_repository, items):
+    cart = cart_repository.create_cart()
+    entities = [item_repository.get_entity(item.id) for item in items]
+    cart_repository.add_item_to_cart(cart.id, entities[0], 2)
+    cart_repository.add_items_to_cart(cart.id, [(entities[1], 1), (entities[0], 1)])
+
+    cart = cart_repository.get_cart(cart.id)
+    assert [(cart_item.item.id, cart_item.quantity) for cart_item in cart.items] == [(items[0].id, 3), (items[1].id, 1)]
+    assert (cart.total_price, cart.total_quantity) == pytest.approx((160.0, 4))
+
+    item_repository.update(Item(items[0].id, items[0].name, 50.0, True))
+    cart = cart_repository.get_cart(cart.id)
+    assert not cart.items[0].available()
+    assert (cart.total_price, cart.total_quantity) == pytest.approx((10.0, 4))
+    assert cart_repository.get_cart(10 ** 9) is None
+
+
+def test_query_carts(item_repository, cart_repository, items):
+    entities = [item_repository.get_entity(item.id) for item in items]
+    carts = [cart_repository.create_cart() for _ in range(3)]
+    cart_repository.add_item_to_cart(carts[0].id, entities[1])
+    cart_repository.add_item_to_cart(carts[1].id, entities[0], 3)
+
+    assert [cart.id for cart in cart_repository.query_carts(min_price=100.0)] == [carts[1].id]
+    assert [cart.id for cart in cart_repository.query_carts(max_quantity=0)] == [carts[2].id]
+    assert [cart.id for cart in cart_repository.query_carts(after_id=carts[0].id)] == [carts[1].id, carts[2].id]
+    assert cart_repository.query_carts(min_quantity=1)[0].total_price == pytest.approx(10.0)
+
+
+def test_cart_stats_follow_lines_and_item_changes(item_repository, cart_repository, items):
+    entities = [item_repository.get_entity(item.id) for item in items]
+    carts = [cart_repository.create_cart() for _ in range(3)]
+    cart_repository.add_item_to_cart(carts[0].id, entities[1], 2)
+    cart_repository.add_items_to_cart(carts[1].id, [(entities[0], 1), (entities[2], 3)])
+    item_repository.update(Item(items[2].id, items[2].name, 30.0, True))
+
+    stats = cart_repository.stats()
+    assert (stats.count, stats.total_price, stats.total_quantity) == pytest.approx((3, 70.0, 6))
+    assert {bucket.upper_bound: bucket.count for bucket in stats.price_histogram if bucket.count} == {0.0: 1, 20.0: 1,
+                                                                                                     50.0: 1}
+    assert {bucket.upper_bound: bucket.count for bucket in stats.quantity_histogram if bucket.count} == {0: 1, 2: 1,
+                                                                                                        4: 1}
+
+
+def test_query_merges_live_and_deleted_partitions(item_repository, items):
+    for item in items[1::2]:
+        item_repository.update(Item(item.id, item.name, item.price, True))
+
+    assert [item.price for item in item_repository.query()] == [50.0, 30.0, 40.0]
+    assert [item.price for item in item_repository.query(show_deleted=True)] == [50.0, 10.0, 30.0, 20.0, 40.0]
+    assert [item.price for item in item_repository.query(min_price=0.0, show_deleted=True, after=(20.0, items[3].id))] \
+           == [30.0, 40.0, 50.0]
+
+    item_repository.update(Item(items[1].id, items[1].name, items[1].price, False))
+    assert [item.price for item in item_repository.query(min_price=0.0)] == [10.0, 30.0, 40.0, 50.0]
+
+
+def test_compact_purges_unreferenced_deleted_items(item_repository, cart_repository, items):
+    if isinstance(item_repository, SharedItemRepository):
+        pytest.skip("the shared catalogue never purges")
+
+    cart = cart_repository.create_cart()
+    cart_repository.add_item_to_cart(cart.id, item_repository.get_entity(items[0].id))
+    for item in items[:2]:
+        item_repository.update(Item(item.id, item.name, item.price, True))
+
+    assert compact(item_repository, cart_repository) == [items[1].id]
+    assert compact(item_repository, cart_repository) == []
+    assert item_repository.get(items[1].id) is None
+    assert item_repository.get(items[0].id).deleted
+    assert [item.price for item in item_repository.query(show_deleted=True)] == [50.0, 30.0, 20.0, 40.0]
+    assert cart_repository.get_cart(cart.id).total_quantity == 1
+
+    item_repository.update(Item(items[4].id, items[4].name, items[4].price, True))
+    compact(item_repository, cart_repository)
+    assert item_repository.create(Item(name="new", price=1.0, deleted=False)).id > items[4].id
+
+
+def test_lines_for_purged_items_are_refused(item_repository, cart_repository, items):
+    if isinstance(item_repository, SharedItemRepository):
+        pytest.skip("the shared catalogue never purges")
+
+    cart = cart_repository.create_cart()
+    item_repository.update(Item(items[1].id, items[1].name, items[1].price, True))
+    # read before compaction, added after it, as a route racing the compaction thread would
+    stale_entity = item_repository.get_entity(items[1].id)
+    assert compact(item_repository, cart_repository) == [items[1].id]
+
+    with pytest.raises(PurgedItemError):
+        cart_repository.add_item_to_cart(cart.id, stale_entity)
+    with pytest.raises(PurgedItemError):
+        cart_repository.add_items_to_cart(cart.id, [(item_repository.get_entity(items[0].id), 1), (stale_entity, 1)])
+
+    assert cart_repository.get_cart(cart.id).total_quantity == 0
+    assert not cart_repository.references_item(items[1].id)
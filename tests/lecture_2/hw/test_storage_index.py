@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from lecture_2.hw.shop_api.storage.index import NameIndex, SortedIndex, tokenize
+
+
+@pytest.fixture
+def keys() -> list[int]:
+    random.seed(0)
+    return random.sample(range(100_000), 5_000)
+
+
+def test_add_keeps_keys_sorted(keys):
+    index = SortedIndex(keys)
+
+    assert len(index) == len(keys)
+    assert list(index) == sorted(keys)
+
+
+def test_remove_and_discard(keys):
+    index = SortedIndex(keys)
+    removed = keys[::2]
+    for key in removed:
+        index.remove(key)
+
+    assert list(index) == sorted(keys[1::2])
+    assert removed[0] not in index
+    assert not index.discard(removed[0])
+    with pytest.raises(KeyError):
+        index.remove(removed[0])
+
+
+@pytest.mark.parametrize(
+    ("minimum", "maximum", "exclude_minimum"),
+    [
+        (None, None, False),
+        (10_000, None, False),
+        (None, 10_000, False),
+        (25_000, 75_000, False),
+        (25_000, 75_000, True),
+        (200_000, None, False),
+    ],
+)
+def test_irange(keys, minimum, maximum, exclude_minimum):
+    index = SortedIndex(keys)
+
+    expected = [
+        key for key in sorted(keys)
+        if (minimum is None or key > minimum or (key == minimum and not exclude_minimum))
+        and (maximum is None or key <= maximum)
+    ]
+    assert list(index.irange(minimum, maximum, exclude_minimum)) == expected
+
+
+@pytest.mark.parametrize(("minimum", "maximum"), [(-1, 10 ** 6), (500, 70_000), (99_999, 100_000), (7, 7)])
+def test_count(keys, minimum, maximum):
+    index = SortedIndex(keys)
+
+    assert index.count(minimum, maximum) == sum(minimum <= key < maximum for key in keys)
+
+
+NAMES = {1: "Red Apple", 2: "green apple pie", 3: "Applesauce", 4: "red pepper", 5: "apple, red & ripe"}
+
+
+@pytest.fixture
+def names() -> dict[int, str]:
+    return dict(NAMES)
+
+
+def test_tokenize():
+    assert tokenize("Apple, red & RED apple-pie") == ["apple", "red", "pie"]
+
+
+@pytest.mark.parametrize("direct_candidates", [0, 1_024])
+@pytest.mark.parametrize(
+    ("query", "expected_ids"),
+    [
+        ("app", [1, 2, 5, 3]),
+        ("APPLE", [1, 2, 5, 3]),
+        ("red app", [1, 5]),
+        ("red apple ri", [5]),
+        ("re", [1, 4, 5]),
+        ("blue app", []),
+        ("  ", []),
+    ],
+)
+def test_name_search(names, monkeypatch, direct_candidates, query, expected_ids):
+    # both the range walk and the check of candidate names
+    monkeypatch.setattr(NameIndex, "DIRECT_CANDIDATES", direct_candidates)
+    index = NameIndex()
+    for item_id, name in names.items():
+        index.add(item_id, name)
+
+    assert list(index.search(query, names.__getitem__, lambda item_id: True)) == expected_ids
+    assert list(index.search(query, names.__getitem__, lambda item_id: item_id != 5)) == \
+           [item_id for item_id in expected_ids if item_id != 5]
+
+
+def test_name_index_rename_and_remove(names):
+    index = NameIndex.from_names(sorted(names.items()))
+    index.rename(1, names[1], "yellow banana")
+    names[1] = "yellow banana"
+    index.remove(4, names.pop(4))
+
+    assert list(index.search("app", names.__getitem__, lambda item_id: True)) == [2, 5, 3]
+    assert list(index.search("ba", names.__getitem__, lambda item_id: True)) == [1]
+    assert list(index.search("pep", names.__getitem__, lambda item_id: True)) == []
+    assert len(index) == len(NameIndex.from_names(sorted(names.items())))
@@ -7,7 +7,11 @@ from fastapi.testclient import TestClient
 
 from lecture_2.rest_example import store
 from lecture_2.rest_example.main import app
-from lecture_2.rest_example.store.models import PokemonEntity, PokemonInfo
+from lecture_2.rest_example.store.models import (
+    PatchPokemonInfo,
+    PokemonEntity,
+    PokemonInfo,
+)
 
 faker = Faker()
 client = TestClient(app)
@@ -223,3 +227,210 @@ def test_patch_pokemon(request, pokemon: str, data: dict, status_code: int) -> N
         for key in ["name", "published"]:
             if key in data:
                 assert response_data[key] == data[key]
+
+
+def test_get_pokemon_list_pages_in_id_order(
+    existing_pokemons: list[PokemonEntity],
+) -> None:
+    first, last = existing_pokemons[0].id, existing_pokemons[-1].id
+    ids = [p.id for p in existing_pokemons]
+
+    response = client.get("/pokemon", params={"after": first - 1, "limit": 10})
+    assert [item["id"] for item in response.json()] == ids[:10]
+
+    response = client.get(
+        "/pokemon", params={"after": ids[9], "offset": 5, "limit": 10}
+    )
+    assert [item["id"] for item in response.json()] == ids[15:25]
+
+    response = client.get("/pokemon", params={"after": last})
+    assert all(item["id"] > last for item in response.json())
+
+
+def test_get_many_follows_deletes_and_upserts(
+    existing_pokemons: list[PokemonEntity],
+) -> None:
+    ids = [p.id for p in existing_pokemons]
+    store.delete(ids[1])
+    upserted = store.upsert(ids[-1] + 1_000, PokemonInfo("upserted", True))
+
+    try:
+        page = [e.id for e in store.get_many(0, 30, after=ids[0] - 1)]
+        assert page == [ids[0], *ids[2:], upserted.id]
+    finally:
+        store.delete(upserted.id)
+
+
+def test_get_pokemon_list_filters(existing_pokemons: list[PokemonEntity]) -> None:
+    first = existing_pokemons[0].id
+    published = [p.id for p in existing_pokemons if p.info.published]
+
+    response = client.get(
+        "/pokemon", params={"after": first - 1, "published": True, "limit": 30}
+    )
+    assert [item["id"] for item in response.json()] == published
+
+    named = existing_pokemons[3]
+    response = client.get("/pokemon", params={"name": named.info.name})
+    assert [item["id"] for item in response.json()] == [named.id]
+
+    response = client.get(
+        "/pokemon",
+        params={"name": named.info.name, "published": not named.info.published},
+    )
+    assert response.json() == []
+
+
+def test_get_many_filters_follow_writes() -> None:
+    name = faker.uuid4()
+    kept = store.add(PokemonInfo(name, False))
+    renamed = store.add(PokemonInfo(name, True))
+    deleted = store.add(PokemonInfo(name, True))
+    upserted = store.upsert(deleted.id + 1_000, PokemonInfo(name, True))
+
+    try:
+        store.update(kept.id, PokemonInfo(name, True))
+        store.patch(renamed.id, PatchPokemonInfo(name="renamed", published=False))
+        store.delete(deleted.id)
+
+        assert [e.id for e in store.get_many(name=name)] == [kept.id, upserted.id]
+        assert [
+            e.id for e in store.get_many(name="renamed", published=False)
+        ] == [renamed.id]
+        assert [
+            e.id for e in store.get_many(after=kept.id - 1, published=True, limit=100)
+        ] == [kept.id, upserted.id]
+
+        store.upsert(upserted.id, PokemonInfo("renamed", False))
+        assert [e.id for e in store.get_many(name=name)] == [kept.id]
+    finally:
+        for id in (kept.id, renamed.id, upserted.id):
+            store.delete(id)
+
+    assert list(store.get_many(name=name)) == []
+
+
+def test_add_skips_ids_taken_by_upsert() -> None:
+    name = faker.uuid4()
+    upserted = store.upsert(store.add(PokemonInfo(name, True)).id + 1, PokemonInfo(name, True))
+
+    added = store.add(PokemonInfo("added", False))
+    try:
+        assert added.id > upserted.id
+        assert store.get_one(upserted.id) == upserted
+        assert [e.id for e in store.get_many(name=name)][-1] == upserted.id
+    finally:
+        for id in (upserted.id - 1, upserted.id, added.id):
+            store.delete(id)
+
+    assert list(store.get_many(name=name)) == []
+
+
+def test_patch_publishes_a_new_version(existing_pokemon: PokemonEntity) -> None:
+    before = store.get_one(existing_pokemon.id)
+
+    patched = store.patch(
+        existing_pokemon.id,
+        PatchPokemonInfo(name="new_name", published=not before.info.published),
+    )
+
+    assert store.get_one(existing_pokemon.id) == patched
+    assert before.info == existing_pokemon.info
+    with pytest.raises(AttributeError):
+        before.info.name = "new_name"
+
+
+def test_post_pokemon_batch() -> None:
+    infos = [{"name": faker.name(), "published": faker.boolean()} for _ in range(5)]
+
+    response = client.post("/pokemon/batch", json=infos)
+
+    assert response.status_code == HTTPStatus.CREATED
+    results = response.json()
+    assert [r["status"] for r in results] == [HTTPStatus.CREATED] * 5
+    for result, info in zip(results, infos):
+        response = client.get(f"/pokemon/{result['id']}")
+        assert response.json() == {"id": result["id"], **info}
+        store.delete(result["id"])
+
+
+def test_patch_pokemon_batch(existing_pokemons: list[PokemonEntity]) -> None:
+    patches = [{"id": p.id, "name": f"patched {p.id}"} for p in existing_pokemons[:3]]
+
+    response = client.patch("/pokemon/batch", json=patches)
+
+    assert response.status_code == HTTPStatus.OK
+    names = [r["pokemon"]["name"] for r in response.json()]
+    assert names == [p["name"] for p in patches]
+
+
+def test_patch_pokemon_batch_is_all_or_nothing(
+    existing_pokemon: PokemonEntity,
+    not_existing_pokemon: PokemonEntity,
+) -> None:
+    name = existing_pokemon.info.name
+
+    response = client.patch(
+        "/pokemon/batch",
+        json=[
+            {"id": existing_pokemon.id, "name": "never applied"},
+            {"id": not_existing_pokemon.id, "published": True},
+        ],
+    )
+
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert [r["status"] for r in response.json()] == [
+        HTTPStatus.FAILED_DEPENDENCY,
+        HTTPStatus.NOT_FOUND,
+    ]
+    assert client.get(f"/pokemon/{existing_pokemon.id}").json()["name"] == name
+
+
+def test_delete_pokemon_batch(
+    existing_pokemon: PokemonEntity,
+    not_existing_pokemon: PokemonEntity,
+) -> None:
+    response = client.request(
+        "DELETE",
+        "/pokemon/batch",
+        json=[existing_pokemon.id, not_existing_pokemon.id],
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    statuses = [r["status"] for r in response.json()]
+    assert statuses == [HTTPStatus.OK, HTTPStatus.NOT_FOUND]
+    response = client.get(f"/pokemon/{existing_pokemon.id}")
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_batches_keep_filters_in_step() -> None:
+    # more entries than a list takes in place, so each touched list is rebuilt
+    name = faker.uuid4()
+    entities = store.add_many([PokemonInfo(name, False) for _ in range(200)])
+    ids = [e.id for e in entities]
+
+    store.patch_many(
+        [(id, PatchPokemonInfo(name=None, published=True)) for id in ids[::2]]
+        + [(ids[0], PatchPokemonInfo(name="renamed", published=None))]
+    )
+    assert store.delete_many(ids[1::4] + [ids[1]]) == [True] * 50 + [False]
+
+    try:
+        assert [e.id for e in store.get_many(name=name, limit=200)] == [
+            id for index, id in enumerate(ids[1:], 1) if index % 4 != 1
+        ]
+        assert [
+            e.id for e in store.get_many(after=ids[0] - 1, published=True, limit=200)
+        ] == ids[::2]
+        assert [
+            e.id for e in store.get_many(after=ids[0] - 1, published=False, limit=200)
+        ] == ids[3::4]
+        assert [e.id for e in store.get_many(name="renamed")] == [ids[0]]
+    finally:
+        store.delete_many(ids)
+
+
+def test_pokemon_batch_size_is_bounded() -> None:
+    response = client.request("DELETE", "/pokemon/batch", json=list(range(10_001)))
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from lecture_2.ws_example.server import Broadcaster, SlowConsumerPolicy, app
+
+
+class LocalSocket:
+    def __init__(self, stalled: bool = False):
+        self.received = []
+        self.closed = False
+        self.resume = asyncio.Event()
+        if not stalled:
+            self.resume.set()
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, message: str) -> None:
+        await self.resume.wait()
+        self.received.append(message)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_stalled_subscriber_does_not_block_others():
+    broadcaster = Broadcaster(max_queue=4)
+    fast, stalled = LocalSocket(), LocalSocket(stalled=True)
+    await broadcaster.subscribe(fast)
+    await broadcaster.subscribe(stalled)
+
+    for message in "abc":
+        broadcaster.publish(message)
+    await settle()
+
+    assert fast.received == ["a", "b", "c"]
+    assert stalled.received == []
+
+    stalled.resume.set()
+    await settle()
+    assert stalled.received == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_the_last_messages():
+    broadcaster = Broadcaster(max_queue=3, policy=SlowConsumerPolicy.DROP_OLDEST)
+    slow = LocalSocket(stalled=True)
+    await broadcaster.subscribe(slow)
+
+    broadcaster.publish("a")
+    await settle()
+    for message in "bcdef":
+        broadcaster.publish(message)
+
+    slow.resume.set()
+    await settle()
+
+    # "a" was already being sent when the subscriber fell behind
+    assert slow.received == ["a", "d", "e", "f"]
+    assert broadcaster.subscribers[slow].dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_disconnect_closes_slow_subscriber():
+    broadcaster = Broadcaster(max_queue=3, policy=SlowConsumerPolicy.DISCONNECT)
+    fast, slow = LocalSocket(), LocalSocket(stalled=True)
+    await broadcaster.subscribe(fast)
+    await broadcaster.subscribe(slow)
+
+    for message in "abcdef":
+        broadcaster.publish(message)
+        await settle()
+
+    slow.resume.set()
+    await settle()
+
+    assert slow.closed
+    assert slow not in broadcaster.subscribers
+    assert fast.received == list("abcdef")
+
+
+@pytest.mark.asyncio
+async def test_disconnect_closes_subscriber_stalled_in_a_send():
+    broadcaster = Broadcaster(max_queue=4, policy=SlowConsumerPolicy.DISCONNECT, send_timeout=0.05)
+    fast, stalled = LocalSocket(), LocalSocket(stalled=True)
+    await broadcaster.subscribe(fast)
+    await broadcaster.subscribe(stalled)
+
+    # never more than max_queue behind: the writer stays in its first send
+    for message in "abc":
+        broadcaster.publish(message)
+        await settle()
+    await asyncio.sleep(0.1)
+
+    assert stalled.closed
+    assert stalled not in broadcaster.subscribers
+    assert fast.received == list("abc")
+
+
+@pytest.mark.asyncio
+async def test_unsubscribing_an_idle_writer_leaves_the_others_running():
+    broadcaster = Broadcaster()
+    kept, left = LocalSocket(), LocalSocket()
+    await broadcaster.subscribe(kept)
+    await broadcaster.subscribe(left)
+    await settle()
+
+    writer = broadcaster.subscribers[left].writer
+    await broadcaster.unsubscribe(left)
+    assert writer.done()
+
+    broadcaster.publish("a")
+    await settle()
+    broadcaster.publish("b")
+    await settle()
+
+    assert kept.received == ["a", "b"]
+    assert left.received == []
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe_stops_delivery():
+    broadcaster = Broadcaster()
+    kept, left = LocalSocket(), LocalSocket()
+    await broadcaster.subscribe(kept)
+    await broadcaster.subscribe(left)
+    await settle()
+
+    await broadcaster.unsubscribe(left)
+    broadcaster.publish("a")
+    await settle()
+
+    assert kept.received == ["a"]
+    assert left.received == []
+    assert left not in broadcaster.subscribers
+
+
+def test_subscribe_endpoint_broadcasts():
+    with TestClient(app) as client, client.websocket_connect("/subscribe") as first:
+        assert first.receive_text().endswith(" subscribed")
+
+        with client.websocket_connect("/subscribe") as second:
+            assert second.receive_text().endswith(" subscribed")
+            assert first.receive_text().endswith(" subscribed")
+
+            second.send_text("hello")
+            assert first.receive_text() == "hello"
+            assert second.receive_text() == "hello"
+
+        assert first.receive_text().endswith(" unsubscribed")